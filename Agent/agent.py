@@ -133,29 +133,30 @@ class SimpleAgent:
 
 
 # Initialize the agent with the DeepSeek-Coder v2 model
-agent = SimpleAgent("deepseek-coder-v2")
-
-# Example task input for each operation
-task_add = "Please add 3 and 7."
-task_sub = "Please subtract 3 from 7."
-task_mul = "Please multiply 3 and 7."
-task_div = "Please divide 10 by 2."
-task_or = "Please or 1 by 1."
-task_search = "Please search how to make an agent."
-
-
-# The agent reacts to each task and provides the result
-result_add = agent.perform_task(task_add)
-result_sub = agent.perform_task(task_sub)
-result_mul = agent.perform_task(task_mul)
-result_div = agent.perform_task(task_div)
-result_or = agent.perform_task(task_or)
-result_search = agent.perform_task(task_search)
-
-# Print the results
-print(f"Addition Result: {result_add}")
-print(f"Subtraction Result: {result_sub}")
-print(f"Multiplication Result: {result_mul}")
-print(f"Division Result: {result_div}")
-print(f"Or Result: {result_or}")
-print(f"Search Result: {result_search}")
+if __name__ == "__main__":
+    agent = SimpleAgent("deepseek-coder-v2")
+
+    # Example task input for each operation
+    task_add = "Please add 3 and 7."
+    task_sub = "Please subtract 3 from 7."
+    task_mul = "Please multiply 3 and 7."
+    task_div = "Please divide 10 by 2."
+    task_or = "Please or 1 by 1."
+    task_search = "Please search how to make an agent."
+
+
+    # The agent reacts to each task and provides the result
+    result_add = agent.perform_task(task_add)
+    result_sub = agent.perform_task(task_sub)
+    result_mul = agent.perform_task(task_mul)
+    result_div = agent.perform_task(task_div)
+    result_or = agent.perform_task(task_or)
+    result_search = agent.perform_task(task_search)
+
+    # Print the results
+    print(f"Addition Result: {result_add}")
+    print(f"Subtraction Result: {result_sub}")
+    print(f"Multiplication Result: {result_mul}")
+    print(f"Division Result: {result_div}")
+    print(f"Or Result: {result_or}")
+    print(f"Search Result: {result_search}")
@@ -88,7 +88,8 @@ class SimpleAgent:
 
 
 # Initialize the agent with the model (for simplicity, we're not using the model here directly)
-agent = SimpleAgent("deepseek-coder-v2")
+if __name__ == "__main__":
+    agent = SimpleAgent("deepseek-coder-v2")
 
-# Run the agent to generate and debug the HTML page
-agent.run()
+    # Run the agent to generate and debug the HTML page
+    agent.run()
@@ -69,5 +69,6 @@ class RecursiveHTMLAgent:
         webbrowser.open(f"file://{os.path.realpath(file_path)}")
 
 # --- START ---
-agent = RecursiveHTMLAgent("deepseek-coder-v2")
-agent.execute("A futuristic robotics portfolio page with a dark theme")
\ No newline at end of file
+if __name__ == "__main__":
+    agent = RecursiveHTMLAgent("deepseek-coder-v2")
+    agent.execute("A futuristic robotics portfolio page with a dark theme")
@@ -80,5 +80,6 @@ class RecursiveHTMLAgent:
         webbrowser.open(f"file://{os.path.realpath(file_path)}")
 
 # Start
-agent = RecursiveHTMLAgent("deepseek-coder-v2")
-agent.execute("just show me a robot dancing page")
\ No newline at end of file
+if __name__ == "__main__":
+    agent = RecursiveHTMLAgent("deepseek-coder-v2")
+    agent.execute("just show me a robot dancing page")
@@ -80,5 +80,6 @@ class RecursiveHTMLAgent:
         webbrowser.open(f"file://{os.path.realpath(file_path)}")
 
 # Start
-agent = RecursiveHTMLAgent("deepseek-coder-v2")
-agent.execute("just show me baidu.com main page")
+if __name__ == "__main__":
+    agent = RecursiveHTMLAgent("deepseek-coder-v2")
+    agent.execute("just show me baidu.com main page")
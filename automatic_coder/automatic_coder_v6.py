@@ -380,5 +380,6 @@ class RecursiveHTMLAgent:
 
 # Start
 #agent = RecursiveHTMLAgent("qwen3-coder")
-agent = RecursiveHTMLAgent("deepseek-coder-v2")
-agent.execute("just show me a youtube.com front page")
+if __name__ == "__main__":
+    agent = RecursiveHTMLAgent("deepseek-coder-v2")
+    agent.execute("just show me a youtube.com front page")
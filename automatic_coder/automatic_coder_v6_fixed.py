@@ -1,61 +1,61 @@
 import webbrowser
 import os
-import ollama
 import re
-import time
 import logging
+import asyncio
+from backend_pool import BackendPool
+from retry_policy import CircuitBreaker, Deadline, RetryMetrics, RetryPolicy, call_with_retry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class RecursiveHTMLAgent:
-    def __init__(self, model_name):
+    def __init__(self, model_name, retry_policy=None):
         self.model_name = model_name
         self.parts = {}
+        # Hosts from $OLLAMA_HOSTS; least-outstanding routing with p95 hedging
+        self.client = BackendPool.from_env(hedge=True)
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=5, attempt_timeout=180)
+        self.metrics = RetryMetrics()
+        # One breaker per backend: fail fast while the ollama server is down. It opens only
+        # once a whole call's attempts have failed, so no retry of that call is short-circuited
+        self.breaker = CircuitBreaker(failure_threshold=self.retry_policy.max_attempts, reset_timeout=30,
+                                      metrics=self.metrics)
 
-    def _safe_ollama_call(self, prompt: str, operation_name: str, timeout: int = 180, max_retries: int = 5) -> str:
+    async def _safe_ollama_call(self, prompt: str, operation_name: str, deadline: Deadline = None) -> str:
         """
         Safe wrapper for ollama calls with retry logic and timeout handling.
         
         Args:
             prompt: The prompt to send to the model
             operation_name: Name of the operation for logging
-            timeout: Timeout in seconds for each attempt (default 180s / 3 minutes)
-            max_retries: Maximum number of retry attempts (default 5)
+            deadline: Overall request deadline shared by every stage (optional)
         
         Returns:
             The response content from ollama
+        
+        Retries use decorrelated jitter, each attempt is bounded by the policy
+        timeout and the remaining deadline, and the circuit breaker fails fast
+        while the backend is down.
         """
-        for attempt in range(max_retries):
-            try:
-                logger.info(f"Attempt {attempt + 1}/{max_retries} for {operation_name}")
-                
-                # Add timeout to the ollama call
-                response = ollama.chat(
-                    model=self.model_name, 
-                    messages=[{"role": "user", "content": prompt}],
-                    timeout=timeout
-                )
-                logger.info(f"Successfully completed {operation_name}")
-                return response['message']['content']
-                
-            except Exception as e:
-                logger.warning(f"Attempt {attempt + 1} failed for {operation_name}: {str(e)}")
-                
-                if attempt == max_retries - 1:
-                    logger.error(f"All {max_retries} attempts failed for {operation_name}")
-                    raise Exception(f"Failed to complete {operation_name} after {max_retries} attempts: {str(e)}")
-                
-                # Wait before retrying (exponential backoff)
-                wait_time = (2 ** attempt) + (attempt * 0.5)
-                logger.info(f"Waiting {wait_time} seconds before retry...")
-                time.sleep(wait_time)
-        
-        # This should never be reached, but just in case
-        raise Exception(f"Unexpected error in {operation_name}")
+        async def attempt():
+            response = await self.client.chat(
+                model=self.model_name, 
+                messages=[{"role": "user", "content": prompt}]
+            )
+            return response['message']['content']
+        
+        return await call_with_retry(
+            attempt,
+            operation_name,
+            policy=self.retry_policy,
+            breaker=self.breaker,
+            deadline=deadline,
+            metrics=self.metrics
+        )
 
-    def plan_tool(self, task_description):
+    async def plan_tool(self, task_description, deadline=None):
         """
         Enhanced planning tool that creates a structured 5-part plan for web page development.
         Each part corresponds to a specific component of the web page architecture.
@@ -118,9 +118,9 @@ class RecursiveHTMLAgent:
         Create the 5-part plan for: {task_description}
         """
         
-        return self._safe_ollama_call(prompt, "plan_tool")
+        return await self._safe_ollama_call(prompt, "plan_tool", deadline)
 
-    def generate_part_tool(self, part_number, plan):
+    async def generate_part_tool(self, part_number, plan, deadline=None):
         """
         Enhanced prompt generation for creating specific parts of a web page.
         Uses structured prompting to ensure high-quality, consistent output.
@@ -157,10 +157,10 @@ class RecursiveHTMLAgent:
         Generate the code for Part {part_number}:
         """
         
-        return self._safe_ollama_call(prompt, f"generate_part_{part_number}")
+        return await self._safe_ollama_call(prompt, f"generate_part_{part_number}", deadline)
 
     # --- NEW LLM-BASED DEBUG TOOL ---
-    def debug_tool(self, code):
+    async def debug_tool(self, code, deadline=None):
         """Uses the LLM to scan for syntax and structural errors."""
         print("  [LLM is inspecting the code for bugs...]")
         
@@ -173,37 +173,39 @@ class RecursiveHTMLAgent:
         {code}
         """
         
-        return self._safe_ollama_call(prompt, "debug_tool")
+        return await self._safe_ollama_call(prompt, "debug_tool", deadline)
 
-    def run_recursive_logic(self, goal):
+    async def run_recursive_logic(self, goal, deadline=None):
         # 1. Plan
-        full_plan = self.plan_tool(goal)
+        full_plan = await self.plan_tool(goal, deadline)
         
         # 2. Generate Parts
         for i in range(1, 6):
-            self.parts[i] = self.generate_part_tool(i, full_plan)
+            self.parts[i] = await self.generate_part_tool(i, full_plan, deadline)
         
         # 3. Combine
         full_html = "<!DOCTYPE html>\n<html>\n" + "\n".join(self.parts.values()) + "\n</html>"
         
         # 4. LLM Debug Loop
-        debug_feedback = self.debug_tool(full_html)
+        debug_feedback = await self.debug_tool(full_html, deadline)
         
         if "ERROR" in debug_feedback.upper():
             print(f"  [Bug Found]: {debug_feedback}")
             # Recursively call the generator with the feedback to fix it
             print("  [Attempting automatic fix...]")
             prompt = f"Fix this HTML based on this feedback: {debug_feedback}\n\nHTML:\n{full_html}"
-            fix_response = self._safe_ollama_call(prompt, "debug_fix")
+            fix_response = await self._safe_ollama_call(prompt, "debug_fix", deadline)
             full_html = fix_response
         else:
             print("  [Code Verified by LLM]")
 
         return full_html
 
-    def execute(self, user_goal):
+    def execute(self, user_goal, deadline_seconds=None):
         try:
-            final_code = self.run_recursive_logic(user_goal)
+            # One deadline for the whole request, shared by every stage
+            deadline = Deadline(deadline_seconds)
+            final_code = asyncio.run(self.run_recursive_logic(user_goal, deadline))
             
             file_path = "llm_debugged_page.html"
             with open(file_path, "w") as f:
@@ -218,9 +220,12 @@ class RecursiveHTMLAgent:
             logger.error(f"Error during execution: {str(e)}")
             print(f"An error occurred: {str(e)}")
             print("Please check your ollama server connection and try again.")
+        finally:
+            logger.info(f"LLM call metrics: {self.metrics.snapshot()}")
+            logger.info(f"Backend pool: {self.client.snapshot()}")
 
 # Start
 if __name__ == "__main__":
     # Create agent with longer timeout and retry logic
     agent = RecursiveHTMLAgent(model_name="qwen3-coder")
-    agent.execute("just show me a youtube.com front page")
\ No newline at end of file
+    agent.execute("just show me a youtube.com front page", deadline_seconds=1800)
\ No newline at end of file
@@ -295,5 +295,6 @@ PART 5: FOOTER (links)"""
         webbrowser.open(f"file://{os.path.realpath(file_path)}")
 
 # Run
-agent = SimpleFrameAgent("deepseek-coder-v2")
-agent.execute("just show me a youtube.com front page no sidebar")
+if __name__ == "__main__":
+    agent = SimpleFrameAgent("deepseek-coder-v2")
+    agent.execute("just show me a youtube.com front page no sidebar")
@@ -2,10 +2,49 @@ import webbrowser
 import os
 import ollama
 import re
+from preview_server import PreviewServer
+from page_assembler import PageAssembler
+from prompt_compiler import PromptLibrary, count_tokens
+from slot_templates import FRAME_TEMPLATES
+from html_patch import PATCH_SCHEMA, apply_edits, parse_edits
+from tracing import Tracer
+from token_budget import TokenBudget
+from model_residency import RESIDENCY
+
+PROMPTS = PromptLibrary()
+
+# Header and hero: only the frame CSS they use is inlined in <head>
+CRITICAL_PARTS = 2
 
 class SimpleFrameAgent:
-    def __init__(self, model_name):
+    def __init__(self, model_name, tracer=None, token_budget=None, residency=None):
         self.model_name = model_name
+        # Output tokens avoided by slot filling / edit patches vs full-HTML answers
+        self.tokens_saved = 0
+        self.tracer = tracer if tracer is not None else Tracer()
+        # num_predict / num_ctx learned from the output lengths of past runs
+        self.budgets = token_budget if token_budget is not None else TokenBudget()
+        # Warm-up and keep_alive policy, shared by the agents of a process
+        self.residency = residency if residency is not None else RESIDENCY
+
+    def _chat(self, span_name, stage, kind=None, **kwargs):
+        """
+        ollama.chat inside a trace span carrying token counts and queue/service
+        time, with the stage's learned output budget.
+        """
+        prompt = kwargs['messages'][-1]['content']
+        kwargs['options'] = self.budgets.options(stage, prompt, kwargs.get('options'), kind, self.model_name)
+        with self.tracer.span(span_name, cat="llm", model=self.model_name) as span:
+            response = ollama.chat(model=self.model_name, **kwargs, **self.residency.chat_options(self.model_name))
+            output = response['message']['content']
+            span.llm(response, prompt=prompt, output=output)
+            truncated = response.get('done_reason') == 'length'
+            if truncated:
+                print(f"  [Budget: {span_name} hit num_predict={kwargs['options']['num_predict']}, raising it for next time]")
+            self.budgets.record(stage, response.get('eval_count') or count_tokens(output), kind, truncated)
+            span.set(num_predict=kwargs['options'].get('num_predict'), num_ctx=kwargs['options'].get('num_ctx'),
+                     budget_truncated=truncated)
+        return response
 
     def plan_tool(self, task_description):
         """
@@ -87,8 +126,9 @@ class SimpleFrameAgent:
 
         Create the 5-part plan for: {task_description}"""
         
-        response = ollama.chat(
-            model=self.model_name, 
+        response = self._chat(
+            "llm.plan",
+            stage="plan",
             messages=[{"role": "user", "content": prompt}],
             options={"temperature": 0.7}  # Slightly creative but focused
         )
@@ -101,38 +141,77 @@ class SimpleFrameAgent:
 
 
     def refine_tool(self, part_number, html_part, goal):
-        # Adjust the refinement prompt for each part based on its specific requirements
-        prompts = {
-            1: f"Refine this header & navigation HTML part. Make sure the header is sticky, 56px height, with backdrop-blur on scroll. Include a left hamburger menu and logo with an SVG. Center should contain a 640px max-width search container with proper focus states. Right should have action icons and a user avatar. For mobile, make the menu collapsible and the search overlay functional. Ensure accessibility and follow responsive design principles. \n\nHTML Part: {html_part}",
-            2: f"Refine this hero/primary content area HTML part. The content should be organized with CSS Grid (auto-fill, minmax 320px). Each video card should have a 16:9 aspect ratio thumbnail. Typography should be 16px base, 14px meta, and 12px details. Add hover effects with a scale(1.02) transform and shadow elevation. Include loading states and skeleton screens for better user experience. Ensure accessibility with appropriate aria labels. \n\nHTML Part: {html_part}",
-            3: f"Refine this content cards & features section. Ensure consistent padding of 12px for cards. Optimize images using object-fit cover and lazy loading. Layout metadata using flexbox with space-between. Add interactive elements with focus-visible outlines. Ensure accessibility standards (aria-labels, keyboard navigation). \n\nHTML Part: {html_part}",
-            4: f"Refine this secondary navigation & widgets HTML part. Include a sidebar with 240px width and scrollable content. Use section dividers with 1px #272727 borders. Use a consistent icon system (24px icons, currentColor fill). Ensure the sidebar is collapsible on mobile devices. Manage active/hover/focus states effectively. \n\nHTML Part: {html_part}",
-            5: f"Refine this footer HTML part. Ensure a multi-column footer with semantic HTML5 elements. Organize links in a hierarchical structure. Include social media icons with consistent sizing and alignment. Make sure the footer is legally compliant with privacy and terms links. Minimize the DOM and optimize selectors for performance. \n\nHTML Part: {html_part}",
+        """
+        Refines a part through edit operations instead of a full rewrite: the
+        LLM sees the current HTML and returns a compact list of CSS-selector
+        edits (PATCH_SCHEMA), which are applied to the DOM locally and checked.
+        """
+        # Adjust the refinement goals for each part based on its specific requirements
+        instructions = {
+            1: "Refine this header & navigation HTML part. Make sure the header is sticky, 56px height, with backdrop-blur on scroll. Include a left hamburger menu and logo with an SVG. Center should contain a 640px max-width search container with proper focus states. Right should have action icons and a user avatar. For mobile, make the menu collapsible and the search overlay functional. Ensure accessibility and follow responsive design principles.",
+            2: "Refine this hero/primary content area HTML part. The content should be organized with CSS Grid (auto-fill, minmax 320px). Each video card should have a 16:9 aspect ratio thumbnail. Typography should be 16px base, 14px meta, and 12px details. Add hover effects with a scale(1.02) transform and shadow elevation. Include loading states and skeleton screens for better user experience. Ensure accessibility with appropriate aria labels.",
+            3: "Refine this content cards & features section. Ensure consistent padding of 12px for cards. Optimize images using object-fit cover and lazy loading. Layout metadata using flexbox with space-between. Add interactive elements with focus-visible outlines. Ensure accessibility standards (aria-labels, keyboard navigation).",
+            4: "Refine this secondary navigation & widgets HTML part. Include a sidebar with 240px width and scrollable content. Use section dividers with 1px #272727 borders. Use a consistent icon system (24px icons, currentColor fill). Ensure the sidebar is collapsible on mobile devices. Manage active/hover/focus states effectively.",
+            5: "Refine this footer HTML part. Ensure a multi-column footer with semantic HTML5 elements. Organize links in a hierarchical structure. Include social media icons with consistent sizing and alignment. Make sure the footer is legally compliant with privacy and terms links. Minimize the DOM and optimize selectors for performance.",
         }
 
-        # Get the appropriate refinement prompt for the given part
-        prompt = prompts.get(part_number, f"Refine the following HTML part: {html_part}")
-        prompt += """
-                TECHNICAL REQUIREMENTS:
-        1. Generate ONLY the HTML structure and content for Part {part_number}.
-        2. DO NOT change any CSS styles or layout (e.g., Grid/Flexbox), except for sizes (font size, widths, etc.).
-        3. ONLY modify the content, structure, or accessibility attributes (e.g., aria-labels, roles, etc.).
-        4. Make sure the content is clean, accessible, and semantically correct with proper use of HTML5 tags.
-        5. Ensure accessibility: focus states, aria labels, and keyboard navigation.
-        6. Keep the existing CSS intact unless it's necessary to adjust sizes.
-        7. Follow all WCAG 2.1 AA standards.
+        prompt = PROMPTS.render(
+            "refine",
+            goal=goal,
+            part_number=part_number,
+            instructions=instructions.get(part_number, "Refine the following HTML part."),
+            html_part=html_part
+        )
 
-        OUTPUT FORMAT:
-        Return ONLY the HTML structure (without changing CSS styles) with embedded <style> tags if any size adjustments are made.
-        Start directly with the opening tag (e.g., <section>, <header>, <div>).
-"""
-        
-        # Send the prompt to the LLM model for refinement
-        response = ollama.chat(model=self.model_name, messages=[{"role": "user", "content": prompt}])
-        refined_html = response['message']['content']
-        print("==========refined_html============")
-        print(refined_html)        
-        return refined_html.strip()
+        # Send the prompt to the LLM model; the answer is edits only
+        response = self._chat(
+            f"llm.refine_{part_number}",
+            stage="refine",
+            kind=part_number,
+            messages=[{"role": "user", "content": prompt}],
+            format=PATCH_SCHEMA,
+            options={"temperature": 0.3}
+        )
+        content = response['message']['content']
+        result = apply_edits(html_part, parse_edits(content))
+        for edit, reason in result.skipped:
+            print(f"  [Refine Part {part_number}: skipped {edit.get('op')} {edit.get('selector')!r}: {reason}]")
+
+        output_tokens = response.get('eval_count') or count_tokens(content)
+        full_tokens = count_tokens(result.html)
+        status = "applied" if result.accepted else ("rejected, keeping original" if result.applied else "none applicable")
+        print(f"  [Refine Part {part_number}: {len(result.applied)} edits {status}; "
+              f"{output_tokens} output tokens vs ~{full_tokens} for a full rewrite]")
+        self.tokens_saved += max(0, full_tokens - output_tokens)
+        return result.html
+
+    def fill_slots_tool(self, part_number, plan, goal):
+        """
+        Slot-filling alternative to refine_tool: the LLM returns only a small
+        JSON object of slot values (constrained by the template's schema) and
+        the part is rendered locally.
+        """
+        template = FRAME_TEMPLATES[part_number]
+        prompt = PROMPTS.render("slots", goal=goal, plan=plan, part_name=template.name,
+                                part_number=part_number, slots=template.describe())
+
+        response = self._chat(
+            f"llm.slots_{part_number}",
+            stage="slots",
+            kind=part_number,
+            messages=[{"role": "user", "content": prompt}],
+            format=template.schema(),
+            options={"temperature": 0.3}
+        )
+        values = template.parse_response(response['message']['content'])
+        html = template.render(values)
+
+        # What a full rewrite of the same markup would have cost in output tokens
+        output_tokens = response.get('eval_count') or count_tokens(response['message']['content'])
+        full_tokens = count_tokens(html)
+        print(f"  [Slots Part {part_number}: {output_tokens} output tokens vs ~{full_tokens} for full HTML]")
+        self.tokens_saved += max(0, full_tokens - output_tokens)
+        return html
 
     def generate_part_tool(self, part_number, plan, goal):
         templates = {
@@ -236,49 +315,92 @@ class SimpleFrameAgent:
   .footer{ border-top: 1px solid var(--border); padding: 16px; background: var(--bg); }
   .footer__cols{ display:grid; gap: var(--gap); grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); }
 
-  .ui-box{ border: 1px solid var(--border); border-radius: var(--radius); background: var(--panel); }
-  .ui-box--logo{ width: 88px; height: 24px; border-radius: 8px; }
-  .ui-box--search{ width: min(640px, 100%); height: 40px; border-radius: 999px; }
+  .ui-box{ border: 1px solid var(--border); border-radius: var(--radius); background: var(--panel); color: inherit; font: inherit; }
+  .ui-box--logo{ min-width: 88px; height: 24px; border-radius: 8px; display:flex; align-items:center; padding: 0 8px; font-weight: 600; text-decoration: none; }
+  .ui-box--search{ width: min(640px, 100%); height: 40px; border-radius: 999px; padding: 0 16px; }
   .ui-box--icon{ width: 28px; height: 28px; border-radius: 8px; }
   .ui-box--avatar{ width: 32px; height: 32px; border-radius: 999px; }
-  .chip{ width: 84px; height: 32px; border-radius: 999px; border: 1px solid var(--border); background: var(--panel); flex: 0 0 auto; }
+  .chip{ min-width: 84px; height: 32px; padding: 0 12px; border-radius: 999px; border: 1px solid var(--border); background: var(--panel); color: inherit; font: inherit; flex: 0 0 auto; }
   .ui-box--loadmore{ width: 180px; height: 44px; border-radius: 999px; }
-  .ui-box--footercol{ height: 80px; }
+  .ui-box--footercol{ min-height: 80px; padding: 12px; }
+  .ui-box--footercol h2{ margin: 0 0 8px; font-size: 14px; }
+  .ui-box--footercol ul{ margin: 0; padding: 0; list-style: none; font-size: 13px; color: var(--muted); }
+  .ui-box--footercol a{ color: inherit; text-decoration: none; }
+
+  .card__thumb{ aspect-ratio: 16/9; border-radius: var(--radius); border: 1px solid var(--border); background: var(--panel); }
+  .card__meta{ display:flex; gap: 10px; padding-top: 10px; }
+  .card__avatar{ width: 36px; height: 36px; border-radius: 999px; background: var(--panel); flex: 0 0 auto; }
+  .card__title{ font-size: 14px; font-weight: 600; }
+  .card__sub{ font-size: 12px; color: var(--muted); }
 </style>
 """.strip()
 
-    def execute(self, user_goal):
-        plan = self.plan_tool(user_goal)
+    def build_page(self, user_goal, mode="refine", live=None):
+        """
+        Plans, generates and refines the five parts and assembles the page.
+        mode="refine" patches each generated part's HTML; mode="slots" fills
+        template slots from JSON and skips the generate call.
+        """
+        with self.tracer.span("plan"):
+            plan = self.plan_tool(user_goal)
 
         parts = []
         for i in range(1, 6):
-            # Generate the part and refine it using LLM model
-            part_html = self.generate_part_tool(i, plan, user_goal)
-            refined_part_html = self.refine_tool(i, part_html, user_goal)
+            if mode == "slots":
+                # The slot template is the skeleton: nothing to generate first
+                with self.tracer.span(f"part_{i}.slots", part=i):
+                    refined_part_html = self.fill_slots_tool(i, plan, user_goal)
+            else:
+                # Generate the part and refine it using LLM model
+                with self.tracer.span(f"part_{i}.generate", part=i):
+                    part_html = self.generate_part_tool(i, plan, user_goal)
+                if live:
+                    live.push_part(i, part_html)
+                with self.tracer.span(f"part_{i}.refine", part=i):
+                    refined_part_html = self.refine_tool(i, part_html, user_goal)
+            if live:
+                live.push_part(i, refined_part_html)
             parts.append(refined_part_html)
             #parts.append(part_html)
 
-        html = "\n".join([
-            "<!DOCTYPE html>",
-            "<html lang='en'>",
-            "<head>",
-            "  <meta charset='utf-8' />",
-            "  <meta name='viewport' content='width=device-width, initial-scale=1' />",
-            "  <title>Frame</title>",
-            self.build_min_css(),
-            "</head>",
-            "<body>",
-            "\n".join(parts),
-            "</body>",
-            "</html>",
-        ])
+        # Refined parts may carry their own <style>/<html> wrappers: hoist and dedupe
+        assembler = PageAssembler(minify=True)
+        with self.tracer.span("assemble") as span:
+            html = assembler.assemble(parts, head=self.build_min_css(), title="Frame", critical_parts=CRITICAL_PARTS)
+            span.set(**assembler.stats)
+        if live:
+            live.replace_page(html)
 
-        file_path = "frame_refined.html"
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(html)
+        print(f"  [Output tokens saved vs full rewrites: ~{self.tokens_saved}]")
+        return html
 
-        webbrowser.open(f"file://{os.path.realpath(file_path)}")
+    def execute(self, user_goal, preview=True, headless=None, mode="refine", trace_path="frame_trace.json"):
+        file_path = "frame_refined.html"
+        with self.tracer.span("execute", goal=user_goal, model=self.model_name, mode=mode):
+            # The model loads while the preview server starts and the skeleton renders
+            self.residency.warm(self.model_name, self.tracer)
+            # Skeleton + frame CSS are visible before the first LLM call
+            live = PreviewServer(head_css=self.build_min_css(), title="Frame", headless=headless).start() if preview else None
+            try:
+                html = self.build_page(user_goal, mode, live)
+            finally:
+                if live:
+                    live.stop()
+
+            with self.tracer.span("write", bytes=len(html)):
+                with open(file_path, "w", encoding="utf-8") as f:
+                    f.write(html)
+
+            if not preview:
+                with self.tracer.span("browser_launch"):
+                    webbrowser.open(f"file://{os.path.realpath(file_path)}")
+
+        if trace_path and self.tracer.save(trace_path):
+            print(f"  [Trace: {trace_path} (open in ui.perfetto.dev)]")
+            for name, count, total_ms in self.tracer.summary()[:8]:
+                print(f"    {name:<20} {count:>3}x {total_ms / 1000:>8.2f}s")
 
 # Run the agent with a goal
-agent = SimpleFrameAgent("deepseek-coder-v2")
-agent.execute("just show me a login page for a website")
+if __name__ == "__main__":
+    agent = SimpleFrameAgent("deepseek-coder-v2")
+    agent.execute("just show me a login page for a website")
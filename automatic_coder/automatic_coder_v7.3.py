@@ -89,5 +89,6 @@ OUTPUT FORMAT:
         webbrowser.open(f"file://{os.path.realpath(file_path)}")
 
 # Run the agent with a goal
-agent = SimpleFrameAgent("deepseek-coder-v2")
-agent.execute("just show me a youtube.com front page with sidebar, make the logo from url of https://upload.wikimedia.org/wikipedia/commons/b/b8/YouTube_Logo_2017.svg, show me 3 video box, and video with box real video each one, just find the video online")
+if __name__ == "__main__":
+    agent = SimpleFrameAgent("deepseek-coder-v2")
+    agent.execute("just show me a youtube.com front page with sidebar, make the logo from url of https://upload.wikimedia.org/wikipedia/commons/b/b8/YouTube_Logo_2017.svg, show me 3 video box, and video with box real video each one, just find the video online")
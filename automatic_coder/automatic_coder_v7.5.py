@@ -1,12 +1,70 @@
 import webbrowser
 import os
 import ollama
-import re
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from plan_library import PlanLibrary, classify_task
+from plan_schema import PLAN_SCHEMA, DEFAULT_PARTS, Plan, PlanPart
+from code_sanitizer import STOP_SEQUENCES, RootCloseTracker, StreamingSanitizer, StreamingPageWriter, clean_code
+from preview_server import PreviewServer
+from page_assembler import PageAssembler
+from prompt_compiler import PromptLibrary, count_tokens, normalize_whitespace
+from tracing import Tracer
+from part_scorer import best_candidate, score_part
+from token_budget import TokenBudget, context_size
+from model_residency import RESIDENCY
+from part_cache import PartCache, part_spec_hash
+from repeat_macros import expand_macros
+from perf_budget import check_page, load_budgets, measure, part_problems
+
+# Similarity thresholds for plan library hits
+PLAN_REUSE_THRESHOLD = 0.95   # reuse the stored plan as-is
+PLAN_ADAPT_THRESHOLD = 0.85   # reuse with a short delta prompt
+
+# Prompt templates (prompts/*.v<N>.txt), compiled once at import
+PROMPTS = PromptLibrary()
+
+# Best-of-N part sampling: candidate k uses temperature k (cycled) and seed k + 1
+SAMPLE_TEMPERATURES = (0.2, 0.5, 0.8, 1.0)
+
+# Room left in the pinned part context for the per-part suffix
+PART_SUFFIX_TOKENS = 512
+
+# Leading parts (header, hero) whose CSS is inlined; the rest is deferred
+CRITICAL_PARTS = 2
+
+# Repair rounds for parts blamed for a performance budget breach
+BUDGET_REPAIR_ROUNDS = 1
 
 class RecursiveHTMLAgent:
-    def __init__(self, model_name):
+    def __init__(self, model_name, plan_library=None, tracer=None, samples=1, token_budget=None, residency=None, part_cache=None,
+                 perf_budgets=None):
         self.model_name = model_name
+        # Candidates sampled concurrently per part (opt-in); 1 streams a single answer to the writer and preview
+        self.samples = max(1, samples)
         self.parts = {}
+        self.plan_library = plan_library if plan_library is not None else PlanLibrary()
+        self.preview = None
+        self.tracer = tracer if tracer is not None else Tracer()
+        # num_predict / num_ctx learned from the output lengths of past runs
+        self.budgets = token_budget if token_budget is not None else TokenBudget()
+        # Warm-up and keep_alive policy, shared by the agents of a process
+        self.residency = residency if residency is not None else RESIDENCY
+        # Parts of earlier runs by spec hash; an edited goal only regenerates what changed
+        self.part_cache = part_cache if part_cache is not None else PartCache()
+        self.reused_parts = []
+        # Static page budgets (DOM size, CSS bytes, images...); breaking one sends parts back
+        self.perf_budgets = perf_budgets if perf_budgets is not None else load_budgets()
+        self.budget_report = None
+        # Trailing-text tokens of part streams that ran to their natural end
+        self.tail_tokens = []
+        # Shared part prefix of the current plan and the num_ctx pinned for it
+        self._shared_prefix = None
+        self._part_num_ctx = None
+        # (part number, prompt tokens, seconds to first token) per part stream
+        self.first_tokens = []
 
     def plan_tool(self, task_description):
         """
@@ -18,80 +76,27 @@ class RecursiveHTMLAgent:
         
         # Analyze task type for more contextual planning
         task_type = self._analyze_task_type(task_description)
+
+        # Try the plan library before paying for a full planning call
+        library_plan = self._plan_from_library(task_description, task_type)
+        if library_plan:
+            return library_plan
         
-        prompt = f"""You are a senior web architect and UX designer planning the structure of a web page.
-
-        TASK: Create a detailed 5-part structural plan for: {task_description}
-
-        TASK CONTEXT: {task_type['context']}                                                                                                                                                                               
-                                                                                                                                                                                                                                                        
-        VISUAL HIERARCHY PRINCIPLES:                                                                                                                                                                                                                 
-        - Above-the-fold impact: Hero section must communicate value in 3 seconds                                                                                                                                                                    
-        - Progressive disclosure: Information density increases as user scrolls                                                                                                                                                                      
-        - Visual rhythm: Consistent spacing using 8px grid system                                                                                                                                                                                    
-                                                                                                                                                                                                                                                    
-        - Dark theme with #0f0f0f background, #272727 borders, #065fd4 accents                                                                                                                                                                       
-        - Card-based layouts with 12px border-radius                                                                                                                                                                                                 
-        - Subtle shadows and depth layering                                                                                                                                                                                                          
-        - Micro-interactions: 0.2s transitions on hover/focus                                                                                                                                                                                        
-        - Mobile-first responsive breakpoints (320px, 768px, 1024px)                                                                                                                                                                                 
-                                                                                                                                                                                                                                                        
-        5-PART ARCHITECTURE:                                                                                                                                                                                                                         
-                                                                                                                                                                                                                                                        
-        PART 1: HEADER & NAVIGATION SYSTEM                                                                                                                                                                                                           
-        - Sticky header with 56px height, backdrop-blur on scroll                                                                                                                                                                                    
-        - Left: Hamburger menu + logo (24px height) with proper SVG                                                                                                                                                                                  
-        - Center: Search container (640px max-width) with focus states                                                                                                                                                                               
-        - Right: Action icons (24px) with 8px spacing, user avatar (32px)                                                                                                                                                                            
-        - Mobile: Collapsible menu, search overlay                                                                                                                                                                                                   
-                                                                                                                                                                                                                                                        
-        PART 2: HERO/PRIMARY CONTENT AREA                                                                                                                                                                                                            
-        - Content grid using CSS Grid (auto-fill, minmax 320px)                                                                                                                                                                                      
-        - Video cards with 16:9 aspect ratio thumbnails                                                                                                                                                                                              
-        - Typography hierarchy: 16px base, 14px meta, 12px details                                                                                                                                                                                   
-        - Hover effects: scale(1.02) transform, shadow elevation                                                                                                                                                                                     
-        - Loading states and skeleton screens                                                                                                                                                                                                        
-                                                                                                                                                                                                                                                        
-        PART 3: CONTENT CARDS & FEATURES                                                                                                                                                                                                             
-        - Card components with consistent padding (12px)                                                                                                                                                                                             
-        - Image optimization: object-fit cover, lazy loading                                                                                                                                                                                         
-        - Metadata layout: flexbox with space-between                                                                                                                                                                                                
-        - Interactive elements: focus-visible outlines                                                                                                                                                                                               
-        - Accessibility: aria-labels, keyboard navigation                                                                                                                                                                                            
-                                                                                                                                                                                                                                                        
-        PART 4: SECONDARY NAVIGATION & WIDGETS                                                                                                                                                                                                       
-        - Sidebar with 240px width, scrollable content                                                                                                                                                                                               
-        - Section dividers with 1px #272727 borders                                                                                                                                                                                                  
-        - Icon system: 24px consistent sizing, currentColor fill                                                                                                                                                                                     
-        - Responsive behavior: collapsible on mobile                                                                                                                                                                                                 
-        - State management: active/hover/focus distinctions                                                                                                                                                                                          
-                                                                                                                                                                                                                                                        
-        PART 5: FOOTER & SYSTEM ELEMENTS                                                                                                                                                                                                             
-        - Multi-column footer with semantic HTML5                                                                                                                                                                                                    
-        - Link organization: hierarchical information architecture                                                                                                                                                                                   
-        - Social integration: icon consistency, proper sizing                                                                                                                                                                                        
-        - Legal compliance: privacy, terms, copyright                                                                                                                                                                                                
-        - Performance: minimal DOM, optimized selectors                                                                                                                                                                                              
-                                                                                                                                                                                                                                                        
-        TECHNICAL REQUIREMENTS:                                                                                                                                                                                                                      
-        - Semantic HTML5 elements only                                                                                                                                                                                                               
-        - CSS Grid + Flexbox for all layouts                                                                                                                                                                                                         
-        - CSS custom properties for theming                                                                                                                                                                                                          
-        - BEM naming convention                                                                                                                                                                                                                      
-        - WCAG 2.1 AA accessibility standards   
-
-        Create the 5-part plan for: {task_description}"""
+        prompt = self._render_prompt("plan", task_description=task_description, task_context=task_type['context'])
         
         try:
-            response = ollama.chat(
-                model=self.model_name, 
+            response = self._chat(
+                "llm.plan",
+                stage="plan",
                 messages=[{"role": "user", "content": prompt}],
+                format=PLAN_SCHEMA,
                 options={"temperature": 0.7}  # Slightly creative but focused
             )
             plan = response['message']['content']
             
-            # Validate and enhance the plan
+            # Parse once into a Plan, then validate and enhance it
             plan = self._validate_and_enhance_plan(plan, task_description)
+            self.plan_library.add(task_description, task_type['type'], plan.to_dict())
             print("==========plan============")
             print(plan)
             return plan
@@ -101,173 +106,294 @@ class RecursiveHTMLAgent:
             # Return a fallback structured plan
             return self._generate_fallback_plan(task_description)
     
+    def _chat(self, span_name, stage=None, kind=None, **kwargs):
+        """
+        ollama.chat inside a trace span carrying token counts and queue/service
+        time. With a stage, the call gets that stage's learned output budget
+        and its output length is recorded for the next run.
+        """
+        prompt = kwargs['messages'][-1]['content']
+        if stage:
+            kwargs['options'] = self.budgets.options(stage, prompt, kwargs.get('options'), kind, self.model_name)
+        with self.tracer.span(span_name, cat="llm", model=self.model_name) as span:
+            response = ollama.chat(model=self.model_name, **kwargs, **self.residency.chat_options(self.model_name))
+            span.llm(response, prompt=prompt, output=response['message']['content'])
+            if stage:
+                self._record_budget(span, stage, kind, kwargs['options'], response, response['message']['content'])
+        return response
+
+    def _record_budget(self, span, stage, kind, options, response, output):
+        """Feeds an observed output length back into the budget history."""
+        tokens = (response.get('eval_count') if response is not None else None) or count_tokens(output)
+        truncated = response is not None and response.get('done_reason') == 'length'
+        if truncated and 'num_predict' in options:
+            label = stage if kind is None else f"{stage} {kind}"
+            print(f"  [Budget: {label} hit num_predict={options['num_predict']}, raising it for next time]")
+        self.budgets.record(stage, tokens, kind, truncated)
+        span.set(num_predict=options.get('num_predict'), num_ctx=options.get('num_ctx'), budget_truncated=truncated)
+
+    def _render_prompt(self, name, **values):
+        """Renders a compiled prompt template and reports its prefill cost."""
+        compiled = PROMPTS[name]
+        prompt = compiled.render(**values)
+        tokens = count_tokens(prompt)
+        print(f"  [Prompt {name}.v{compiled.version}: {tokens} tokens, ~{compiled.prefill_seconds(tokens):.1f}s prefill]")
+        return prompt
+
     def _analyze_task_type(self, task_description):
         """Analyzes the task description to provide contextual planning guidance."""
-        desc_lower = task_description.lower()
-        
-        if any(word in desc_lower for word in ['landing', 'homepage', 'home page']):
-            return {
-                'context': 'This is a landing/homepage - focus on strong hero section, clear value proposition, and conversion elements.',
-                'priority': 'hero_and_cta'
-            }
-        elif any(word in desc_lower for word in ['dashboard', 'admin', 'panel']):
-            return {
-                'context': 'This is a dashboard/admin interface - focus on data visualization, navigation, and utility components.',
-                'priority': 'navigation_and_data'
-            }
-        elif any(word in desc_lower for word in ['blog', 'article', 'post']):
-            return {
-                'context': 'This is a content/blog page - focus on readability, typography, and content organization.',
-                'priority': 'content_and_readability'
-            }
-        elif any(word in desc_lower for word in ['ecommerce', 'shop', 'store', 'product']):
-            return {
-                'context': 'This is an e-commerce page - focus on product display, shopping cart, and conversion optimization.',
-                'priority': 'products_and_checkout'
-            }
-        elif any(word in desc_lower for word in ['portfolio', 'gallery', 'showcase']):
-            return {
-                'context': 'This is a portfolio/gallery page - focus on visual presentation and media display.',
-                'priority': 'visuals_and_media'
-            }
-        else:
-            return {
-                'context': 'This is a general web page - ensure balanced structure with clear navigation and content organization.',
-                'priority': 'balanced_structure'
-            }
-    
-    def _validate_and_enhance_plan(self, plan, task_description):
-        """Validates that the plan contains 5 parts and enhances if needed."""
-        # Check if plan has all 5 parts
-        part_count = sum(1 for i in range(1, 6) if f"PART {i}" in plan.upper() or f"PART {i}:" in plan.upper())
-        
-        if part_count < 5:
-            print(f"  [Warning: Plan has only {part_count} parts, expected 5. Enhancing...]")
-            # Try to add missing parts
-            plan = self._enhance_plan_with_missing_parts(plan, part_count)
-        
-        # Clean up common formatting issues
-        plan = re.sub(r'```[a-z]*\s*\n?', '', plan)  # Remove markdown code blocks
-        plan = plan.strip()
-        
+        return classify_task(task_description)
+
+    def _plan_from_library(self, task_description, task_type):
+        """
+        Looks up a stored plan for a similar goal of the same task type.
+        Close matches are reused directly, near matches are adapted with a short
+        delta prompt. Returns None when a fresh plan is needed.
+        """
+        entry, score = self.plan_library.lookup(task_description, task_type['type'])
+        if entry is None or score < PLAN_ADAPT_THRESHOLD:
+            return None
+
+        if score >= PLAN_REUSE_THRESHOLD:
+            print(f"  [Plan Library Hit: '{entry['goal']}' ({score:.2f})]")
+            return Plan.parse(entry['plan']).complete()
+
+        print(f"  [Plan Library Adapt: '{entry['goal']}' ({score:.2f})]")
+        stored_plan = Plan.parse(entry['plan']).complete()
+        prompt = self._render_prompt("plan_adapt", stored_goal=entry['goal'], stored_plan=json.dumps(stored_plan.to_dict()), task_description=task_description)
+
+        try:
+            response = self._chat(
+                "llm.plan_adapt",
+                stage="plan_adapt",
+                messages=[{"role": "user", "content": prompt}],
+                format=PLAN_SCHEMA,
+                options={"temperature": 0.3}
+            )
+            plan = self._validate_and_enhance_plan(response['message']['content'], task_description)
+        except Exception as e:
+            print(f"  [Plan Adapt Error: {str(e)}]")
+            return None
+
+        self.plan_library.add(task_description, task_type['type'], plan.to_dict())
+        print("==========plan============")
+        print(plan)
         return plan
-    
-    def _enhance_plan_with_missing_parts(self, plan, current_count):
-        """Adds missing parts to complete the 5-part structure."""
-        missing_parts = []
-        part_templates = {
-            1: "PART 1: HEADER & NAVIGATION\n- Main header with branding/logo\n- Navigation menu structure\n- Search functionality (if applicable)\n- User account controls",
-            2: "PART 2: HERO SECTION / MAIN CONTENT AREA\n- Primary content area layout\n- Key visual elements\n- Call-to-action components\n- Content hierarchy",
-            3: "PART 3: FEATURE SECTIONS / CONTENT BLOCKS\n- Secondary content areas\n- Feature highlights\n- Information organization\n- Interactive elements",
-            4: "PART 4: SIDEBAR / SUPPORTING CONTENT\n- Secondary navigation\n- Related content\n- Widgets or tools\n- Additional functionality",
-            5: "PART 5: FOOTER & FINAL ELEMENTS\n- Footer structure\n- Contact information\n- Legal links\n- Social media integration"
-        }
-        
-        for i in range(1, 6):
-            if f"PART {i}" not in plan.upper():
-                missing_parts.append(part_templates[i])
+
+    def _validate_and_enhance_plan(self, plan, task_description):
+        """Parses the planner output into a Plan and fills any missing parts."""
+        plan = Plan.parse(plan).complete()
         
-        if missing_parts:
-            plan += "\n\n" + "\n\n".join(missing_parts)
+        if plan.missing_parts:
+            print(f"  [Warning: Plan has only {5 - len(plan.missing_parts)} parts, expected 5. Enhancing...]")
         
         return plan
     
     def _generate_fallback_plan(self, task_description):
         """Generates a basic fallback plan if the API call fails."""
-        return f"""PLAN FOR: {task_description}
-
-        PART 1: HEADER & NAVIGATION
-        - Main header with branding/logo area
-        - Primary navigation menu
-        - Search functionality
-        - User account controls
-
-        PART 2: HERO SECTION / MAIN CONTENT AREA
-        - Primary content area layout
-        - Key visual elements
-        - Call-to-action components
-        - Content hierarchy
-
-        PART 3: FEATURE SECTIONS / CONTENT BLOCKS
-        - Secondary content areas
-        - Feature highlights
-        - Information organization
-        - Interactive elements
-
-        PART 4: SIDEBAR / SUPPORTING CONTENT
-        - Secondary navigation
-        - Related content
-        - Widgets or tools
-        - Additional functionality
-
-        PART 5: FOOTER & FINAL ELEMENTS
-        - Footer structure
-        - Contact information
-        - Legal links
-        - Social media integration"""
-
-    def generate_part_tool(self, part_number, plan):
+        parts = {number: PlanPart(number, title, list(components)) for number, (title, components) in DEFAULT_PARTS.items()}
+        return Plan(f"PLAN FOR: {task_description}", parts).complete()
+
+    def generate_part_tool(self, part_number, plan, writer=None):
         """
         Enhanced prompt generation for creating specific parts of a web page.
         Uses structured prompting to ensure high-quality, consistent output.
+        The response is streamed through the sanitizer; cleaned chunks go
+        straight to the writer when one is given.
         """
         print(f"  [Agent Generating Part {part_number}]")
+        messages = self._part_messages(part_number, plan)
         
-        # Extract part-specific context from plan
-        part_context = self._extract_part_context(plan, part_number)
-
-        css_patterns = self._get_css_patterns(part_number)  
-        
-        # Enhanced prompt with clear structure and requirements
-        prompt = f"""You are an expert front-end developer. Generate Part {part_number} of a web page.
-
-        CONTEXT FROM PLAN:
-        {part_context}
-
-        FULL PLAN REFERENCE:
-        {plan}
-
-        MODERN CSS PATTERNS TO USE:                                                                                                                                                                                                                  
-        {css_patterns}  
-
-        TECHNICAL REQUIREMENTS:
-        1. Generate ONLY the HTML structure and CSS styles for Part {part_number}
-        2. Use semantic HTML5: <header>, <nav>, <main>, <section>, <article>, <aside>, <footer>, etc.
-        3. CSS must be wrapped in <style> tags within the component
-        4. Use CSS Grid or Flexbox for layouts (prefer Grid for 2D layouts, Flexbox for 1D)
-        5. Implement mobile-first responsive design with media queries
-        6. Use CSS custom properties (variables) for colors, spacing, and typography
-        7. Apply BEM naming convention: block__element--modifier
-        8. Include smooth transitions (transition: all 0.3s ease) for interactive elements
-        9. Add hover states for clickable elements
-        10. Include proper ARIA attributes: aria-label, aria-labelledby, role where needed
-        11. Use rem/em units for scalable typography and spacing
-        12. Ensure proper color contrast (WCAG AA minimum)
-        13. Include focus states for keyboard navigation
-
-        CODE QUALITY:
-        - No JavaScript code
-        - No markdown code blocks (no ```html or ```)
-        - No explanatory text or comments
-        - Self-contained component (all styles included)
-        - Valid HTML5 syntax
-        - Clean, readable indentation (2 spaces)
-        - Production-ready code
-
-        OUTPUT FORMAT:
-        Return ONLY the HTML code with embedded <style> tags. Start directly with the opening tag (e.g., <section>, <header>, <div>).
-
-        Generate Part {part_number} now:"""
-        
-        response = ollama.chat(model=self.model_name, messages=[{"role": "user", "content": prompt}])
-        content = response['message']['content']
-        
-        # Clean up common LLM formatting issues
-        content = self._clean_generated_code(content)
+        content = self._stream_part(f"llm.part_{part_number}", part_number, messages, writer=writer)
         print("==========content============")
         print(content)
         return content
 
+    def _stream_part(self, span_name, part_number, messages, options=None, writer=None):
+        """
+        Streams a part through the sanitizer and the root-close tracker. The
+        stream is closed as soon as the part's markup is complete, so the
+        model never gets to write its trailing explanation; stop sequences
+        are the backstop for streams the tracker cannot cut.
+        """
+        prompt = "\n".join(message['content'] for message in messages)
+        options = dict(options or {}, stop=STOP_SEQUENCES)
+        if self._part_num_ctx:
+            # Every part call uses the same num_ctx: a different one reloads the model and drops the cache
+            options['num_ctx'] = self._part_num_ctx
+        options = self.budgets.options("part", prompt, options, part_number, self.model_name)
+        with self.tracer.span(span_name, cat="llm", model=self.model_name) as span:
+            started = time.perf_counter()
+            stream = ollama.chat(model=self.model_name, messages=messages, stream=True, options=options,
+                                 **self.residency.chat_options(self.model_name))
+
+            # Clean up common LLM formatting issues as the tokens arrive
+            sanitizer = StreamingSanitizer()
+            tracker = RootCloseTracker()
+            pieces = []
+            received = []
+            chunk = None
+            for chunk in stream:
+                if not received:
+                    span.mark("first_token_ms")
+                    self.first_tokens.append((part_number, count_tokens(prompt), time.perf_counter() - started))
+                received.append(chunk['message']['content'])
+                pieces.append(tracker.feed(sanitizer.feed(received[-1])))
+                if writer:
+                    writer.write(pieces[-1])
+                if tracker.done or tracker.peek(sanitizer.pending):
+                    break
+            if tracker.done:
+                # Dropping the HTTP stream makes the server stop generating
+                close = getattr(stream, 'close', None)
+                if close:
+                    close()
+            else:
+                pieces.append(tracker.feed(sanitizer.finish()) + tracker.finish())
+                if writer:
+                    writer.write(pieces[-1])
+            if writer:
+                writer.flush()
+            content = "".join(pieces)
+
+            # Received-but-unused text: preamble, fences and trailing prose
+            discarded = max(0, count_tokens("".join(received)) - count_tokens(content))
+            avoided = 0
+            if tracker.done:
+                avoided = sorted(self.tail_tokens)[len(self.tail_tokens) // 2] if self.tail_tokens else None
+                print(f"  [Part {part_number}: stopped after </{tracker.root}>, {discarded} tokens discarded, "
+                      f"stream cancelled ({f'~{avoided}' if avoided is not None else 'unknown'} tokens avoided)]")
+            else:
+                if tracker.keep_end:
+                    self.tail_tokens.append(discarded)
+                print(f"  [Part {part_number}: stream ended on its own, {discarded} tokens discarded]")
+            final = chunk if not tracker.done else None
+            span.llm(final, prompt=prompt, output=content)
+            # A cancelled stream needed exactly what it sent before the root closed
+            self._record_budget(span, "part", part_number, options, final, "".join(received))
+            span.set(chars_in=sanitizer.chars_in, chars_out=len(content), stopped_at_root=tracker.done,
+                     tokens_discarded=discarded, tokens_avoided_est=avoided)
+        return self._expand_macros(part_number, content)
+
+    def _expand_macros(self, part_number, html):
+        """Expands the part's repetition macros locally (one card template instead of N cards)."""
+        expanded, stats = expand_macros(html)
+        if stats['macros']:
+            saved = max(0, count_tokens(expanded) - count_tokens(html))
+            errors = f", {len(stats['errors'])} invalid" if stats['errors'] else ""
+            print(f"  [Part {part_number}: {stats['macros']} repeat macros expanded into {stats['copies']} copies, "
+                  f"~{saved} output tokens saved{errors}]")
+        return expanded
+
+    def _shared_prefix_message(self, plan):
+        """
+        Part requests share one long system message (instructions, full plan,
+        design tokens) and differ only in a short user message, so the server
+        finds the plan already in its prompt cache from the previous part
+        instead of prefilling it again.
+        """
+        shared = PROMPTS.render("part_shared", plan=plan.to_text(), design_tokens=plan.tokens_css())
+        if shared != self._shared_prefix:
+            self._shared_prefix = shared
+            tokens = count_tokens(shared)
+            self._part_num_ctx = context_size(tokens + PART_SUFFIX_TOKENS,
+                                              max(self.budgets.budget("part", n)[0] for n in range(1, 6)))
+            print(f"  [Prompt part_shared.v{PROMPTS['part_shared'].version}: {tokens} tokens shared by all parts, num_ctx={self._part_num_ctx}]")
+        return {"role": "system", "content": shared}
+
+    def _part_messages(self, part_number, plan):
+        # Only this part's section and CSS patterns follow the shared prefix
+        suffix = self._render_prompt(
+            "part",
+            part_number=part_number,
+            part_context=self._extract_part_context(plan, part_number),
+            css_patterns=self._get_css_patterns(part_number)
+        )
+        return [self._shared_prefix_message(plan), {"role": "user", "content": suffix}]
+
+    def _prefill_report(self):
+        """
+        Estimates the prefill time the shared prefix saved on parts 2-5. Part 1
+        prefills it cold; its time to first token per prompt token predicts what
+        the later parts would have waited without the cache. Time to first
+        token stands in for prefill time because cancelled streams never
+        receive the server's timings.
+        """
+        by_part = {}
+        for part_number, tokens, seconds in self.first_tokens:
+            by_part.setdefault(part_number, []).append((tokens, seconds))
+        if 1 not in by_part or len(by_part) < 2:
+            return None
+        cold_rate = statistics.median(seconds / tokens for tokens, seconds in by_part[1])
+        cold = statistics.median(seconds for _, seconds in by_part[1])
+        warm, saved = [], 0.0
+        later = sorted(part_number for part_number in by_part if part_number != 1)
+        for part_number in later:
+            samples = by_part[part_number]
+            tokens = statistics.median(t for t, _ in samples)
+            seconds = statistics.median(s for _, s in samples)
+            warm.append(seconds)
+            saved += max(0.0, cold_rate * tokens - seconds)
+        print(f"  [Prefix cache: part 1 first token after {cold:.2f}s (cold), parts {later[0]}-{later[-1]} "
+              f"{statistics.mean(warm):.2f}s on average, ~{saved:.1f}s prefill saved]")
+        return saved
+
+    def sample_part_tool(self, part_number, plan):
+        """
+        Best-of-N generation: samples self.samples candidates for a part in
+        parallel (different temperatures and seeds), scores them locally and
+        keeps the best. A sequential repair call runs only when all fail.
+        """
+        print(f"  [Agent Sampling Part {part_number} x{self.samples}]")
+        messages = self._part_messages(part_number, plan)
+        failures = []
+
+        def sample(k):
+            options = {"temperature": SAMPLE_TEMPERATURES[k % len(SAMPLE_TEMPERATURES)], "seed": k + 1}
+            try:
+                return self._stream_part(f"llm.part_{part_number}.sample_{k}", part_number, messages, options)
+            except Exception as e:
+                failures.append(e)
+                return ""
+
+        with ThreadPoolExecutor(max_workers=self.samples) as pool:
+            candidates = list(pool.map(sample, range(self.samples)))
+        if len(failures) == self.samples:
+            raise failures[0]
+
+        tokens = list(plan.design_tokens)
+        html, score = best_candidate(candidates, part_number, tokens)
+        print(f"  [Part {part_number}: best of {self.samples} scored {score.score}, "
+              f"{sum(score_part(c, part_number, tokens).passed for c in candidates)} passed]")
+
+        if not score.passed:
+            repaired = self.repair_part_tool(part_number, html, score.errors + score.warnings, plan)
+            repaired_score = score_part(repaired, part_number, tokens)
+            print(f"  [Part {part_number}: repair scored {repaired_score.score}]")
+            if repaired_score.score > score.score:
+                html = repaired
+        return html
+
+    def repair_part_tool(self, part_number, html, problems, plan):
+        """
+        One targeted fix call listing the problems (the scorer's, or the
+        budgets the part breaks). It follows the same shared prefix as the
+        part calls, so only the problems and the part's code are prefilled.
+        """
+        problems = "\n".join(f"- {problem}" for problem in problems)
+        messages = [
+            self._shared_prefix_message(plan),
+            {"role": "user", "content": self._render_prompt("repair", part_number=part_number, problems=problems, html=html)}
+        ]
+        response = self._chat(f"llm.part_{part_number}.repair", stage="repair", kind=part_number, messages=messages,
+                              options={"num_ctx": self._part_num_ctx})
+        return self._expand_macros(part_number, clean_code(response['message']['content']))
+
+    def _part_spec(self, part_number, plan):
+        """Hash of everything a part's generation depends on."""
+        return part_spec_hash(plan, part_number, self.model_name, PROMPTS['part_shared'].sha,
+                              PROMPTS['part'].sha, self._get_css_patterns(part_number))
+
     def _get_css_patterns(self, part_number):                                                                                                                                                                                                
         """I provide specific CSS patterns that create modern UI"""                                                                                                                                                                          
         patterns = {                                                                                                                                                                                                                         
@@ -290,115 +416,228 @@ class RecursiveHTMLAgent:
             5: """Footer: display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 24px                                                                                                                              
                 Links: color: var(--text-secondary); text-decoration: none; font-size: 14px"""                                                                                                                                              
         }                                                                                                                                                                                                                                    
-        return patterns.get(part_number, "Use modern CSS with proper responsive design")  
+        return normalize_whitespace(patterns.get(part_number, "Use modern CSS with proper responsive design"))  
 
     def _extract_part_context(self, plan, part_number):
         """
-        Extracts the relevant section from the plan for the specific part number.
+        Returns the section of the plan for the specific part number.
         Helps the LLM focus on the right component.
         """
-        # Look for part-specific mentions in the plan
-        part_keywords = {
-            1: ["PART 1", "HEADER", "NAVIGATION", "header", "navigation", "logo", "menu"],
-            2: ["PART 2", "HERO", "MAIN CONTENT", "hero", "main", "primary", "call-to-action"],
-            3: ["PART 3", "FEATURE", "CONTENT BLOCKS", "feature", "secondary", "highlights"],
-            4: ["PART 4", "SIDEBAR", "SUPPORTING", "sidebar", "widget", "related"],
-            5: ["PART 5", "FOOTER", "FINAL", "footer", "contact", "legal", "social"]
-        }
-        
-        keywords = part_keywords.get(part_number, [])
-        lines = plan.split('\n')
-        relevant_lines = []
-        
-        for i, line in enumerate(lines):
-            if any(keyword.lower() in line.lower() for keyword in keywords):
-                # Include this line and next few lines for context
-                relevant_lines.extend(lines[max(0, i-1):min(len(lines), i+5)])
-        
-        if relevant_lines:
-            return '\n'.join(relevant_lines[:15])  # Limit to 15 lines
-        else:
-            return f"Part {part_number} component based on the overall plan structure."
-    
+        return plan.part_section(part_number)
+
     def _clean_generated_code(self, code):
         """
         Cleans up common formatting issues from LLM-generated code.
         """
-        # Remove markdown code blocks
-        code = re.sub(r'```html\s*', '', code)
-        code = re.sub(r'```\s*', '', code)
-        
-        # Remove common explanatory prefixes
-        code = re.sub(r'^(Here\'s|Here is|Here\'s the|The code|Code for).*?:\s*', '', code, flags=re.IGNORECASE | re.MULTILINE)
-        
-        # Remove leading/trailing whitespace but preserve structure
-        code = code.strip()
-        
-        # Ensure it starts with an HTML tag
-        if not code.strip().startswith('<'):
-            # Try to find first HTML tag
-            match = re.search(r'<[^>]+>', code)
-            if match:
-                code = code[match.start():]
-        
-        return code
+        return clean_code(code)
 
     # --- NEW LLM-BASED DEBUG TOOL ---
     def debug_tool(self, code):
         """Uses the LLM to scan for syntax and structural errors."""
         print("  [LLM is inspecting the code for bugs...]")
         
-        prompt = f"""
-        Act as a Senior Web Developer. Review the following HTML code for errors.
-        If the code is valid, respond with exactly: "VALID".
-        If there are errors (missing tags, broken CSS, logic flaws), respond with "ERROR:" followed by a brief instruction on how to fix it.
+        prompt = self._render_prompt("debug", code=code)
         
-        CODE TO REVIEW:
-        {code}
-        """
-        
-        response = ollama.chat(model=self.model_name, messages=[{"role": "user", "content": prompt}])
+        response = self._chat("llm.debug", stage="debug", messages=[{"role": "user", "content": prompt}])
         review = response['message']['content'].strip()
         return review
 
-    def run_recursive_logic(self, goal):
-        # 1. Plan
-        full_plan = self.plan_tool(goal)
+    def produce_part(self, part_number, plan, writer=None, checkpoint=None):
+        """
+        One part of the page: from the checkpoint, from the part cache when
+        its spec is unchanged, or freshly generated (sampled or streamed).
+        """
+        spec = self._part_spec(part_number, plan)
+        if checkpoint and part_number in checkpoint.parts:
+            print(f"  [Checkpoint: reusing part {part_number}]")
+            checkpoint.resumed_stages.append(f"part_{part_number}")
+            html = checkpoint.parts[part_number]
+            if writer:
+                writer.write(html)
+        elif spec in self.part_cache:
+            print(f"  [Part {part_number}: spec unchanged, reusing the cached part]")
+            self.reused_parts.append(part_number)
+            html = self.part_cache.get(spec)
+            if writer:
+                writer.write(html)
+            if checkpoint:
+                checkpoint.save_part(part_number, html)
+        else:
+            with self.tracer.span(f"part_{part_number}.generate", part=part_number, samples=self.samples):
+                if self.samples > 1:
+                    html = self.sample_part_tool(part_number, plan)
+                    if writer:
+                        writer.write(html)
+                        writer.flush()
+                else:
+                    html = self.generate_part_tool(part_number, plan, writer)
+            # Only parts that pass the local checks are worth reusing
+            if score_part(html, part_number, plan.design_tokens).passed:
+                self.part_cache.put(spec, html, part_number)
+            if checkpoint:
+                checkpoint.save_part(part_number, html)
+        self.parts[part_number] = html
+        if self.preview:
+            self.preview.push_part(part_number, html)
+        return html
+
+    def enforce_budgets(self, plan, assemble):
+        """
+        Checks the page built by assemble() (from self.parts) against the
+        performance budgets and sends the parts blamed for a breach back for
+        one repair call each. A repair is kept only when it breaks fewer
+        budgets and scores no worse than the part it replaces. Returns the
+        final page.
+        """
+        html = assemble()
+        for round_number in range(BUDGET_REPAIR_ROUNDS + 1):
+            report = check_page(self.parts, html, self.perf_budgets)
+            self.budget_report = report
+            if report.passed or not report.blame or round_number == BUDGET_REPAIR_ROUNDS:
+                break
+            print(f"  [Perf Budget: {report.summary()}; repairing parts {', '.join(map(str, sorted(report.blame)))}]")
+            repaired_any = False
+            for part_number, problems in sorted(report.blame.items()):
+                with self.tracer.span(f"part_{part_number}.budget_repair", problems=len(problems)):
+                    try:
+                        repaired = self.repair_part_tool(part_number, self.parts[part_number], problems, plan)
+                    except Exception as e:
+                        print(f"  [Perf Budget: repair of part {part_number} failed: {str(e)}]")
+                        continue
+                remaining = part_problems(measure(repaired), report.breaches, len(self.parts))
+                scores = [score_part(html, part_number, plan.design_tokens).score
+                          for html in (self.parts[part_number], repaired)]
+                if len(remaining) >= len(problems) or scores[1] < scores[0]:
+                    print(f"  [Perf Budget: kept part {part_number}, the repair did not help]")
+                    continue
+                self.parts[part_number] = repaired
+                self.part_cache.put(self._part_spec(part_number, plan), repaired, part_number)
+                if part_number in self.reused_parts:
+                    self.reused_parts.remove(part_number)
+                if self.preview:
+                    self.preview.push_part(part_number, repaired)
+                repaired_any = True
+            if not repaired_any:
+                break
+            html = assemble()
+        print(f"  [Perf Budget: {self.budget_report.summary()} ({self.budget_report.metrics['dom_nodes']} nodes, "
+              f"{self.budget_report.metrics['css_bytes']} CSS bytes)]")
+        return html
+
+    def run_recursive_logic(self, goal, writer=None, checkpoint=None):
+        # 1. Plan (resumed from the checkpoint when available)
+        if checkpoint and checkpoint.plan:
+            print("  [Checkpoint: reusing plan]")
+            checkpoint.resumed_stages.append("plan")
+            full_plan = Plan.parse(checkpoint.plan).complete()
+        else:
+            with self.tracer.span("plan"):
+                full_plan = self.plan_tool(goal)
+            if checkpoint:
+                checkpoint.save_plan(full_plan.to_dict())
+        if self.preview:
+            self.preview.push_style(full_plan.tokens_css())
         
-        # 2. Generate Parts
+        # 2. Generate Parts (written to disk while they stream in)
+        self.first_tokens = []
+        self.reused_parts = []
+        if writer:
+            writer.write("<!DOCTYPE html>\n<html>\n")
         for i in range(1, 6):
-            self.parts[i] = self.generate_part_tool(i, full_plan)
+            if writer and i > 1:
+                writer.write("\n")
+            self.produce_part(i, full_plan, writer, checkpoint)
+        if writer:
+            writer.write("\n</html>")
+            writer.flush()
+        self._prefill_report()
+        if self.reused_parts:
+            regenerated = [i for i in sorted(self.parts) if i not in self.reused_parts]
+            print(f"  [Incremental: reused parts {', '.join(map(str, self.reused_parts))}, "
+                  f"regenerated {', '.join(map(str, regenerated)) or 'none'}]")
         
-        # 3. Combine
-        full_html = "<!DOCTYPE html>\n<html>\n" + "\n".join(self.parts.values()) + "\n</html>"
+        # 3. Combine: hoist and dedupe styles, strip nested wrappers, minify
+        assembler = PageAssembler(minify=True)
+        # Next to the page file, the deferred CSS gets its own stylesheet; otherwise it ends <body>
+        deferred_path = os.path.splitext(writer.file_path)[0] + ".css" if writer else None
+
+        def assemble():
+            return assembler.assemble(
+                [self.parts[i] for i in sorted(self.parts)],
+                head=f"<style>{full_plan.tokens_css()}</style>",
+                title=goal,
+                critical_parts=CRITICAL_PARTS,
+                deferred_href=os.path.basename(deferred_path) if deferred_path else None
+            )
+
+        with self.tracer.span("assemble") as span:
+            # Parts that break a performance budget are repaired and reassembled
+            full_html = self.enforce_budgets(full_plan, assemble)
+            span.set(**assembler.stats)
+        print(f"  [Assembled: {assembler.stats['input_bytes']} -> {assembler.stats['output_bytes']} bytes, "
+              f"{assembler.stats['css_rules_in']} -> {assembler.stats['css_rules_out']} CSS rules, "
+              f"{assembler.stats['critical_css_bytes']} bytes critical CSS inlined, "
+              f"{assembler.stats['deferred_css_bytes']} deferred]")
+        if writer:
+            with self.tracer.span("write", bytes=len(full_html)):
+                writer.rewrite(full_html)
+                if assembler.deferred_css:
+                    with open(deferred_path, "w", encoding="utf-8") as f:
+                        f.write(assembler.deferred_css)
+        if self.preview:
+            # The browser swaps the part snapshots for the assembled page
+            assets = {os.path.basename(deferred_path): assembler.deferred_css} if deferred_path else None
+            self.preview.replace_page(full_html, assets)
         
-        # 4. LLM Debug Loop
-        debug_feedback = self.debug_tool(full_html)
+        # 4. LLM Debug Loop, over the regenerated parts only when others were reused
+        changed = [self.parts[i] for i in sorted(self.parts) if i not in self.reused_parts]
+        if not changed:
+            print("  [Validation skipped: every part was reused]")
+            return full_html
+        with self.tracer.span("validate", parts=len(changed)):
+            debug_feedback = self.debug_tool("\n".join(changed) if self.reused_parts else full_html)
         
         if "ERROR" in debug_feedback.upper() and 0:
             print(f"  [Bug Found]: {debug_feedback}")
             # Recursively call the generator with the feedback to fix it
             print("  [Attempting automatic fix...]")
             prompt = f"Fix this HTML based on this feedback: {debug_feedback}\n\nHTML:\n{full_html}"
-            fix_response = ollama.chat(model=self.model_name, messages=[{"role": "user", "content": prompt}])
-            full_html = fix_response['message']['content']
+            fix_response = self._chat("llm.fix", stage="fix", messages=[{"role": "user", "content": prompt}])
+            full_html = self._clean_generated_code(fix_response['message']['content'])
+            if writer:
+                writer.rewrite(full_html)
+            if self.preview:
+                self.preview.replace_page(full_html)
         else:
             print("  [Code Verified by LLM]")
 
         return full_html
 
-    def execute(self, user_goal):
-        final_code = self.run_recursive_logic(user_goal)
-        
+    def execute(self, user_goal, preview=True, headless=None, trace_path="pipeline_trace.json"):
         file_path = "llm_debugged_page.html"
-        with open(file_path, "w") as f:
-            # Clean up potential markdown formatting from LLM response
-            clean_code = final_code.replace("```html", "").replace("```", "")
-            f.write(clean_code)
-        
-        webbrowser.open(f"file://{os.path.realpath(file_path)}")
+        with self.tracer.span("execute", goal=user_goal, model=self.model_name):
+            # The model loads while the preview server and plan library start up
+            self.residency.warm(self.model_name, self.tracer)
+            # The live preview shows each part as soon as it is generated
+            self.preview = PreviewServer(title=user_goal, headless=headless).start() if preview else None
+            try:
+                with StreamingPageWriter(file_path) as writer:
+                    self.run_recursive_logic(user_goal, writer)
+            finally:
+                if self.preview:
+                    self.preview.stop()
+
+            if not preview:
+                with self.tracer.span("browser_launch"):
+                    webbrowser.open(f"file://{os.path.realpath(file_path)}")
+
+        if trace_path and self.tracer.save(trace_path):
+            print(f"  [Trace: {trace_path} (open in ui.perfetto.dev)]")
+            for name, count, total_ms in self.tracer.summary()[:8]:
+                print(f"    {name:<20} {count:>3}x {total_ms / 1000:>8.2f}s")
 
 # Start
-#agent = RecursiveHTMLAgent("qwen3-coder")
-agent = RecursiveHTMLAgent("deepseek-coder-v2")
-agent.execute("just show me a youtube.com front page no sidebar")
+if __name__ == "__main__":
+    #agent = RecursiveHTMLAgent("qwen3-coder")
+    agent = RecursiveHTMLAgent("deepseek-coder-v2")
+    agent.execute("just show me a youtube.com front page no sidebar")
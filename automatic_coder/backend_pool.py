@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import ollama
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "http://127.0.0.1:11434"
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Endpoint:
+    """One ollama host with its in-flight count, health and latency window."""
+
+    def __init__(self, host, window=200):
+        self.host = host
+        self.client = ollama.AsyncClient(host=host)
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+
+    def __repr__(self):
+        return f"Endpoint({self.host}, outstanding={self.outstanding}, healthy={self.healthy})"
+
+
+class BackendPool:
+    """
+    Routes chat calls over several ollama hosts.
+
+    - least outstanding requests among healthy endpoints
+    - background health checks (GET /api/tags) bring endpoints back
+    - optional hedging: when the primary is slower than the observed p95,
+      the same request goes to a second endpoint; the first answer wins and
+      the loser is cancelled
+
+    Exposes chat() with the same signature as ollama.AsyncClient.chat, so it
+    can replace the client in the agents.
+    """
+
+    def __init__(self, hosts=None, hedge=False, hedge_percentile=95, hedge_min_samples=20,
+                 health_interval=15.0, health_timeout=2.0, unhealthy_after=2):
+        hosts = hosts or [DEFAULT_HOST]
+        self.endpoints = [Endpoint(host) for host in hosts]
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.unhealthy_after = unhealthy_after
+        self.latencies = deque(maxlen=500)
+        self.stats = {'requests': 0, 'hedges_sent': 0, 'hedges_won': 0, 'failovers': 0}
+        self._lock = threading.Lock()
+        self._health_task = None
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Hosts from $OLLAMA_HOSTS (comma separated), else $OLLAMA_HOST."""
+        hosts = os.environ.get("OLLAMA_HOSTS") or os.environ.get("OLLAMA_HOST") or DEFAULT_HOST
+        return cls([h.strip() for h in hosts.split(",") if h.strip()], **kwargs)
+
+    def pick(self, exclude=()):
+        """Healthy endpoint with the fewest outstanding requests."""
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude and e.healthy]
+            if not candidates:
+                # Everything looks down: still try the least loaded one
+                candidates = [e for e in self.endpoints if e not in exclude]
+            if not candidates:
+                return None
+            endpoint = min(candidates, key=lambda e: (e.outstanding, percentile(e.latencies, 50) or 0.0))
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def hedge_delay(self):
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        if sum(1 for e in self.endpoints if e.healthy) < 2:
+            return None
+        return percentile(self.latencies, self.hedge_percentile)
+
+    def _failed(self, endpoint, unhealthy=False):
+        with self._lock:
+            endpoint.consecutive_failures += 1
+            if unhealthy or endpoint.consecutive_failures >= self.unhealthy_after:
+                endpoint.healthy = False
+
+    async def _call(self, endpoint, kwargs):
+        started = time.monotonic()
+        try:
+            response = await endpoint.client.chat(**kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._failed(endpoint)
+            raise
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+        elapsed = time.monotonic() - started
+        with self._lock:
+            endpoint.consecutive_failures = 0
+            endpoint.healthy = True
+            endpoint.latencies.append(elapsed)
+            self.latencies.append(elapsed)
+        return response
+
+    async def _release_after(self, endpoint, stream):
+        """Yields the stream's chunks; the endpoint stays outstanding until it is drained or closed."""
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+
+    async def _open_stream(self, endpoint, kwargs):
+        """Streams are routed but never hedged; a host that fails to open one is skipped."""
+        tried = []
+        while True:
+            tried.append(endpoint)
+            try:
+                stream = await endpoint.client.chat(**kwargs)
+            except asyncio.CancelledError:
+                with self._lock:
+                    endpoint.outstanding -= 1
+                raise
+            except Exception:
+                with self._lock:
+                    endpoint.outstanding -= 1
+                self._failed(endpoint, unhealthy=True)
+                endpoint = self.pick(exclude=tried)
+                if endpoint is None:
+                    raise
+                self.stats['failovers'] += 1
+                logger.info(f"Retrying stream on {endpoint.host}")
+                continue
+            return self._release_after(endpoint, stream)
+
+    async def chat(self, **kwargs):
+        self._ensure_health_checks()
+        self.stats['requests'] += 1
+        primary = self.pick()
+
+        if kwargs.get('stream'):
+            return await self._open_stream(primary, kwargs)
+
+        tasks = {asyncio.ensure_future(self._call(primary, kwargs)): primary}
+        hedged = None
+        delay = self.hedge_delay()
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                secondary = self.pick(exclude=(primary,))
+                if secondary is not None:
+                    hedged = secondary
+                    self.stats['hedges_sent'] += 1
+                    logger.info(f"Hedging request to {secondary.host} after {delay:.2f}s")
+                    tasks[asyncio.ensure_future(self._call(secondary, kwargs))] = secondary
+
+        last_error = None
+        tried = list(tasks.values())
+        pending = set(tasks)
+        try:
+            while True:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            if tasks[task] is hedged:
+                                self.stats['hedges_won'] += 1
+                            return task.result()
+                        last_error = task.exception()
+                        with self._lock:
+                            # Out of rotation until a health check brings it back
+                            tasks[task].healthy = False
+                    if pending:
+                        self.stats['failovers'] += 1
+                # Every endpoint tried so far failed: move on to the next one
+                endpoint = self.pick(exclude=tried)
+                if endpoint is None:
+                    raise last_error
+                self.stats['failovers'] += 1
+                logger.info(f"Retrying request on {endpoint.host}")
+                tried.append(endpoint)
+                task = asyncio.ensure_future(self._call(endpoint, kwargs))
+                tasks[task] = endpoint
+                pending = {task}
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _ensure_health_checks(self):
+        if len(self.endpoints) < 2 and not self.hedge:
+            return
+        loop = asyncio.get_running_loop()
+        if self._health_task is None or self._health_task.done() or self._health_task.get_loop() is not loop:
+            self._health_task = loop.create_task(self._health_loop())
+
+    async def _health_loop(self):
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_interval)
+
+    async def check_health(self):
+        async def probe(endpoint):
+            try:
+                await asyncio.wait_for(endpoint.client.list(), timeout=self.health_timeout)
+                healthy = True
+            except Exception:
+                healthy = False
+            with self._lock:
+                if healthy and not endpoint.healthy:
+                    logger.info(f"Endpoint {endpoint.host} is healthy again")
+                endpoint.healthy = healthy
+                if healthy:
+                    endpoint.consecutive_failures = 0
+        await asyncio.gather(*(probe(e) for e in self.endpoints))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                **self.stats,
+                'p95': percentile(self.latencies, 95),
+                'endpoints': [
+                    {'host': e.host, 'healthy': e.healthy, 'outstanding': e.outstanding,
+                     'requests': e.requests, 'p50': percentile(e.latencies, 50)}
+                    for e in self.endpoints
+                ]
+            }
@@ -0,0 +1,132 @@
+"""
+Batch goal runner for RecursiveHTMLAgent.
+
+Reads goals from a JSONL file ({"goal": "...", "id": "optional"} per line),
+runs them through a worker pool and checkpoints plan and part state after
+every stage. Re-running the same command resumes unfinished goals.
+
+    python batch_runner.py goals.jsonl --out-dir batch_out --workers 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from checkpoint import Checkpoint
+from code_sanitizer import StreamingPageWriter
+from pipelines import load_script
+from part_cache import PartCache
+from plan_library import PlanLibrary
+from token_budget import TokenBudget
+
+AGENT_SCRIPT = "automatic_coder_v7.5.py"
+
+
+def read_goals(path):
+    goals = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                print(f"  [Skipping line {line_number}: {str(e)}]")
+                continue
+            if isinstance(record, str):
+                record = {'goal': record}
+            if not record.get('goal'):
+                print(f"  [Skipping line {line_number}: no goal]")
+                continue
+            record.setdefault('id', goal_id(record['goal']))
+            goals.append(record)
+    return goals
+
+
+def goal_id(goal):
+    """File-system friendly id: slug plus a short content hash."""
+    slug = re.sub(r'[^a-z0-9]+', '-', goal.lower()).strip('-')[:40]
+    digest = hashlib.sha1(goal.encode('utf-8')).hexdigest()[:8]
+    return f"{slug}-{digest}"
+
+
+def run_goal(agent_class, model_name, shared, record, out_dir, samples=1):
+    checkpoint_dir = os.path.join(out_dir, "checkpoints")
+    checkpoint = Checkpoint.load(os.path.join(checkpoint_dir, f"{record['id']}.json"), record['goal'])
+    output_path = os.path.join(out_dir, f"{record['id']}.html")
+    result = {'id': record['id'], 'goal': record['goal'], 'output': output_path}
+
+    if checkpoint.status == "done" and os.path.exists(output_path):
+        result.update(status="skipped", resumed_stages=[], seconds=0.0)
+        return result
+
+    started = time.time()
+    agent = agent_class(model_name, samples=samples, **shared)
+    try:
+        with StreamingPageWriter(output_path) as writer:
+            agent.run_recursive_logic(record['goal'], writer, checkpoint)
+        checkpoint.mark("done")
+        result['status'] = "done"
+    except Exception as e:
+        checkpoint.mark("failed", str(e))
+        result.update(status="failed", error=str(e))
+    result['resumed_stages'] = checkpoint.resumed_stages
+    result['seconds'] = round(time.time() - started, 2)
+    return result
+
+
+def run_batch(goals_path, out_dir, model_name, workers, samples=1):
+    os.makedirs(os.path.join(out_dir, "checkpoints"), exist_ok=True)
+    agent_class = load_script(AGENT_SCRIPT).RecursiveHTMLAgent
+    # Similar goals in one batch share plans, budgets and unchanged parts
+    shared = {
+        'plan_library': PlanLibrary(os.path.join(out_dir, "plan_library.json")),
+        'token_budget': TokenBudget(os.path.join(out_dir, "token_budgets.json")),
+        'part_cache': PartCache(os.path.join(out_dir, "part_cache.json"))
+    }
+    goals = read_goals(goals_path)
+    print(f"  [Batch: {len(goals)} goals, {workers} workers]")
+
+    results = []
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_goal, agent_class, model_name, shared, record, out_dir, samples) for record in goals]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"  [{result['status'].upper()}] {result['goal']} ({result['seconds']}s)")
+
+    summary = {
+        'goals': len(goals),
+        'done': sum(1 for r in results if r['status'] == "done"),
+        'skipped': sum(1 for r in results if r['status'] == "skipped"),
+        'failed': sum(1 for r in results if r['status'] == "failed"),
+        'seconds': round(time.time() - started, 2),
+        'results': sorted(results, key=lambda r: r['id'])
+    }
+    with open(os.path.join(out_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate one page per goal from a JSONL goal list.")
+    parser.add_argument("goals", help="JSONL file with one {\"goal\": ...} object per line")
+    parser.add_argument("--out-dir", default="batch_out")
+    parser.add_argument("--model", default="deepseek-coder-v2")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--samples", type=int, default=1, help="parallel candidates per part (best-of-N)")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(args.goals, args.out_dir, args.model, args.workers, args.samples)
+    print(f"  [Batch finished: {summary['done']} done, {summary['skipped']} skipped, {summary['failed']} failed]")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Deterministic pipeline benchmarks on recorded LLM cassettes.
+
+    python benchmark.py record                  # real model, writes cassettes/
+    python benchmark.py replay --repeat 5       # offline, measures non-LLM overhead
+    python benchmark.py replay --save-baseline  # store medians as the baseline
+    python benchmark.py replay --baseline benchmark_baseline.json --tolerance 0.25
+    python benchmark.py startup --baseline benchmark_baseline.json   # CLI cold start
+
+No cassettes or baseline ship with the repo: they hold one model's
+answers and one machine's timings. Record them once against a running
+ollama (`record`, optionally --pipelines/--goals to pick cases), then
+store a baseline from an offline replay on the machine that will run the
+comparison (`replay --save-baseline`). Commit cassettes/ and
+benchmark_baseline.json alongside if the comparison should run in CI.
+
+Replay and startup exit with status 1 when a case regresses past the
+baseline by more than the tolerance; replay also fails when no cassette
+was found.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from llm_cassette import Cassette, CassetteMiss
+from part_cache import PartCache
+from pipelines import load_script
+from plan_library import PlanLibrary
+from token_budget import TokenBudget
+from tracing import Tracer
+
+BENCH_GOALS = {
+    'youtube': "just show me a youtube.com front page no sidebar",
+    'baidu': "just show me baidu.com main page",
+    'login': "just show me a login page",
+    'robot': "just show me a robot dancing page"
+}
+
+# Regressions below this many milliseconds are treated as noise
+MIN_REGRESSION_MS = 5.0
+
+# Modules the CLI must not import before a pipeline is chosen
+HEAVY_MODULES = ('ollama', 'webbrowser', 'html_dom', 'prompt_compiler', 'automatic_coder_v7_5')
+CLI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+
+
+def _run_recursive(model_name, goal, tracer):
+    module = load_script("automatic_coder_v7.5.py")
+    with tempfile.TemporaryDirectory() as tmp:
+        # A fresh plan library, budget history and part cache keep recorded and replayed runs on the same path
+        agent = module.RecursiveHTMLAgent(model_name, plan_library=PlanLibrary(os.path.join(tmp, "plans.json")), tracer=tracer,
+                                          token_budget=TokenBudget(path=None), part_cache=PartCache(path=None))
+        return agent.run_recursive_logic(goal)
+
+
+def _run_frame(model_name, goal, tracer):
+    module = load_script("automatic_coder_v7.2.py")
+    return module.SimpleFrameAgent(model_name, tracer=tracer, token_budget=TokenBudget(path=None)).build_page(goal, mode="slots")
+
+
+PIPELINES = {
+    'recursive': _run_recursive,
+    'frame': _run_frame
+}
+
+
+def cassette_path(cassette_dir, pipeline, slug):
+    return os.path.join(cassette_dir, f"{pipeline}__{slug}.json.gz")
+
+
+def run_case(pipeline, model_name, goal, quiet=True):
+    """Runs one pipeline once. Returns (html, tracer, wall seconds)."""
+    tracer = Tracer(enabled=True)
+    output = io.StringIO() if quiet else sys.stdout
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        html = PIPELINES[pipeline](model_name, goal, tracer)
+    return html, tracer, time.perf_counter() - started
+
+
+def record(args):
+    """Records one cassette per case and replays it once to check it covers the run."""
+    failures = 0
+    for pipeline in args.pipelines:
+        for slug in args.goals:
+            path = cassette_path(args.cassette_dir, pipeline, slug)
+            with Cassette(path, mode="record").installed() as cassette:
+                html, _, wall = run_case(pipeline, args.model, BENCH_GOALS[slug], quiet=not args.verbose)
+            print(f"  [Recorded {path}: {len(cassette)} calls in {wall:.1f}s]")
+            # A cassette that cannot replay its own run would only fail later, in CI
+            try:
+                with Cassette(path, mode="replay").installed():
+                    replayed, _, _ = run_case(pipeline, args.model, BENCH_GOALS[slug])
+            except CassetteMiss as e:
+                print(f"  [Replay of {path} failed: {e.args[0]}]")
+                failures += 1
+                continue
+            if replayed != html:
+                print(f"  [Replay of {path} differs from the recorded run]")
+                failures += 1
+    return 1 if failures else 0
+
+
+def replay(args):
+    results = {}
+    for pipeline in args.pipelines:
+        for slug in args.goals:
+            path = cassette_path(args.cassette_dir, pipeline, slug)
+            if not os.path.exists(path):
+                print(f"  [Skipping {pipeline}/{slug}: no cassette at {path}]")
+                continue
+            walls, llm_times, stages = [], [], {}
+            # Untimed warm-up: script import and prompt compilation happen once per process
+            with Cassette(path, mode="replay").installed():
+                run_case(pipeline, args.model, BENCH_GOALS[slug])
+            for _ in range(args.repeat):
+                with Cassette(path, mode="replay", latency=args.latency).installed():
+                    _, tracer, wall = run_case(pipeline, args.model, BENCH_GOALS[slug], quiet=not args.verbose)
+                llm = sum(e[3] for e in tracer.events if e[1] == "llm") / 1e9
+                walls.append(wall)
+                llm_times.append(llm)
+                for name, _, total_ms in tracer.summary():
+                    if not name.startswith("llm."):
+                        stages.setdefault(name, []).append(total_ms)
+            overhead = [w - l for w, l in zip(walls, llm_times)]
+            results[f"{pipeline}/{slug}"] = {
+                'wall_ms': round(statistics.median(walls) * 1000, 2),
+                'llm_ms': round(statistics.median(llm_times) * 1000, 2),
+                'overhead_ms': round(statistics.median(overhead) * 1000, 2),
+                'stages_ms': {name: round(statistics.median(v), 2) for name, v in stages.items()}
+            }
+
+    if not results:
+        print(f"  [No cassettes in {args.cassette_dir}: run `python benchmark.py record` first]")
+        return 1
+
+    print(f"{'case':<20} {'wall ms':>9} {'llm ms':>9} {'overhead ms':>12}  slowest stage")
+    for case, row in results.items():
+        slowest = max(row['stages_ms'].items(), key=lambda kv: kv[1], default=("-", 0))
+        print(f"{case:<20} {row['wall_ms']:>9} {row['llm_ms']:>9} {row['overhead_ms']:>12}  {slowest[0]} ({slowest[1]} ms)")
+
+    return finish(results, args)
+
+
+def startup(args):
+    """Cold-start time of `cli.py --list` in fresh interpreters."""
+    probe = (f"import sys; sys.path.insert(0, {os.path.dirname(CLI_PATH)!r}); import cli; cli.main(['--list']); "
+             f"print('LOADED', [m for m in {HEAVY_MODULES!r} if m in sys.modules])")
+    loaded = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+    heavy = loaded.rsplit('LOADED', 1)[-1].strip()
+    if heavy != "[]":
+        print(f"  [Startup imports heavy modules: {heavy}]")
+        return 1
+
+    walls = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, CLI_PATH, "--list"], capture_output=True, check=True)
+        walls.append(time.perf_counter() - started)
+    wall_ms = round(statistics.median(walls) * 1000, 2)
+    print(f"{'cli --list cold start':<24} {wall_ms:>9} ms (median of {args.repeat})")
+    return finish({'startup/cli': {'wall_ms': wall_ms, 'overhead_ms': wall_ms}}, args)
+
+
+def finish(results, args):
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"  [Baseline saved to {args.baseline}]")
+        return 0
+    return compare(results, args.baseline, args.tolerance)
+
+
+def compare(results, baseline_path, tolerance):
+    if not baseline_path or not os.path.exists(baseline_path):
+        return 0
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = 0
+    for case, row in results.items():
+        if case not in baseline:
+            continue
+        before, after = baseline[case]['overhead_ms'], row['overhead_ms']
+        if after > before * (1 + tolerance) and after - before > MIN_REGRESSION_MS:
+            regressions += 1
+            print(f"  [Regression {case}: overhead {before} -> {after} ms]")
+    if regressions:
+        return 1
+    print(f"  [No regressions against {baseline_path}]")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record/replay benchmarks for the page pipelines.")
+    parser.add_argument("mode", choices=["record", "replay", "startup"])
+    parser.add_argument("--model", default="deepseek-coder-v2")
+    parser.add_argument("--pipelines", nargs="+", choices=sorted(PIPELINES), default=sorted(PIPELINES))
+    parser.add_argument("--goals", nargs="+", choices=sorted(BENCH_GOALS), default=sorted(BENCH_GOALS))
+    parser.add_argument("--cassette-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "cassettes"))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", default=0.0, help='seconds per replayed call, or "recorded"')
+    parser.add_argument("--baseline", default="benchmark_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative overhead growth")
+    parser.add_argument("--output", help="write replay results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline output")
+    args = parser.parse_args(argv)
+    if args.latency != "recorded":
+        args.latency = float(args.latency)
+
+    if args.mode == "record":
+        return record(args)
+    if args.mode == "startup":
+        return startup(args)
+    return replay(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import json
+import os
+import time
+
+
+class Checkpoint:
+    """
+    On-disk state of one goal's run: the plan and every finished part.
+    Saved after each stage so a failed or interrupted run can resume
+    without repeating completed LLM calls.
+    """
+
+    def __init__(self, path, goal):
+        self.path = path
+        self.goal = goal
+        self.plan = None
+        self.parts = {}
+        self.status = "pending"
+        self.error = None
+        self.updated = None
+        self.resumed_stages = []
+
+    @classmethod
+    def load(cls, path, goal):
+        checkpoint = cls(path, goal)
+        if not os.path.exists(path):
+            return checkpoint
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"  [Checkpoint: ignoring unreadable {path}: {str(e)}]")
+            return checkpoint
+        if data.get('goal') != goal:
+            # Same file name, different goal: start over
+            return checkpoint
+        checkpoint.plan = data.get('plan')
+        checkpoint.parts = {int(k): v for k, v in data.get('parts', {}).items()}
+        checkpoint.status = data.get('status', "pending")
+        checkpoint.error = data.get('error')
+        checkpoint.updated = data.get('updated')
+        return checkpoint
+
+    def save(self):
+        self.updated = time.time()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                'goal': self.goal,
+                'plan': self.plan,
+                'parts': {str(k): v for k, v in self.parts.items()},
+                'status': self.status,
+                'error': self.error,
+                'updated': self.updated
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def save_plan(self, plan_dict):
+        self.plan = plan_dict
+        self.save()
+
+    def save_part(self, part_number, html):
+        self.parts[part_number] = html
+        self.save()
+
+    def mark(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.save()
@@ -0,0 +1,68 @@
+"""
+Single entry point for every page pipeline.
+
+    python cli.py --list
+    python cli.py "just show me a login page"                         # default pipeline
+    python cli.py -p v7.2-frame --mode refine --no-preview "a login page"
+    python cli.py -p v6-enhanced-plan --deadline 1800 "youtube front page"
+
+Only the chosen pipeline's script is imported, so --list and --help start
+without loading ollama or any agent module.
+"""
+import argparse
+import sys
+
+from pipelines import DEFAULT_MODEL, PIPELINES, get_pipeline
+
+DEFAULT_PIPELINE = "v7.5-recursive"
+# Pipeline option name -> the flag that sets it
+OPTION_FLAGS = {
+    "preview": "--no-preview",
+    "headless": "--headless",
+    "mode": "--mode",
+    "deadline_seconds": "--deadline",
+    "samples": "--samples"
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate a web page with one of the agent pipelines.")
+    parser.add_argument("goal", nargs="?", help="what the page should be")
+    parser.add_argument("-p", "--pipeline", default=DEFAULT_PIPELINE, help=f"pipeline strategy (default {DEFAULT_PIPELINE})")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL)
+    parser.add_argument("--list", action="store_true", help="list the registered pipelines")
+    parser.add_argument("--no-preview", dest="preview", action="store_false", default=None,
+                        help="skip the live preview and open the finished file instead")
+    parser.add_argument("--headless", action="store_true", default=None, help="serve the preview without opening a browser")
+    parser.add_argument("--mode", choices=["slots", "refine"], help="v7.2 refinement mode")
+    parser.add_argument("--deadline", dest="deadline_seconds", type=float, help="overall deadline in seconds (v6)")
+    parser.add_argument("--samples", type=int, help="parallel candidates per part (best-of-N); the default 1 streams a single answer (v7.5)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, pipeline in PIPELINES.items():
+            marker = "*" if name == DEFAULT_PIPELINE else " "
+            print(f"{marker} {name:<18} {pipeline.description}")
+        return 0
+    if not args.goal:
+        parser.error("a goal is required (or use --list)")
+
+    try:
+        pipeline = get_pipeline(args.pipeline)
+    except KeyError as e:
+        parser.error(e.args[0])
+    options = {k: getattr(args, k) for k in OPTION_FLAGS}
+    unsupported = pipeline.unsupported(options)
+    if unsupported:
+        parser.error(f"{', '.join(OPTION_FLAGS[k] for k in unsupported)} not supported by pipeline {pipeline.name}")
+    pipeline.execute(args.goal, args.model, **options)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+import io
+import re
+
+# Chatty prefixes models put in front of code ("Here's the code:")
+CHATTY_PREFIX = re.compile(r'^(Here\'s|Here is|Here\'s the|The code|Code for).*?:\s*', re.IGNORECASE)
+FENCE = re.compile(r'```[a-zA-Z]*')
+
+PREAMBLE, BODY, DONE = "preamble", "body", "done"
+
+
+class StreamingSanitizer:
+    """
+    Small state machine that cleans LLM code output chunk by chunk.
+
+    preamble -> drops text and fences until the first '<'
+    body     -> passes markup through, strips fences and chatty prefixes
+    done     -> the closing fence was seen; everything after it is chatter
+
+    Only the current partial line is buffered, and lines that start with
+    markup are passed on before their newline arrives. Trailing whitespace
+    is held back until more content follows, so the output never ends in
+    whitespace, however the chunks are split.
+    """
+
+    def __init__(self):
+        self.state = PREAMBLE
+        self._pending = ""
+        self._held = ""
+        self._fenced = False
+        self._line_started = False
+        self.chars_in = 0
+        self.chars_out = 0
+
+    def feed(self, chunk):
+        """Consumes a chunk and returns the cleaned text that is safe to emit."""
+        self.chars_in += len(chunk)
+        self._pending += chunk
+        out = []
+        while "\n" in self._pending:
+            line, self._pending = self._pending.split("\n", 1)
+            out.append(self._process_line(line, complete=True))
+        if self._pending and self.state == BODY:
+            out.append(self._process_partial())
+        return self._count("".join(out))
+
+    def finish(self):
+        """Flushes the last partial line; trailing whitespace is dropped."""
+        out = ""
+        if self._pending:
+            out = self._process_line(self._pending, complete=False)
+            self._pending = ""
+        self._held = ""
+        return self._count(out.rstrip())
+
+    @property
+    def pending(self):
+        """Input held back until its line completes."""
+        return self._pending
+
+    def _count(self, text):
+        self.chars_out += len(text)
+        return text
+
+    def _emit(self, text, complete):
+        if not text.strip():
+            if self._line_started:
+                self._held += text
+            if complete:
+                self._held += "\n"
+                self._line_started = False
+            return ""
+        content = text.rstrip()
+        out = self._held + content
+        # Trailing whitespace waits for more content on the line or the next line
+        self._held = text[len(content):] + ("\n" if complete else "")
+        self._line_started = not complete
+        return out
+
+    def _process_partial(self):
+        # Hold back anything that might still turn into a fence or a prefix
+        if not self._line_started and not self._pending.lstrip().startswith("<"):
+            return ""
+        keep = len(self._pending) - len(self._pending.rstrip("`"))
+        text = self._pending[:len(self._pending) - keep]
+        self._pending = self._pending[len(text):]
+        return self._emit(FENCE.sub("", text), complete=False)
+
+    def _process_line(self, line, complete):
+        if self._line_started:
+            # Continuation of a line that was already emitted eagerly
+            return self._emit(FENCE.sub("", line), complete)
+
+        stripped = line.strip()
+        if self.state == DONE:
+            return ""
+
+        if stripped.startswith("```"):
+            if self.state == BODY and self._fenced:
+                self.state = DONE
+            else:
+                self._fenced = True
+            return ""
+
+        if self.state == PREAMBLE:
+            start = line.find("<")
+            if start < 0:
+                return ""
+            self.state = BODY
+            line = line[start:]
+        else:
+            line = CHATTY_PREFIX.sub("", line.lstrip()) if CHATTY_PREFIX.match(stripped) else line
+
+        return self._emit(FENCE.sub("", line), complete)
+
+
+# Elements that may sit around the part's component without being it
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr'
+}
+_TAG_NAME = re.compile(r'/?\s*([a-zA-Z][\w:-]*)')
+_RAW_END = {'script': re.compile(r'</script', re.IGNORECASE), 'style': re.compile(r'</style', re.IGNORECASE)}
+
+# Backstop for streams the tracker cannot cut: prose after a closing fence
+STOP_SEQUENCES = ["\n```\n\n", "\nExplanation:", "\n**Explanation", "\n### Explanation"]
+
+
+class RootCloseTracker:
+    """
+    Tracks open elements over sanitized streamed markup and decides when the
+    part is complete: no element is open after at least one closed and
+    the next non-blank text is not markup (prose, a fence, ...). Trailing
+    <style> blocks or sibling elements keep the stream going. Comments,
+    quoted attribute values and <script>/<style> bodies are skipped.
+
+    feed() returns the text that is safe to emit; once .done is set the
+    caller should stop reading (and close) the stream.
+    """
+
+    def __init__(self):
+        self.text = ""
+        # Open elements; an end tag closes up to its match like a browser does
+        self.stack = []
+        self.done = False
+        self.root = None
+        # End of the last complete top-level element
+        self.keep_end = 0
+        self._pos = 0
+        self._raw = None
+        self._emitted = 0
+
+    def feed(self, text):
+        if self.done:
+            return ""
+        self.text += text
+        self._scan()
+        safe_end = len(self.text) if self.stack or not self.keep_end else self.keep_end
+        out = self.text[self._emitted:safe_end]
+        self._emitted = max(self._emitted, safe_end)
+        return out
+
+    def finish(self):
+        """Releases what is still held back when the stream ended on its own."""
+        if self.done:
+            return ""
+        out = self.text[self._emitted:]
+        self._emitted = len(self.text)
+        return out
+
+    def peek(self, pending):
+        """
+        Looks at text the sanitizer still holds (a partial line): once the
+        markup is complete, a line that does not start with '<' ends it.
+        """
+        if not self.done and self.keep_end and not self.stack and pending.strip() and not pending.lstrip().startswith('<'):
+            self.done = True
+            self._pos = len(self.text)
+        return self.done
+
+    def _scan(self):
+        text, i = self.text, self._pos
+        while i < len(text) and not self.done:
+            if self._raw:
+                match = _RAW_END[self._raw].search(text, i)
+                if not match:
+                    # Keep enough text to see a split closing tag next time
+                    i = max(i, len(text) - len(self._raw) - 2)
+                    break
+                i = match.start()
+            elif not self.stack and self.keep_end:
+                while i < len(text) and text[i].isspace():
+                    i += 1
+                if i == len(text):
+                    break
+                if text[i] != '<':
+                    self.done = True
+                    break
+            else:
+                j = text.find('<', i)
+                if j < 0:
+                    i = len(text)
+                    break
+                i = j
+
+            if text.startswith('<!--', i):
+                end = text.find('-->', i + 4)
+                if end < 0:
+                    break
+                i = end + 3
+                continue
+            if len(text) - i < 4 and '<!--'.startswith(text[i:]):
+                break
+            end = self._tag_end(text, i)
+            if end < 0:
+                break
+            self._tag(text[i + 1:end], end + 1)
+            i = end + 1
+        self._pos = i
+
+    @staticmethod
+    def _tag_end(text, start):
+        quote = None
+        for i in range(start + 1, len(text)):
+            ch = text[i]
+            if quote:
+                if ch == quote:
+                    quote = None
+            elif ch in '"\'':
+                quote = ch
+            elif ch == '>':
+                return i
+        return -1
+
+    def _tag(self, body, end):
+        body = body.strip()
+        if not body or body[0] in '!?':
+            return
+        match = _TAG_NAME.match(body)
+        if not match:
+            return
+        name = match.group(1).lower()
+        if body.startswith('/'):
+            if self._raw == name:
+                self._raw = None
+            if name not in self.stack:
+                return
+            del self.stack[len(self.stack) - 1 - self.stack[::-1].index(name):]
+            if not self.stack:
+                self.keep_end = end
+            return
+        if self._raw or name in VOID_TAGS or body.endswith('/'):
+            return
+        if not self.stack and self.root is None and name not in ('style', 'script'):
+            self.root = name
+        self.stack.append(name)
+        if name in _RAW_END:
+            self._raw = name
+
+
+def clean_code(code):
+    """Runs a complete string through the streaming sanitizer."""
+    sanitizer = StreamingSanitizer()
+    return sanitizer.feed(code) + sanitizer.finish()
+
+
+class StreamingPageWriter:
+    """
+    Buffered writer for the output page. Text goes to disk as it is
+    generated, so the page exists while the run is still going.
+    """
+
+    def __init__(self, file_path, buffer_size=16 * 1024):
+        self.file_path = file_path
+        self.buffer_size = buffer_size
+        self.bytes_written = 0
+        self._file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self):
+        self._file = io.open(self.file_path, "w", encoding="utf-8", buffering=self.buffer_size)
+        self.bytes_written = 0
+        return self
+
+    def write(self, text):
+        if text:
+            self._file.write(text)
+            self.bytes_written += len(text)
+
+    def flush(self):
+        """Pushes buffered text to disk, e.g. once a part is complete."""
+        self._file.flush()
+
+    def rewrite(self, text):
+        """Replaces the whole page, e.g. after an LLM fix pass."""
+        self.close()
+        self.open()
+        self.write(text)
+        self.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
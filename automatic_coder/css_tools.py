@@ -0,0 +1,205 @@
+import re
+
+_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+_WHITESPACE = re.compile(r'\s+')
+_SELECTOR_COMBINATOR = re.compile(r'\s*([,>+~])\s*')
+_MIN_COMBINATOR = re.compile(r' ?([,>+~]) ?')
+
+# At-rules whose block holds ordinary rules (and is parsed recursively)
+NESTING_AT_RULES = ('@media', '@supports', '@layer', '@container', '@document')
+
+
+class Rule:
+    def __init__(self, selector, declarations):
+        self.selector = normalize_selector(selector)
+        # [(property, value, important)]
+        self.declarations = declarations
+
+    def properties(self):
+        return {prop for prop, _, _ in self.declarations}
+
+    def important(self):
+        return any(important for _, _, important in self.declarations)
+
+
+class AtRule:
+    def __init__(self, prelude, children=None, body=None):
+        self.prelude = _WHITESPACE.sub(" ", prelude).strip()
+        # Nesting at-rules have children; others (@font-face, @keyframes) keep the raw body
+        self.children = children
+        self.body = body
+
+
+class Statement:
+    """Block-less at-rule such as @import or @charset."""
+
+    def __init__(self, text):
+        self.text = _WHITESPACE.sub(" ", text).strip()
+
+
+def normalize_selector(selector):
+    selector = _WHITESPACE.sub(" ", selector).strip()
+    return _SELECTOR_COMBINATOR.sub(lambda m: m.group(1) if m.group(1) == ',' else f" {m.group(1)} ", selector)
+
+
+def _scan(text, start, stops):
+    """Returns the index of the first stop character outside strings/parens."""
+    depth, quote, i = 0, None, start
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if ch == '\\':
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in '"\'':
+            quote = ch
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth = max(0, depth - 1)
+        elif depth == 0 and ch in stops:
+            return i
+        i += 1
+    return len(text)
+
+
+def _matching_brace(text, start):
+    depth, i = 0, start
+    while i < len(text):
+        i = _scan(text, i, '{}')
+        if i >= len(text):
+            break
+        depth += 1 if text[i] == '{' else -1
+        if depth == 0:
+            return i
+        i += 1
+    return len(text)
+
+
+def parse_declarations(body):
+    declarations = []
+    i = 0
+    while i < len(body):
+        end = _scan(body, i, ';')
+        chunk = body[i:end].strip()
+        i = end + 1
+        if ':' not in chunk:
+            continue
+        prop, value = chunk.split(':', 1)
+        value = _WHITESPACE.sub(" ", value).strip()
+        important = value.lower().endswith('!important')
+        if important:
+            value = value[:-len('!important')].rstrip()
+        prop = prop.strip()
+        # Custom properties are case-sensitive
+        declarations.append((prop if prop.startswith('--') else prop.lower(), value, important))
+    return declarations
+
+
+def parse_stylesheet(text):
+    """Parses CSS into a list of Rule / AtRule / Statement items."""
+    text = _COMMENT.sub('', text)
+    items = []
+    i = 0
+    while i < len(text):
+        stop = _scan(text, i, '{;}')
+        prelude = text[i:stop].strip()
+        if stop >= len(text):
+            break
+        if text[stop] == '}':
+            # Stray closing brace
+            i = stop + 1
+            continue
+        if text[stop] == ';':
+            if prelude:
+                items.append(Statement(prelude + ';'))
+            i = stop + 1
+            continue
+        end = _matching_brace(text, stop)
+        body = text[stop + 1:end]
+        i = end + 1
+        if not prelude:
+            continue
+        lowered = prelude.lower()
+        if lowered.startswith(NESTING_AT_RULES):
+            items.append(AtRule(prelude, children=parse_stylesheet(body)))
+        elif lowered.startswith('@'):
+            items.append(AtRule(prelude, body=body))
+        else:
+            items.append(Rule(prelude, parse_declarations(body)))
+    return items
+
+
+def dedupe_rules(items):
+    """
+    Drops rules that a later rule in the same context fully overrides: same
+    selector and every property redeclared later (identical duplicates
+    included). !important rules are kept. Identical at-rule blocks keep only
+    their last copy.
+    """
+    kept = []
+    later_props = {}
+    later_blocks = set()
+    for item in reversed(items):
+        if isinstance(item, Rule):
+            props = item.properties()
+            seen = later_props.setdefault(item.selector, set())
+            if props and props <= seen and not item.important():
+                continue
+            seen |= props
+            if item.declarations:
+                kept.append(item)
+        elif isinstance(item, AtRule):
+            if item.children is not None:
+                item.children = dedupe_rules(item.children)
+                if not item.children:
+                    continue
+            key = serialize_stylesheet([item], minify=True)
+            if key in later_blocks:
+                continue
+            later_blocks.add(key)
+            kept.append(item)
+        else:
+            if item.text in later_blocks:
+                continue
+            later_blocks.add(item.text)
+            kept.append(item)
+    kept.reverse()
+    return kept
+
+
+def _minify_value(value):
+    if '"' in value or "'" in value:
+        return value
+    return re.sub(r'\s*,\s*', ',', value)
+
+
+def serialize_stylesheet(items, minify=False, indent=""):
+    out = []
+    for item in items:
+        if isinstance(item, Rule):
+            if minify:
+                decls = ";".join(f"{p}:{_minify_value(v)}{'!important' if imp else ''}" for p, v, imp in item.declarations)
+                selector = _MIN_COMBINATOR.sub(r'\1', item.selector)
+                out.append(f"{selector}{{{decls}}}")
+            else:
+                decls = "".join(f"{indent}  {p}: {v}{' !important' if imp else ''};\n" for p, v, imp in item.declarations)
+                out.append(f"{indent}{item.selector} {{\n{decls}{indent}}}\n")
+        elif isinstance(item, AtRule):
+            if item.children is not None:
+                inner = serialize_stylesheet(item.children, minify, indent + "  ")
+            else:
+                inner = _WHITESPACE.sub(" ", item.body).strip() if minify else item.body.strip()
+            if minify:
+                out.append(f"{item.prelude}{{{inner}}}")
+            else:
+                out.append(f"{indent}{item.prelude} {{\n{inner}\n{indent}}}\n")
+        else:
+            out.append(item.text if minify else f"{indent}{item.text}\n")
+    return "".join(out)
+
+
+def optimize_css(text, minify=True):
+    """Parses, dedupes and re-serializes a stylesheet."""
+    return serialize_stylesheet(dedupe_rules(parse_stylesheet(text)), minify=minify)
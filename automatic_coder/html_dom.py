@@ -0,0 +1,338 @@
+from functools import lru_cache
+from html import escape
+from html.parser import HTMLParser
+import re
+
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr'
+}
+RAW_TEXT_ELEMENTS = {'script', 'style'}
+PREFORMATTED = {'pre', 'textarea'}
+BLOCK_ELEMENTS = {
+    'html', 'head', 'body', 'header', 'footer', 'main', 'nav', 'section',
+    'article', 'aside', 'div', 'p', 'ul', 'ol', 'li', 'h1', 'h2', 'h3', 'h4',
+    'h5', 'h6', 'form', 'fieldset', 'table', 'thead', 'tbody', 'tfoot', 'tr',
+    'td', 'th', 'figure', 'figcaption', 'blockquote', 'hr', 'style', 'script',
+    'meta', 'link', 'title', 'template', 'dl', 'dt', 'dd', 'address', 'details',
+    'summary', 'dialog', 'noscript'
+}
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class Node:
+    """
+    Minimal DOM node. Elements have a tag; text and comment nodes use the
+    pseudo tags '#text' and '#comment' and keep their content in .text.
+    """
+
+    __slots__ = ('tag', 'attrs', 'children', 'parent', 'text')
+
+    def __init__(self, tag, attrs=None, text=None):
+        self.tag = tag
+        self.attrs = dict(attrs or {})
+        self.children = []
+        self.parent = None
+        self.text = text
+
+    @property
+    def is_element(self):
+        return not self.tag.startswith('#')
+
+    def append(self, child):
+        child.parent = self
+        self.children.append(child)
+        return child
+
+    def insert(self, index, child):
+        child.parent = self
+        self.children.insert(index, child)
+        return child
+
+    def remove(self):
+        if self.parent is not None:
+            self.parent.children.remove(self)
+            self.parent = None
+        return self
+
+    def unwrap(self):
+        """Replaces this node by its children."""
+        parent = self.parent
+        index = parent.children.index(self)
+        for child in self.children:
+            child.parent = parent
+        parent.children[index:index + 1] = self.children
+        self.children = []
+        self.parent = None
+
+    def iter(self):
+        """Depth-first walk over this node and all descendants."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def elements(self, *tags):
+        for node in self.iter():
+            if node.is_element and node.tag != '#root' and (not tags or node.tag in tags):
+                yield node
+
+    def classes(self):
+        return (self.attrs.get('class') or '').split()
+
+    def text_content(self):
+        return "".join(n.text for n in self.iter() if n.tag == '#text')
+
+    def select(self, selector):
+        """Descendant elements matching a CSS selector, in document order."""
+        alternatives = compile_selector(selector)
+        return [node for node in self.elements() if node is not self
+                and any(_matches(node, steps, len(steps) - 1) for steps in alternatives)]
+
+    def select_one(self, selector):
+        found = self.select(selector)
+        return found[0] if found else None
+
+    def depth(self):
+        depth, node = 0, self.parent
+        while node is not None and node.tag != '#root':
+            depth += 1
+            node = node.parent
+        return depth
+
+    def __repr__(self):
+        if self.is_element:
+            return f"<{self.tag} {self.attrs}>"
+        return f"{self.tag}({self.text[:20]!r})"
+
+
+_SIMPLE_SELECTOR = re.compile(r'''
+    (?P<tag>\*|[a-zA-Z][\w-]*)
+  | \#(?P<id>[\w-]+)
+  | \.(?P<cls>[\w-]+)
+  | \[\s*(?P<attr>[\w:-]+)\s*(?:(?P<op>[~^$*|]?=)\s*(?P<value>"[^"]*"|'[^']*'|[^\]\s]+)\s*)?\]
+  | :(?P<pseudo>first-child|last-child|first-of-type|last-of-type|nth-child|nth-of-type)(?:\(\s*(?P<arg>\d+)\s*\))?
+''', re.VERBOSE)
+_COMBINATOR = re.compile(r'\s*([>+~])\s*|\s+')
+
+
+@lru_cache(maxsize=256)
+def compile_selector(selector):
+    """
+    Compiles a CSS selector list into [[(combinator, compound), ...], ...].
+    Supports type, #id, .class, [attr], [attr=|~=|^=|$=|*=|\|=value],
+    :first/last-child, :first/last-of-type, :nth-child(n), :nth-of-type(n)
+    and the ' ', '>', '+', '~' combinators.
+    """
+    alternatives = []
+    steps, compound, combinator = [], [], None
+    text, i = selector.strip(), 0
+    while i <= len(text):
+        if i == len(text) or text[i] == ',':
+            if not compound:
+                raise ValueError(f"Invalid selector: {selector!r}")
+            steps.append((combinator, tuple(compound)))
+            alternatives.append(steps)
+            steps, compound, combinator = [], [], None
+            i += 1
+            while i < len(text) and text[i].isspace():
+                i += 1
+            continue
+        match = _COMBINATOR.match(text, i)
+        if match and match.end() > i:
+            end = match.end()
+            if end < len(text) and text[end] == ',':
+                i = end
+                continue
+            if not compound:
+                raise ValueError(f"Invalid selector: {selector!r}")
+            steps.append((combinator, tuple(compound)))
+            compound, combinator = [], match.group(1) or ' '
+            i = end
+            continue
+        match = _SIMPLE_SELECTOR.match(text, i)
+        if not match or match.end() == i:
+            raise ValueError(f"Invalid selector: {selector!r}")
+        if match.group('tag'):
+            compound.append(('tag', match.group('tag').lower(), None))
+        elif match.group('id'):
+            compound.append(('attr', 'id', ('=', match.group('id'))))
+        elif match.group('cls'):
+            compound.append(('attr', 'class', ('~=', match.group('cls'))))
+        elif match.group('attr'):
+            value = match.group('value')
+            if value and value[0] in '"\'':
+                value = value[1:-1]
+            compound.append(('attr', match.group('attr').lower(), (match.group('op'), value) if match.group('op') else None))
+        else:
+            compound.append(('pseudo', match.group('pseudo'), int(match.group('arg') or 1)))
+        i = match.end()
+    return tuple(tuple(steps) for steps in alternatives)
+
+
+def _siblings(node):
+    parent = node.parent
+    return [n for n in parent.children if n.is_element] if parent is not None else [node]
+
+
+def _match_compound(node, compound):
+    for kind, name, arg in compound:
+        if kind == 'tag':
+            if name != '*' and node.tag != name:
+                return False
+        elif kind == 'attr':
+            if name not in node.attrs:
+                return False
+            if arg is None:
+                continue
+            op, expected = arg
+            actual = node.attrs[name] or ''
+            if not ((op == '=' and actual == expected)
+                    or (op == '~=' and expected in actual.split())
+                    or (op == '^=' and expected and actual.startswith(expected))
+                    or (op == '$=' and expected and actual.endswith(expected))
+                    or (op == '*=' and expected and expected in actual)
+                    or (op == '|=' and (actual == expected or actual.startswith(expected + '-')))):
+                return False
+        else:
+            siblings = _siblings(node)
+            if name.endswith('of-type'):
+                siblings = [n for n in siblings if n.tag == node.tag]
+            index = siblings.index(node)
+            if name.startswith('first') and index != 0:
+                return False
+            if name.startswith('last') and index != len(siblings) - 1:
+                return False
+            if name.startswith('nth') and index != arg - 1:
+                return False
+    return True
+
+
+def _matches(node, steps, index):
+    """Right-to-left match of steps[:index + 1] ending at node."""
+    combinator, compound = steps[index]
+    if not node.is_element or not _match_compound(node, compound):
+        return False
+    if index == 0:
+        return True
+    if combinator == '>':
+        return _matches(node.parent, steps, index - 1) if node.parent is not None else False
+    if combinator == ' ':
+        ancestor = node.parent
+        while ancestor is not None:
+            if _matches(ancestor, steps, index - 1):
+                return True
+            ancestor = ancestor.parent
+        return False
+    siblings = _siblings(node)
+    before = siblings[:siblings.index(node)]
+    if combinator == '+':
+        return bool(before) and _matches(before[-1], steps, index - 1)
+    return any(_matches(sibling, steps, index - 1) for sibling in before)
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node('#root')
+        self.doctype = None
+        self.stack = [self.root]
+
+    def handle_decl(self, decl):
+        if decl.lower().startswith('doctype'):
+            self.doctype = decl
+        else:
+            self.stack[-1].append(Node('#comment', text=f"!{decl}"))
+
+    def handle_starttag(self, tag, attrs):
+        node = self.stack[-1].append(Node(tag, attrs))
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self.stack[-1].append(Node(tag, attrs))
+
+    def handle_endtag(self, tag):
+        # Close up to the matching open element; stray end tags are ignored
+        for index in range(len(self.stack) - 1, 0, -1):
+            if self.stack[index].tag == tag:
+                del self.stack[index:]
+                return
+
+    def handle_data(self, data):
+        parent = self.stack[-1]
+        if parent.children and parent.children[-1].tag == '#text':
+            parent.children[-1].text += data
+        else:
+            parent.append(Node('#text', text=data))
+
+    def handle_comment(self, data):
+        self.stack[-1].append(Node('#comment', text=data))
+
+
+def parse(html):
+    """Parses an HTML document or fragment. Returns the '#root' node; the doctype is on root.text."""
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    builder.root.text = builder.doctype
+    return builder.root
+
+
+def _attrs_html(attrs):
+    out = []
+    for name, value in attrs.items():
+        if value is None:
+            out.append(f" {name}")
+        else:
+            out.append(f' {name}="{escape(value, quote=True)}"')
+    return "".join(out)
+
+
+def _is_block(node):
+    return node is not None and node.is_element and node.tag in BLOCK_ELEMENTS
+
+
+def serialize(node, minify=False):
+    """Serializes a node (or '#root') back to HTML. minify collapses insignificant whitespace."""
+    out = []
+    _serialize(node, minify, out, preformatted=False)
+    return "".join(out)
+
+
+def _serialize(node, minify, out, preformatted):
+    if node.tag == '#root':
+        for child in node.children:
+            _serialize(child, minify, out, preformatted)
+        return
+    if node.tag == '#text':
+        parent = node.parent
+        if parent is not None and parent.tag in RAW_TEXT_ELEMENTS:
+            out.append(node.text)
+            return
+        text = escape(node.text, quote=False)
+        if minify and not preformatted:
+            text = _WHITESPACE.sub(" ", text)
+            if text == " ":
+                siblings = parent.children if parent is not None else [node]
+                index = siblings.index(node)
+                prev = siblings[index - 1] if index > 0 else None
+                nxt = siblings[index + 1] if index + 1 < len(siblings) else None
+                # Whitespace next to block boundaries has no effect on rendering
+                if _is_block(prev) or _is_block(nxt) or ((prev is None or nxt is None) and _is_block(parent)):
+                    return
+        out.append(text)
+        return
+    if node.tag == '#comment':
+        if not minify:
+            out.append(f"<!--{node.text}-->")
+        return
+    out.append(f"<{node.tag}{_attrs_html(node.attrs)}>")
+    if node.tag in VOID_ELEMENTS:
+        return
+    preformatted = preformatted or node.tag in PREFORMATTED
+    for child in node.children:
+        _serialize(child, minify, out, preformatted)
+    out.append(f"</{node.tag}>")
@@ -0,0 +1,173 @@
+import json
+import re
+
+from html_dom import Node, parse, serialize
+
+EDIT_OPS = ('set_attr', 'remove_attr', 'replace_text', 'insert_child', 'remove')
+
+# JSON schema for ollama's `format=`: the model answers with edits only
+PATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "edits": {
+            "type": "array",
+            "maxItems": 40,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "op": {"type": "string", "enum": list(EDIT_OPS)},
+                    "selector": {"type": "string"},
+                    "name": {"type": "string"},
+                    "value": {"type": "string"},
+                    "text": {"type": "string"},
+                    "html": {"type": "string"},
+                    "position": {"type": "string", "enum": ["first", "last"]}
+                },
+                "required": ["op", "selector"]
+            }
+        }
+    },
+    "required": ["edits"]
+}
+
+# Event handlers, scripts and javascript: URLs never come back from a patch
+_UNSAFE_ATTR = re.compile(r'^on[a-z]+$')
+_UNSAFE_TAGS = ('script', 'iframe', 'object', 'embed')
+_URL_ATTRS = ('href', 'src', 'action', 'formaction', 'xlink:href')
+# Browsers ignore whitespace and control characters inside the scheme
+_IGNORED_IN_SCHEME = re.compile(r'[\x00-\x20]+')
+_SCRIPT_URL = re.compile(r'^(javascript|vbscript):', re.IGNORECASE)
+
+
+class PatchResult:
+    def __init__(self, html, applied, skipped, accepted):
+        self.html = html
+        self.applied = applied
+        # [(edit, reason)]
+        self.skipped = skipped
+        self.accepted = accepted
+
+
+def parse_edits(text):
+    """Reads the model's {"edits": [...]} answer; a bare list is accepted too."""
+    text = re.sub(r'```[a-z]*\s*\n?', '', text or "").strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        match = re.search(r'[\[{].*[\]}]', text, re.DOTALL)
+        if not match:
+            return []
+        try:
+            data = json.loads(match.group(0))
+        except ValueError:
+            return []
+    if isinstance(data, dict):
+        data = data.get('edits', [])
+    return [edit for edit in data if isinstance(edit, dict)] if isinstance(data, list) else []
+
+
+def _unsafe_attr(name, value):
+    if _UNSAFE_ATTR.match(name):
+        return True
+    return name in _URL_ATTRS and bool(_SCRIPT_URL.match(_IGNORED_IN_SCHEME.sub('', value or '')))
+
+
+def _safe_fragment(html):
+    """Parses inserted HTML and drops its event handlers and javascript: URLs."""
+    fragment = parse(html)
+    for node in fragment.elements():
+        for name in [name for name, value in node.attrs.items() if _unsafe_attr(name.lower(), value)]:
+            del node.attrs[name]
+    return fragment
+
+
+def _apply(root, edit):
+    """Applies one edit to every match. Returns an error string or None."""
+    op = edit.get('op')
+    if op not in EDIT_OPS:
+        return f"unknown op {op!r}"
+    try:
+        targets = root.select(edit.get('selector') or '')
+    except ValueError as e:
+        return str(e)
+    if not targets:
+        return "selector matched nothing"
+
+    if op in ('set_attr', 'remove_attr'):
+        name = (edit.get('name') or '').strip().lower()
+        if not name or _UNSAFE_ATTR.match(name) or not re.match(r'^[a-z_:][\w:.-]*$', name):
+            return f"invalid attribute {name!r}"
+        if op == 'set_attr' and _unsafe_attr(name, str(edit.get('value', ''))):
+            return f"unsafe value for {name!r}"
+        for node in targets:
+            if op == 'set_attr':
+                node.attrs[name] = str(edit.get('value', ''))
+            else:
+                node.attrs.pop(name, None)
+    elif op == 'replace_text':
+        for node in targets:
+            for child in list(node.children):
+                if child.tag == '#text':
+                    child.remove()
+            node.insert(0, Node('#text', text=str(edit.get('text', ''))))
+    elif op == 'insert_child':
+        fragment = _safe_fragment(edit.get('html') or '')
+        if not fragment.children:
+            return "empty html"
+        if any(node.tag in _UNSAFE_TAGS for node in fragment.elements()):
+            return "unsafe element in html"
+        for node in targets:
+            # Parse per target so every insert gets its own subtree
+            children = _safe_fragment(edit['html']).children
+            if edit.get('position') == 'first':
+                for index, child in enumerate(children):
+                    node.insert(index, child)
+            else:
+                for child in children:
+                    node.append(child)
+    else:
+        if any(node.parent is root for node in targets):
+            return "cannot remove the part's root element"
+        for node in targets:
+            node.remove()
+    return None
+
+
+def _roots(root):
+    return [node.tag for node in root.children if node.is_element]
+
+
+def apply_edits(html, edits):
+    """
+    Applies edit ops to a part's DOM and checks the result: the part must
+    keep the same top-level elements and stray text must not leak to the
+    top level. Rejected results return the original HTML.
+
+    Inserted HTML loses its event handlers and javascript: URLs, and
+    set_attr refuses them:
+
+    >>> part = '<header><a href="/">Home</a></header>'
+    >>> apply_edits(part, [{"op": "insert_child", "selector": "header",
+    ...                     "html": '<img src="x.png" onerror="alert(1)">'}]).html
+    '<header><a href="/">Home</a><img src="x.png"></header>'
+    >>> apply_edits(part, [{"op": "insert_child", "selector": "header",
+    ...                     "html": '<a href=" java\tscript:alert(1)">x</a>'}]).html
+    '<header><a href="/">Home</a><a>x</a></header>'
+    >>> result = apply_edits(part, [{"op": "set_attr", "selector": "a", "name": "href",
+    ...                              "value": "JavaScript:alert(1)"}])
+    >>> result.accepted, result.skipped[0][1]
+    (False, "unsafe value for 'href'")
+    """
+    root = parse(html)
+    before = _roots(root)
+    applied, skipped = [], []
+    for edit in edits:
+        error = _apply(root, edit)
+        if error:
+            skipped.append((edit, error))
+        else:
+            applied.append(edit)
+
+    stray_text = any(node.tag == '#text' and node.text.strip() for node in root.children)
+    accepted = bool(applied) and _roots(root) == before and not stray_text
+    return PatchResult(serialize(root) if accepted else html, applied, skipped, accepted)
@@ -0,0 +1,206 @@
+"""
+Record/replay cassettes for ollama.chat.
+
+record: real calls go through and every request/response pair is stored.
+replay: responses are served from the cassette with no model in the loop,
+        optionally with synthetic latency.
+
+    with Cassette("cassettes/login.json.gz", mode="replay").installed():
+        agent.run_recursive_logic(goal)
+
+Requests are matched by a hash of model, messages, format, options and
+stream flag; repeated identical requests replay in recorded order.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager
+
+CASSETTE_VERSION = 1
+
+# Response fields kept besides the message (token counts and server timings)
+STAT_FIELDS = (
+    'done_reason', 'total_duration', 'load_duration', 'prompt_eval_count',
+    'prompt_eval_duration', 'eval_count', 'eval_duration'
+)
+
+
+class CassetteMiss(KeyError):
+    """Replay found no recorded response for a request."""
+
+
+def request_key(model, messages, format=None, options=None, stream=False):
+    payload = json.dumps({
+        'model': model,
+        'messages': [{'role': m.get('role'), 'content': m.get('content')} for m in messages],
+        'format': format,
+        'options': options or {},
+        'stream': bool(stream)
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _field(response, name):
+    get = getattr(response, 'get', None)
+    return get(name) if get else None
+
+
+class Cassette:
+    def __init__(self, path, mode="replay", latency=0.0, chunk_chars=16):
+        """
+        latency: seconds slept per replayed call, or "recorded" to replay the
+        wall time measured while recording.
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.chunk_chars = chunk_chars
+        self.interactions = {}
+        self.hits = 0
+        self._cursor = {}
+        self._lock = threading.Lock()
+        self._original = None
+        if mode == "replay":
+            self.load()
+
+    def load(self):
+        opener = gzip.open if self.path.endswith('.gz') else open
+        with opener(self.path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version in {self.path}: {data.get('version')}")
+        for interaction in data['interactions']:
+            self.interactions.setdefault(interaction['key'], []).append(interaction)
+        return self
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {
+            'version': CASSETTE_VERSION,
+            'interactions': [i for recorded in self.interactions.values() for i in recorded]
+        }
+        data['interactions'].sort(key=lambda i: i['seq'])
+        opener = gzip.open if self.path.endswith('.gz') else open
+        tmp_path = self.path + '.tmp'
+        with opener(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        return self.path
+
+    def __len__(self):
+        return sum(len(recorded) for recorded in self.interactions.values())
+
+    # --- ollama.chat replacement ---
+
+    def chat(self, model, messages, stream=False, format=None, options=None, **kwargs):
+        key = request_key(model, messages, format, options, stream)
+        if self.mode == "record":
+            return self._record(key, model, messages, stream, format, options, kwargs)
+        return self._replay(key, messages, stream)
+
+    def _record(self, key, model, messages, stream, format, options, kwargs):
+        started = time.perf_counter()
+        response = self._original(model=model, messages=messages, stream=stream, format=format, options=options, **kwargs)
+        if not stream:
+            self._store(key, messages, response['message']['content'], response, 1, time.perf_counter() - started)
+            return response
+        return self._record_stream(key, messages, response, started)
+
+    def _record_stream(self, key, messages, stream, started):
+        pieces, last = [], None
+        try:
+            for chunk in stream:
+                pieces.append(chunk['message']['content'])
+                last = chunk
+                yield chunk
+        finally:
+            # A caller that stops reading early (closing the generator) still records what it got
+            self._store(key, messages, "".join(pieces), last, len(pieces), time.perf_counter() - started)
+
+    def _store(self, key, messages, content, response, chunks, seconds):
+        with self._lock:
+            recorded = self.interactions.setdefault(key, [])
+            recorded.append({
+                'key': key,
+                'seq': len(self),
+                'prompt': messages[-1].get('content', '')[:200],
+                'content': content,
+                'chunks': chunks,
+                'seconds': round(seconds, 4),
+                'stats': {f: _field(response, f) for f in STAT_FIELDS if _field(response, f) is not None}
+            })
+
+    def _replay(self, key, messages, stream):
+        with self._lock:
+            recorded = self.interactions.get(key)
+            if not recorded:
+                raise CassetteMiss(f"No recorded response for prompt: {messages[-1].get('content', '')[:80]!r}")
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            self.hits += 1
+        interaction = recorded[min(index, len(recorded) - 1)]
+
+        delay = interaction['seconds'] if self.latency == "recorded" else float(self.latency or 0)
+        if not stream:
+            if delay:
+                time.sleep(delay)
+            return dict(interaction['stats'], message={'role': 'assistant', 'content': interaction['content']}, done=True)
+        return self._replay_stream(interaction, delay)
+
+    def _replay_stream(self, interaction, delay):
+        content = interaction['content']
+        size = max(1, len(content) // max(1, interaction['chunks'])) if content else self.chunk_chars
+        pieces = [content[i:i + size] for i in range(0, len(content), size)] or [""]
+        for index, piece in enumerate(pieces):
+            if delay:
+                time.sleep(delay / len(pieces))
+            chunk = {'message': {'role': 'assistant', 'content': piece}, 'done': index == len(pieces) - 1}
+            if chunk['done']:
+                chunk.update(interaction['stats'])
+            yield chunk
+
+    # --- installation ---
+
+    def install(self):
+        """Routes ollama.chat through this cassette."""
+        module = sys.modules.get('ollama')
+        if module is None:
+            try:
+                import ollama as module
+            except ImportError:
+                if self.mode == "record":
+                    raise
+                # Replay needs no backend: serve agents that `import ollama`
+                module = types.ModuleType('ollama')
+                sys.modules['ollama'] = module
+        self._original = getattr(module, 'chat', None)
+        module.chat = self.chat
+        return self
+
+    def uninstall(self):
+        module = sys.modules.get('ollama')
+        if module is not None:
+            if self._original is not None:
+                module.chat = self._original
+            else:
+                del module.chat
+        self._original = None
+
+    @contextmanager
+    def installed(self):
+        self.install()
+        try:
+            yield self
+        finally:
+            self.uninstall()
+            if self.mode == "record":
+                self.save()
@@ -0,0 +1,171 @@
+"""
+Model warm-up and residency policy.
+
+warm() loads a model in a background thread (an empty generate request),
+so the load overlaps with the agent's setup instead of landing on the
+first plan call. Every chat call then passes the keep_alive chosen here:
+
+- the model fits in free RAM next to what is already loaded: keep it for
+  RESIDENT_KEEP_ALIVE, so runs that alternate between models (qwen3-coder
+  and deepseek-coder-v2) find both still loaded
+- it does not fit: unload the least recently used models until it does,
+  instead of letting the load push the machine into swap, and keep it
+  only for the server default
+
+Free RAM is read on this machine, so it only says something about the
+server when OLLAMA_HOST is local; for a remote server the memory check
+is skipped and models get the short keep_alive without evictions.
+"""
+import contextlib
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+import ollama
+
+logger = logging.getLogger(__name__)
+
+RESIDENT_KEEP_ALIVE = os.environ.get("AUTOCODER_KEEP_ALIVE", "30m")
+SHORT_KEEP_ALIVE = "5m"
+# Resident size over the weights file: KV cache, graph and runner overhead
+MEMORY_HEADROOM = 1.2
+
+
+def available_memory():
+    """Bytes of RAM available without swapping, or None when unknown."""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def is_local_host(host=None):
+    """Whether the ollama server (host or $OLLAMA_HOST, default local) runs on this machine."""
+    host = (host if host is not None else os.environ.get("OLLAMA_HOST", "")).strip()
+    if not host:
+        return True
+    hostname = urlsplit(host if "://" in host else f"//{host}").hostname or ""
+    return (hostname in ("", "localhost", "0.0.0.0", "::", "::1") or hostname.startswith("127.")
+            or hostname in (socket.gethostname(), socket.getfqdn()))
+
+
+def server_memory():
+    """Available RAM of the ollama server's machine, or None when the server is remote."""
+    return available_memory() if is_local_host() else None
+
+
+def _name(model):
+    """Canonical model name: ollama reports untagged models as name:latest."""
+    return model if ":" in model else f"{model}:latest"
+
+
+def _entries(response):
+    models = response.get('models') if hasattr(response, 'get') else getattr(response, 'models', None)
+    for entry in models or []:
+        name = entry.get('model') or entry.get('name')
+        if name:
+            yield _name(name), entry
+
+
+class ResidencyManager:
+    def __init__(self, client=ollama, memory_fn=server_memory, headroom=MEMORY_HEADROOM,
+                 resident_keep_alive=RESIDENT_KEEP_ALIVE, short_keep_alive=SHORT_KEEP_ALIVE):
+        self.client = client
+        self.memory_fn = memory_fn
+        self.headroom = headroom
+        self.resident_keep_alive = resident_keep_alive
+        self.short_keep_alive = short_keep_alive
+        self.decisions = {}
+        self.warmups = {}
+        self.stats = {'warmups': 0, 'already_loaded': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+
+    def loaded(self):
+        """{name: (size, expires_at)} of the models the server holds right now."""
+        return {name: (entry.get('size') or 0, str(entry.get('expires_at') or ""))
+                for name, entry in _entries(self.client.ps())}
+
+    def model_size(self, model):
+        for name, entry in _entries(self.client.list()):
+            if name == _name(model):
+                return entry.get('size')
+        return None
+
+    def plan(self, model):
+        """
+        Decides the keep_alive for a model and evicts what it cannot share
+        memory with. Returns (keep_alive, evicted model names).
+        """
+        loaded = self.loaded()
+        if _name(model) in loaded:
+            self.stats['already_loaded'] += 1
+            return self.resident_keep_alive, []
+
+        size, available = self.model_size(model), self.memory_fn()
+        if size is None or available is None:
+            return self.short_keep_alive, []
+        needed = size * self.headroom
+        if needed <= available:
+            return self.resident_keep_alive, []
+
+        # Earliest expiry first: the model that has been idle the longest
+        evicted = []
+        for name, (loaded_size, _) in sorted(loaded.items(), key=lambda item: item[1][1]):
+            if needed <= available:
+                break
+            self.client.generate(model=name, keep_alive=0)
+            available += loaded_size
+            evicted.append(name)
+        self.stats['evictions'] += len(evicted)
+        return self.short_keep_alive, evicted
+
+    def warm(self, model, tracer=None):
+        """Starts loading a model in the background. Returns a Future of the load seconds."""
+        with self._lock:
+            if model in self.warmups:
+                return self.warmups[model]
+            future = self.warmups[model] = Future()
+
+        def run():
+            started = time.perf_counter()
+            try:
+                with tracer.span("model_warmup", model=model) if tracer else contextlib.nullcontext() as span:
+                    keep_alive, evicted = self.plan(model)
+                    self.decisions[model] = keep_alive
+                    self.client.generate(model=model, keep_alive=keep_alive)
+                    if span:
+                        span.set(keep_alive=keep_alive, evicted=evicted)
+                self.stats['warmups'] += 1
+                seconds = time.perf_counter() - started
+                evicted_note = f", unloaded {', '.join(evicted)}" if evicted else ""
+                print(f"  [Model {model} ready in {seconds:.1f}s, keep_alive={keep_alive}{evicted_note}]")
+                future.set_result(seconds)
+            except Exception as e:
+                # A failed warm-up only costs the load time on the first call
+                logger.warning(f"Warm-up of {model} failed: {e}")
+                with self._lock:
+                    del self.warmups[model]
+                future.set_exception(e)
+
+        threading.Thread(target=run, name=f"warmup-{model}", daemon=True).start()
+        return future
+
+    def chat_options(self, model):
+        """Extra ollama.chat arguments: the keep_alive decided at warm-up, if any."""
+        keep_alive = self.decisions.get(model)
+        return {'keep_alive': keep_alive} if keep_alive is not None else {}
+
+
+# One policy per process: agents in the same run share their decisions
+RESIDENCY = ResidencyManager()
@@ -0,0 +1,264 @@
+import re
+
+from css_tools import AtRule, Rule, Statement, dedupe_rules, parse_stylesheet, serialize_stylesheet
+from html_dom import Node, parse, serialize
+from repeat_macros import expand_tree
+
+HEAD_ELEMENTS = ('meta', 'link', 'title', 'base')
+DOCUMENT_WRAPPERS = ('html', 'head', 'body')
+
+# Pseudo-classes html_dom can match; the rest (:hover, ::before, :not()...) are
+# dropped before matching, which can only widen the match
+_SUPPORTED_PSEUDO = r'(?:first-child|last-child|first-of-type|last-of-type|nth-child\(\s*\d+\s*\)|nth-of-type\(\s*\d+\s*\))'
+_UNSUPPORTED_PSEUDO = re.compile(r'::?(?!' + _SUPPORTED_PSEUDO + r'(?![\w-]))[\w-]+(?:\((?:[^()]|\([^()]*\))*\))?')
+_SELECTOR_DELIMITER = re.compile(r'(\s*[>+~,]\s*|\s+)')
+
+
+class PageAssembler:
+    """
+    Assembles generated parts into one document.
+
+    Every part is parsed into a DOM; <style> blocks and head-only elements
+    are hoisted into a single <head>, nested <!DOCTYPE>/<html>/<head>/<body>
+    wrappers are stripped, repetition macros (repeat_macros) are expanded,
+    CSS rules that are duplicated or fully overridden
+    later are dropped, and the result is optionally minified. Pages that
+    share a site stylesheet link it (stylesheets) ahead of their own CSS;
+    rules already in that sheet (linked_css) are not repeated inline.
+
+    With critical_parts=N only the CSS that applies to the first N parts
+    (and to html/body) is inlined in <head>. The rest is deferred: linked
+    from deferred_href without blocking the first paint (the caller writes
+    self.deferred_css there), or, without a file to link, put in a <style>
+    at the end of <body>, after the content it styles.
+    """
+
+    def __init__(self, minify=True, lang="en"):
+        self.minify = minify
+        self.lang = lang
+        self.stats = {}
+        self.deferred_css = ""
+
+    def assemble(self, parts, head="", title=None, stylesheets=(), linked_css="", critical_parts=None,
+                 deferred_href=None):
+        styles = []
+        head_nodes = {}
+        body_nodes = []
+        critical_nodes = []
+        wrappers = 0
+        macros = copies = 0
+        found_title = None
+
+        for index, fragment in enumerate([head] + list(parts)):
+            root = parse(fragment or "")
+            expanded = expand_tree(root)
+            macros += expanded['macros']
+            copies += expanded['copies']
+            if root.text:
+                wrappers += 1
+            for node in list(root.elements()):
+                if _in_noscript(node):
+                    # Fallbacks stay inside their <noscript>
+                    continue
+                if node.tag == 'noscript' and _head_only(node):
+                    head_nodes.setdefault(self._head_key(node), node)
+                    node.remove()
+                elif node.tag == 'style':
+                    styles.append(node.text_content())
+                    node.remove()
+                elif node.tag in HEAD_ELEMENTS:
+                    if node.tag == 'title':
+                        found_title = found_title or node.text_content().strip()
+                    else:
+                        head_nodes.setdefault(self._head_key(node), node)
+                    node.remove()
+            for node in [n for n in root.elements(*DOCUMENT_WRAPPERS)]:
+                wrappers += 1
+                node.unwrap()
+            if index > 0:
+                body_nodes.extend(root.children)
+                if critical_parts is not None and index <= critical_parts:
+                    critical_nodes.extend(root.children)
+
+        raw_css = "\n".join(styles)
+        items = parse_stylesheet(raw_css)
+        rule_count = _count_rules(items)
+        items = dedupe_rules(items)
+        if linked_css:
+            linked = {serialize_stylesheet([item], minify=True) for item in parse_stylesheet(linked_css)}
+            items = [item for item in items if serialize_stylesheet([item], minify=True) not in linked]
+
+        document = Node('html', {'lang': self.lang})
+        head_el = document.append(Node('head'))
+        head_el.append(Node('meta', {'charset': 'utf-8'}))
+        head_nodes.pop(('meta', 'charset'), None)
+        if ('meta', 'name', 'viewport') not in head_nodes:
+            head_el.append(Node('meta', {'name': 'viewport', 'content': 'width=device-width, initial-scale=1'}))
+        title_el = head_el.append(Node('title'))
+        title_el.append(Node('#text', text=title or found_title or "Page"))
+        for href in stylesheets:
+            head_el.append(Node('link', {'rel': 'stylesheet', 'href': href}))
+            head_nodes.pop(('link', 'stylesheet', href), None)
+        for node in head_nodes.values():
+            head_el.append(node)
+        body_el = document.append(Node('body'))
+        for node in body_nodes:
+            body_el.append(node)
+
+        deferred = []
+        if critical_parts is not None:
+            items, deferred = split_critical(items, document, critical_nodes)
+        css = serialize_stylesheet(items, minify=self.minify)
+        self.deferred_css = serialize_stylesheet(deferred, minify=self.minify)
+        if css:
+            style_el = head_el.append(Node('style'))
+            style_el.append(Node('#text', text=css if self.minify else "\n" + css))
+        if self.deferred_css and deferred_href:
+            # Loads as a print stylesheet (not render-blocking), then applies to the screen
+            head_el.append(Node('link', {'rel': 'stylesheet', 'href': deferred_href, 'media': 'print',
+                                         'onload': "this.media='all'"}))
+            noscript = head_el.append(Node('noscript'))
+            noscript.append(Node('link', {'rel': 'stylesheet', 'href': deferred_href}))
+        elif self.deferred_css:
+            style_el = body_el.append(Node('style'))
+            style_el.append(Node('#text', text=self.deferred_css if self.minify else "\n" + self.deferred_css))
+
+        separator = "" if self.minify else "\n"
+        html = "<!DOCTYPE html>" + separator + serialize(document, minify=self.minify)
+        self.stats = {
+            'input_bytes': sum(len(p or "") for p in parts) + len(head or ""),
+            'output_bytes': len(html),
+            'style_blocks': len(styles),
+            'css_rules_in': rule_count,
+            # Deferred rules are still in the page, just not render-blocking
+            'css_rules_out': _count_rules(items) + _count_rules(deferred),
+            'css_rules_deferred': _count_rules(deferred),
+            'css_bytes_in': len(raw_css),
+            'css_bytes_out': len(css) + len(self.deferred_css),
+            'critical_css_bytes': len(css),
+            'deferred_css_bytes': len(self.deferred_css),
+            'wrappers_stripped': wrappers,
+            'macros_expanded': macros,
+            'macro_copies': copies
+        }
+        return html
+
+    @staticmethod
+    def _head_key(node):
+        if node.tag == 'meta':
+            for attr in ('charset', 'name', 'property', 'http-equiv'):
+                if attr in node.attrs:
+                    return ('meta', attr) if attr == 'charset' else ('meta', attr, node.attrs[attr])
+        if node.tag == 'link':
+            return ('link', node.attrs.get('rel'), node.attrs.get('href'))
+        return (node.tag, serialize(node))
+
+
+def _in_noscript(node):
+    ancestor = node.parent
+    while ancestor is not None:
+        if ancestor.tag == 'noscript':
+            return True
+        ancestor = ancestor.parent
+    return False
+
+
+def _head_only(node):
+    """A <noscript> holding only head elements (e.g. a stylesheet fallback) belongs in <head>."""
+    elements = [child for child in node.children if child.is_element]
+    return bool(elements) and all(child.tag in HEAD_ELEMENTS for child in elements)
+
+
+def _count_rules(items):
+    count = 0
+    for item in items:
+        children = getattr(item, 'children', None)
+        count += _count_rules(children) if children else 1
+    return count
+
+
+def _matching_selector(selector):
+    """The selector with unsupported pseudo-classes and pseudo-elements removed."""
+    selector = _UNSUPPORTED_PSEUDO.sub('', selector.replace(':root', 'html')).strip()
+    # Compounds sit at even indexes; one that was only a pseudo-class matches anything
+    return "".join(part or '*' for part in _SELECTOR_DELIMITER.split(selector))
+
+
+def _is_critical(selector, root, critical):
+    try:
+        matched = root.select(_matching_selector(selector))
+    except ValueError:
+        # Nothing we can match against: keep it inline rather than risk a flash of unstyled content
+        return True
+    return any(node in critical for node in matched)
+
+
+def split_critical(items, document, critical_nodes):
+    """
+    Splits stylesheet items into (critical, deferred): a rule is critical
+    when it matches html, head, body or an element of critical_nodes.
+    @import/@charset and @font-face stay critical; @keyframes follow the
+    rules that use them.
+    """
+    root = Node('#root')
+    root.append(document)
+    try:
+        critical = {document}
+        critical.update(node for node in document.children)
+        for node in critical_nodes:
+            critical.update(node.elements())
+        critical_items, deferred_items = _split_items(items, root, critical)
+    finally:
+        document.remove()
+
+    # Animations of critical rules must be defined before first paint too
+    critical_css = serialize_stylesheet(critical_items, minify=True)
+    for item in list(deferred_items):
+        words = item.prelude.split() if isinstance(item, AtRule) else []
+        if len(words) > 1 and words[0].lower() in ('@keyframes', '@-webkit-keyframes') \
+                and re.search(r'(?<![\w-])' + re.escape(words[1]) + r'(?![\w-])', critical_css):
+            deferred_items.remove(item)
+            critical_items.append(item)
+    return critical_items, deferred_items
+
+
+def _split_items(items, root, critical):
+    critical_items, deferred_items = [], []
+    deferred_properties = set()
+    for item in items:
+        if isinstance(item, Rule):
+            if not _is_critical(item.selector, root, critical):
+                deferred_items.append(item)
+                deferred_properties |= item.properties()
+                continue
+            critical_items.append(item)
+            if item.properties() & deferred_properties:
+                # It used to come after a deferred rule setting the same property: repeat it
+                # after that rule so the deferred sheet cannot win where this one did
+                deferred_items.append(item)
+        elif isinstance(item, AtRule) and item.children is not None:
+            inner_critical, inner_deferred = _split_items(item.children, root, critical)
+            if inner_critical:
+                critical_items.append(AtRule(item.prelude, children=inner_critical))
+            if inner_deferred:
+                deferred_items.append(AtRule(item.prelude, children=inner_deferred))
+        elif isinstance(item, Statement) or item.prelude.lower().startswith('@font-face'):
+            critical_items.append(item)
+        else:
+            deferred_items.append(item)
+    return critical_items, deferred_items
+
+
+def split_styles(fragment):
+    """Returns (fragment without its <style> blocks, their CSS)."""
+    root = parse(fragment or "")
+    styles = []
+    for node in list(root.elements('style')):
+        styles.append(node.text_content())
+        node.remove()
+    return serialize(root), "\n".join(styles)
+
+
+def assemble_page(parts, head="", title=None, minify=True):
+    """Convenience wrapper around PageAssembler.assemble."""
+    return PageAssembler(minify=minify).assemble(parts, head=head, title=title)
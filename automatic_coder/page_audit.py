@@ -0,0 +1,206 @@
+"""
+Bulk validator and minifier for generated pages.
+
+    python page_audit.py pages/                          # writes pages/page_audit.jsonl
+    python page_audit.py pages/ --minify-dir pages_min   # plus minified copies
+    python page_audit.py pages/ --out - --workers 8      # JSONL on stdout
+
+Every *.html file under the directory is validated, normalized and
+minified in a process pool, and one JSON line per file is written as soon
+as it is done. Files are skipped when their content hash matches the last
+run's output and the validation rules are unchanged: the rules hash covers
+the source of the checking modules, so editing a rule re-audits everything.
+Pages over a performance budget (perf_budget.py) get a warning and every
+record carries the page's metrics.
+Exits with status 1 when any page has errors.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import css_tools
+import html_dom
+import page_assembler
+import part_scorer
+import perf_budget
+import repeat_macros
+from page_assembler import PageAssembler
+from part_scorer import check_markup, inline_css, undefined_tokens
+from perf_budget import check, load_budgets, measure
+
+OUTPUT_NAME = "page_audit.jsonl"
+# perf_budgets.json in the working directory overrides the defaults
+BUDGETS = load_budgets()
+
+_TITLE = re.compile(r'<title[^>]*>\s*\S', re.IGNORECASE)
+_FENCE = re.compile(r'^\s*```', re.MULTILINE)
+
+
+def _rules_hash():
+    digest = hashlib.sha1()
+    for module in (sys.modules[__name__], part_scorer, perf_budget, page_assembler, repeat_macros,
+                   css_tools, html_dom):
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    digest.update(json.dumps(BUDGETS, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+RULES_HASH = _rules_hash()
+
+
+def audit_page(html):
+    """Validates one page and returns (errors, warnings, minified html, assembler stats, perf metrics)."""
+    markup = check_markup(html)
+    errors = list(markup['errors'])
+    warnings = []
+    if _FENCE.search(html):
+        errors.append("markdown code fence")
+    if markup['top_level_text'] > 40:
+        errors.append("text outside the document")
+    if markup['duplicate_ids']:
+        warnings.append(f"duplicate ids: {', '.join(markup['duplicate_ids'][:5])}")
+    if not _TITLE.search(html):
+        warnings.append("missing <title>")
+
+    undefined = undefined_tokens(inline_css(html))
+    if undefined:
+        warnings.append(f"undefined tokens: {', '.join(undefined[:5])}")
+
+    perf = measure(html)
+    warnings += [f"over budget: {name} {value} > {limit}" for name, value, limit in check(perf, BUDGETS)]
+
+    # Normalizing: hoisted and deduped styles, stripped nested wrappers, minified
+    assembler = PageAssembler(minify=True)
+    minified = assembler.assemble([html])
+    perf.pop('details')
+    return errors, warnings, minified, assembler.stats, perf
+
+
+def audit_file(task):
+    """Process-pool worker: audits root/rel unless its hash matches the previous record."""
+    root, rel, minify_dir, previous = task
+    started = time.perf_counter()
+    path = os.path.join(root, rel)
+    with open(path, "rb") as f:
+        data = f.read()
+    stat = os.stat(path)
+    sha = hashlib.sha1(data).hexdigest()
+    if previous and previous.get('sha1') == sha:
+        return dict(previous, size=stat.st_size, mtime_ns=stat.st_mtime_ns, skipped=True)
+
+    errors, warnings, minified, stats, perf = audit_page(data.decode("utf-8", errors="replace"))
+    if minify_dir:
+        target = os.path.join(minify_dir, rel)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(minified)
+    return {
+        'path': rel,
+        'sha1': sha,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'rules': RULES_HASH,
+        'status': "errors" if errors else "ok",
+        'errors': errors,
+        'warnings': warnings,
+        'bytes_out': len(minified.encode("utf-8")),
+        'css_rules_in': stats['css_rules_in'],
+        'css_rules_out': stats['css_rules_out'],
+        'perf': perf,
+        'ms': round((time.perf_counter() - started) * 1000, 2),
+        'skipped': False
+    }
+
+
+def find_pages(root, exclude=()):
+    exclude = {os.path.realpath(path) for path in exclude if path}
+    for directory, subdirs, files in os.walk(root):
+        subdirs[:] = sorted(d for d in subdirs if not d.startswith('.')
+                            and os.path.realpath(os.path.join(directory, d)) not in exclude)
+        for name in sorted(files):
+            if name.lower().endswith((".html", ".htm")):
+                yield os.path.relpath(os.path.join(directory, name), root)
+
+
+def load_previous(path):
+    """{relative path: record} from an earlier run's JSONL output."""
+    previous = {}
+    if not path or path == "-" or not os.path.exists(path):
+        return previous
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('rules') == RULES_HASH:
+                previous[record['path']] = record
+    return previous
+
+
+def audit_directory(root, out_path, workers=None, minify_dir=None, force=False):
+    """Audits every page under root, streaming JSONL to out_path. Returns the summary counts."""
+    previous = {} if force else load_previous(out_path)
+    carried, tasks = [], []
+    for rel in find_pages(root, exclude=(minify_dir,)):
+        old = previous.get(rel)
+        if old and minify_dir and not os.path.exists(os.path.join(minify_dir, rel)):
+            old = None
+        if old:
+            stat = os.stat(os.path.join(root, rel))
+            if (old.get('size'), old.get('mtime_ns')) == (stat.st_size, stat.st_mtime_ns):
+                # Same size and mtime: not even worth hashing
+                carried.append(dict(old, skipped=True))
+                continue
+        tasks.append((root, rel, minify_dir, old))
+
+    summary = {'files': len(carried) + len(tasks), 'skipped': len(carried), 'audited': 0, 'errors': 0}
+    out = sys.stdout if out_path == "-" else open(out_path, "w", encoding="utf-8")
+    try:
+        for record in carried:
+            summary['errors'] += record['status'] == "errors"
+            out.write(json.dumps(record) + "\n")
+        if tasks:
+            workers = workers or os.cpu_count() or 1
+            chunksize = max(1, min(64, len(tasks) // (workers * 8)))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for record in pool.map(audit_file, tasks, chunksize=chunksize):
+                    if record['skipped']:
+                        summary['skipped'] += 1
+                    else:
+                        summary['audited'] += 1
+                    summary['errors'] += record['status'] == "errors"
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate, normalize and minify every generated page under a directory.")
+    parser.add_argument("root", help="directory to walk for *.html files")
+    parser.add_argument("--out", help=f"JSONL results, - for stdout (default ROOT/{OUTPUT_NAME})")
+    parser.add_argument("--minify-dir", help="write minified copies here, mirroring the tree")
+    parser.add_argument("--workers", type=int, help="processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="re-audit unchanged files too")
+    args = parser.parse_args(argv)
+
+    out_path = args.out or os.path.join(args.root, OUTPUT_NAME)
+    log = sys.stderr if out_path == "-" else sys.stdout
+    started = time.perf_counter()
+    summary = audit_directory(args.root, out_path, args.workers, args.minify_dir, args.force)
+    print(f"  [Audit: {summary['files']} pages, {summary['audited']} audited, {summary['skipped']} unchanged, "
+          f"{summary['errors']} with errors in {time.perf_counter() - started:.1f}s (rules {RULES_HASH})]", file=log)
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Generated parts keyed by the hash of their spec.
+
+A part's spec is everything its generation depends on: the part's section
+of the plan, the design tokens and whatever the caller adds (model, prompt
+template versions, CSS patterns). When a goal is edited slightly, only the
+parts whose spec changed need a new LLM call; the rest are served from
+here.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# Least recently used entries are dropped beyond this
+MAX_ENTRIES = 500
+
+
+def _normalize(text):
+    """Case and whitespace differences do not change what a part looks like."""
+    return re.sub(r'\s+', ' ', str(text)).strip().lower()
+
+
+def part_spec_hash(plan, part_number, *extra):
+    spec = [str(part_number), _normalize(plan.part_section(part_number)), _normalize(plan.tokens_css())]
+    spec += [_normalize(value) for value in extra]
+    return hashlib.sha1("\x1f".join(spec).encode("utf-8")).hexdigest()
+
+
+class PartCache:
+    """Persistent spec hash -> part HTML map, stored as a single JSON file."""
+
+    def __init__(self, path="part_cache.json", max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = {}
+        # Parallel samples and batch workers share one cache
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = data.get('entries', {})
+        except (OSError, ValueError) as e:
+            print(f"  [Part Cache: could not read {self.path}: {str(e)}]")
+            self.entries = {}
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({'version': 1, 'entries': self.entries}, f)
+            os.replace(tmp_path, self.path)
+
+    def __contains__(self, spec_hash):
+        with self._lock:
+            return spec_hash in self.entries
+
+    def get(self, spec_hash):
+        with self._lock:
+            entry = self.entries.get(spec_hash)
+            if entry is None:
+                return None
+            entry['used'] = time.time()
+            return entry['html']
+
+    def put(self, spec_hash, html, part_number=None):
+        with self._lock:
+            self.entries[spec_hash] = {'html': html, 'part': part_number, 'used': time.time()}
+            if len(self.entries) > self.max_entries:
+                oldest = sorted(self.entries, key=lambda key: self.entries[key]['used'])
+                for key in oldest[:len(self.entries) - self.max_entries]:
+                    del self.entries[key]
+            self.save()
@@ -0,0 +1,161 @@
+import re
+from html.parser import HTMLParser
+
+from html_dom import VOID_ELEMENTS
+
+# Any one of these elements satisfies the part's landmark requirement
+PART_LANDMARKS = {
+    1: ('header', 'nav'),
+    2: ('main', 'section'),
+    3: ('section', 'article', 'main'),
+    4: ('aside', 'nav', 'section'),
+    5: ('footer',)
+}
+
+# End tags HTML lets authors omit; left open they are not errors
+OPTIONAL_END_TAGS = {'p', 'li', 'dt', 'dd', 'tr', 'td', 'th', 'thead', 'tbody', 'tfoot', 'option', 'colgroup'}
+
+MIN_PART_CHARS = 200
+MAX_PART_CHARS = 20000
+
+ERROR_PENALTY = 25
+WARNING_PENALTY = 5
+
+_COLOR_LITERAL = re.compile(r'#[0-9a-fA-F]{3,8}\b|\brgba?\(|\bhsla?\(')
+_VAR_USE = re.compile(r'var\(\s*(--[\w-]+)')
+_VAR_DEF = re.compile(r'(--[\w-]+)\s*:')
+_STYLE_BLOCK = re.compile(r'<style[^>]*>(.*?)</style>', re.DOTALL | re.IGNORECASE)
+_ROOT_BLOCK = re.compile(r':root\s*\{[^}]*\}')
+
+
+class _TagChecker(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.errors = []
+        self.tags = set()
+        self.ids = {}
+        self.top_level_text = 0
+
+    def handle_starttag(self, tag, attrs):
+        self.tags.add(tag)
+        element_id = dict(attrs).get('id')
+        if element_id:
+            self.ids[element_id] = self.ids.get(element_id, 0) + 1
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.stack.pop()
+
+    def handle_endtag(self, tag):
+        if tag in VOID_ELEMENTS:
+            return
+        if tag not in self.stack:
+            self.errors.append(f"stray </{tag}>")
+            return
+        while self.stack:
+            open_tag = self.stack.pop()
+            if open_tag == tag:
+                return
+            if open_tag not in OPTIONAL_END_TAGS:
+                self.errors.append(f"<{open_tag}> closed by </{tag}>")
+
+    def handle_data(self, data):
+        if not self.stack and data.strip():
+            self.top_level_text += len(data.strip())
+
+
+class PartScore:
+    def __init__(self, part_number, score, errors, warnings, size):
+        self.part_number = part_number
+        self.score = score
+        self.errors = errors
+        self.warnings = warnings
+        self.size = size
+
+    @property
+    def passed(self):
+        return not self.errors
+
+    def __repr__(self):
+        return f"PartScore(part={self.part_number}, score={self.score}, errors={len(self.errors)}, warnings={len(self.warnings)})"
+
+
+def check_markup(html):
+    """
+    Tag balance of a part or page: errors (mis-nested, stray and unclosed
+    tags), duplicate ids, the tags used and the length of text outside any
+    element.
+    """
+    checker = _TagChecker()
+    checker.feed(html or "")
+    checker.close()
+    errors = checker.errors[:5]
+    unclosed = [tag for tag in checker.stack if tag not in OPTIONAL_END_TAGS]
+    if unclosed:
+        errors.append(f"unclosed <{'>, <'.join(unclosed[:5])}>")
+    return {
+        'errors': errors,
+        'duplicate_ids': [element_id for element_id, count in checker.ids.items() if count > 1],
+        'tags': checker.tags,
+        'top_level_text': checker.top_level_text
+    }
+
+
+def inline_css(html):
+    """Text of every <style> block in the markup."""
+    return "\n".join(_STYLE_BLOCK.findall(html or ""))
+
+
+def undefined_tokens(css, design_tokens=()):
+    """Custom properties used with var() but defined neither in css nor in design_tokens."""
+    known = set(design_tokens) | set(_VAR_DEF.findall(css))
+    return sorted({name for name in _VAR_USE.findall(css) if name not in known})
+
+
+def score_part(html, part_number, design_tokens=()):
+    """
+    Scores a generated part locally (no LLM): tag balance, size, required
+    landmarks and adherence to the shared design tokens. Errors fail the
+    part; warnings only lower its score.
+    """
+    html = html or ""
+    errors, warnings = [], []
+
+    markup = check_markup(html)
+    errors.extend(markup['errors'])
+    if markup['top_level_text'] > 40:
+        errors.append("text outside the part's root element")
+    if markup['duplicate_ids']:
+        warnings.append(f"duplicate ids: {', '.join(markup['duplicate_ids'][:5])}")
+
+    if len(html) < MIN_PART_CHARS:
+        errors.append(f"too short ({len(html)} chars)")
+    elif len(html) > MAX_PART_CHARS:
+        warnings.append(f"very large ({len(html)} chars)")
+
+    landmarks = PART_LANDMARKS.get(part_number, ())
+    if landmarks and not markup['tags'].intersection(landmarks):
+        errors.append(f"missing landmark <{'> or <'.join(landmarks)}>")
+
+    css = inline_css(html)
+    if css:
+        unknown = undefined_tokens(css, design_tokens)
+        if unknown:
+            warnings.append(f"undefined tokens: {', '.join(unknown[:5])}")
+        # Colors belong in the shared tokens; literals outside :root drift from the design
+        literals = len(_COLOR_LITERAL.findall(_ROOT_BLOCK.sub('', css)))
+        if literals > 3:
+            warnings.append(f"{literals} color literals instead of tokens")
+
+    score = 100 - ERROR_PENALTY * len(errors) - WARNING_PENALTY * len(warnings)
+    return PartScore(part_number, score, errors, warnings, len(html))
+
+
+def best_candidate(candidates, part_number, design_tokens=()):
+    """Returns (html, PartScore) of the highest-scoring candidate; smaller wins ties."""
+    scored = [(html, score_part(html, part_number, design_tokens)) for html in candidates]
+    return max(scored, key=lambda item: (item[1].score, -item[1].size))
@@ -0,0 +1,222 @@
+"""
+Static performance budgets for assembled pages.
+
+measure() walks a page (or a single part) and reports DOM size and depth,
+CSS bytes, selector complexity, inline SVG bytes, images without
+dimensions or lazy loading, render-blocking resources and will-change
+use. check_page() compares the assembled page against the budgets and
+blames the parts responsible, so only those parts are regenerated.
+
+Budgets come from DEFAULT_BUDGETS, overridden by perf_budgets.json when it
+exists (same keys).
+"""
+import json
+import os
+import re
+
+from css_tools import AtRule, Rule, parse_stylesheet
+from html_dom import parse, serialize
+
+DEFAULT_BUDGETS = {
+    'dom_nodes': 1500,
+    'max_depth': 32,
+    'css_bytes': 50_000,
+    # Compound selectors in the longest selector chain, e.g. ".a .b > li a" is 4
+    'selector_complexity': 4,
+    'inline_svg_bytes': 10_000,
+    'images_missing_dimensions': 0,
+    'images_not_lazy': 0,
+    # One linked stylesheet (the site's shared one) is allowed
+    'render_blocking': 1,
+    'will_change_rules': 3
+}
+BUDGETS_FILE = "perf_budgets.json"
+
+# Metrics that add up over the parts; a breach blames the parts above their fair share
+ADDITIVE_METRICS = ('dom_nodes', 'css_bytes', 'inline_svg_bytes')
+# <html> and <body> sit above every part in the assembled page
+PAGE_WRAPPER_DEPTH = 2
+
+_QUOTED = re.compile(r'"[^"]*"|\'[^\']*\'|\([^)]*\)')
+_COMBINATORS = re.compile(r'\s*[>+~]\s*|\s+')
+
+
+def load_budgets(path=BUDGETS_FILE):
+    budgets = dict(DEFAULT_BUDGETS)
+    if path and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                budgets.update({k: v for k, v in json.load(f).items() if k in DEFAULT_BUDGETS})
+        except (OSError, ValueError) as e:
+            print(f"  [Perf Budget: could not read {path}: {str(e)}]")
+    return budgets
+
+
+def selector_complexity(selector):
+    """Longest compound chain over the selector's comma-separated alternatives."""
+    selector = _QUOTED.sub('', selector)
+    return max((len([step for step in _COMBINATORS.split(alternative.strip()) if step])
+                for alternative in selector.split(',')), default=0)
+
+
+def _rules(items):
+    for item in items:
+        if isinstance(item, Rule):
+            yield item
+        elif isinstance(item, AtRule) and item.children:
+            yield from _rules(item.children)
+
+
+def measure(html):
+    """Performance metrics of a page or fragment, plus the offending items."""
+    root = parse(html or "")
+    nodes, max_depth = 0, 0
+    stack = [(child, 1) for child in root.children]
+    while stack:
+        node, depth = stack.pop()
+        if not node.is_element:
+            continue
+        nodes += 1
+        max_depth = max(max_depth, depth)
+        stack.extend((child, depth + 1) for child in node.children)
+
+    css = "\n".join(node.text_content() for node in root.elements('style'))
+    rules = list(_rules(parse_stylesheet(css)))
+    complex_selectors = []
+    worst = 0
+    for rule in rules:
+        complexity = selector_complexity(rule.selector)
+        worst = max(worst, complexity)
+        complex_selectors.append((complexity, rule.selector))
+    complex_selectors.sort(reverse=True)
+    will_change = [rule.selector for rule in rules if 'will-change' in rule.properties()]
+
+    svg_bytes = sum(len(serialize(node, minify=True)) for node in root.elements('svg')
+                    if not (node.parent and node.parent.tag == 'svg'))
+
+    missing_dimensions, not_lazy = [], []
+    for img in root.elements('img'):
+        label = img.attrs.get('src') or img.attrs.get('alt') or 'img'
+        if not (img.attrs.get('width') and img.attrs.get('height')):
+            missing_dimensions.append(label)
+        # Header images are above the fold; lazy loading would delay them
+        in_header = any(ancestor.tag == 'header' for ancestor in _ancestors(img))
+        if not in_header and (img.attrs.get('loading') or '').lower() != 'lazy':
+            not_lazy.append(label)
+
+    blocking = []
+    for node in root.elements('script'):
+        if node.attrs.get('src') and 'async' not in node.attrs and 'defer' not in node.attrs \
+                and node.attrs.get('type') != 'module' and _in_head(node):
+            blocking.append(f"script {node.attrs['src']}")
+    for node in root.elements('link'):
+        rel = (node.attrs.get('rel') or '').lower()
+        in_noscript = any(ancestor.tag == 'noscript' for ancestor in _ancestors(node))
+        if rel == 'stylesheet' and not in_noscript and (node.attrs.get('media') or 'all') in ('all', 'screen'):
+            blocking.append(f"stylesheet {node.attrs.get('href')}")
+    blocking += ["@import in CSS" for _ in re.finditer(r'@import\b', css)]
+
+    return {
+        'dom_nodes': nodes,
+        'max_depth': max_depth,
+        'css_bytes': len(css.encode('utf-8')),
+        'selector_complexity': worst,
+        'inline_svg_bytes': svg_bytes,
+        'images_missing_dimensions': len(missing_dimensions),
+        'images_not_lazy': len(not_lazy),
+        'render_blocking': len(blocking),
+        'will_change_rules': len(will_change),
+        'details': {
+            'selector_complexity': [selector for complexity, selector in complex_selectors[:5] if complexity > 1],
+            'images_missing_dimensions': missing_dimensions[:5],
+            'images_not_lazy': not_lazy[:5],
+            'render_blocking': blocking[:5],
+            'will_change_rules': will_change[:5]
+        }
+    }
+
+
+def _ancestors(node):
+    node = node.parent
+    while node is not None:
+        yield node
+        node = node.parent
+
+
+def _in_head(node):
+    # Fragments have no <head>: anything outside <body> blocks the first paint
+    return not any(ancestor.tag == 'body' for ancestor in _ancestors(node))
+
+
+def check(metrics, budgets):
+    """[(metric, value, limit)] for every budget the metrics exceed."""
+    return [(name, metrics[name], limit) for name, limit in budgets.items()
+            if name in metrics and metrics[name] > limit]
+
+
+class BudgetReport:
+    def __init__(self, metrics, breaches, blame):
+        self.metrics = metrics
+        self.breaches = breaches
+        # {part number: [problem, ...]} for the parts to regenerate
+        self.blame = blame
+
+    @property
+    def passed(self):
+        return not self.breaches
+
+    def summary(self):
+        if not self.breaches:
+            return "within budget"
+        return ", ".join(f"{name} {value} > {limit}" for name, value, limit in self.breaches)
+
+
+def _problem(name, value, limit, details):
+    examples = details.get(name) or []
+    example = f" ({', '.join(map(str, examples[:3]))})" if examples else ""
+    messages = {
+        'dom_nodes': f"{value} DOM nodes; simplify the markup (page budget {limit})",
+        'max_depth': f"nesting {value} levels deep; flatten wrappers (budget {limit})",
+        'css_bytes': f"{value} bytes of CSS; drop unused and repeated rules (page budget {limit})",
+        'selector_complexity': f"selectors chain {value} compounds; use one class per element (budget {limit}){example}",
+        'inline_svg_bytes': f"{value} bytes of inline SVG; simplify the paths (page budget {limit})",
+        'images_missing_dimensions': f"{value} <img> without width and height{example}",
+        'images_not_lazy': f"{value} <img> below the header without loading=\"lazy\"{example}",
+        'render_blocking': f"{value} render-blocking resources; no external scripts or stylesheets{example}",
+        'will_change_rules': f"will-change on {value} rules; keep it for animated elements only{example}"
+    }
+    return messages[name]
+
+
+def part_problems(metrics, breaches, part_count):
+    """Problems of one part (its measure() metrics) behind the page's breaches."""
+    problems = []
+    for name, _, limit in breaches:
+        value = metrics[name]
+        if name in ADDITIVE_METRICS:
+            responsible = value > limit / max(1, part_count)
+        elif name == 'max_depth':
+            responsible = value + PAGE_WRAPPER_DEPTH > limit
+        elif name == 'selector_complexity':
+            responsible = value > limit
+        else:
+            responsible = value > 0
+        if responsible:
+            problems.append(_problem(name, value, limit, metrics['details']))
+    return problems
+
+
+def check_page(parts, page_html, budgets=None):
+    """
+    Checks the assembled page against the budgets and attributes every
+    breach to parts (a dict of part number -> html).
+    """
+    budgets = budgets or DEFAULT_BUDGETS
+    page = measure(page_html)
+    breaches = check(page, budgets)
+    blame = {}
+    for number, html in parts.items() if breaches else ():
+        problems = part_problems(measure(html), breaches, len(parts))
+        if problems:
+            blame[number] = problems
+    return BudgetReport(page, breaches, blame)
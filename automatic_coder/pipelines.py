@@ -0,0 +1,93 @@
+"""
+Pipeline registry.
+
+Each strategy names the script and agent class that implement it. Nothing
+heavy is imported here: a script (and with it ollama, webbrowser and the
+helper modules) is loaded only when its strategy is actually run.
+"""
+import importlib.util
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL = "deepseek-coder-v2"
+
+
+def load_script(file_name):
+    """Imports one of the automatic_coder_v*.py scripts by file name (once per process)."""
+    module_name = os.path.splitext(file_name)[0].replace(".", "_")
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    if SCRIPT_DIR not in sys.path:
+        # The scripts import their helper modules as top-level modules
+        sys.path.insert(0, SCRIPT_DIR)
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRIPT_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
+
+
+class Pipeline:
+    def __init__(self, name, script, agent_class, description, run, options=(), agent_options=()):
+        self.name = name
+        self.script = script
+        self.agent_class = agent_class
+        self.description = description
+        # run(agent, goal, **options)
+        self.run = run
+        # Option names (from the CLI) this pipeline's run / agent constructor accept
+        self.options = options
+        self.agent_options = agent_options
+
+    def create_agent(self, model_name=DEFAULT_MODEL, **agent_options):
+        return getattr(load_script(self.script), self.agent_class)(model_name, **agent_options)
+
+    def unsupported(self, options):
+        """Names of the options that are set but that this pipeline does not accept."""
+        return [k for k, v in options.items() if v is not None and k not in self.options and k not in self.agent_options]
+
+    def execute(self, goal, model_name=DEFAULT_MODEL, **options):
+        unsupported = self.unsupported(options)
+        if unsupported:
+            raise ValueError(f"Pipeline '{self.name}' does not accept: {', '.join(unsupported)}")
+        options = {k: v for k, v in options.items() if v is not None}
+        agent = self.create_agent(model_name, **{k: v for k, v in options.items() if k in self.agent_options})
+        return self.run(agent, goal, **{k: v for k, v in options.items() if k in self.options})
+
+
+PIPELINES = {}
+
+
+def register(name, script, agent_class, description, run=None, options=(), agent_options=()):
+    PIPELINES[name] = Pipeline(name, script, agent_class, description,
+                               run or (lambda agent, goal, **options: agent.execute(goal, **options)), options, agent_options)
+    return PIPELINES[name]
+
+
+def get_pipeline(name):
+    if name not in PIPELINES:
+        raise KeyError(f"Unknown pipeline '{name}' (choose from: {', '.join(PIPELINES)})")
+    return PIPELINES[name]
+
+
+register("v5-recursive", "automatic_coder_v5.py", "RecursiveHTMLAgent",
+         "plan, generate and debug the page in recursive passes")
+register("v6-enhanced-plan", "automatic_coder_v6_fixed.py", "RecursiveHTMLAgent",
+         "async 5-part plan with retries, circuit breaker and backend pool",
+         options=("deadline_seconds",))
+register("v7.1-frame", "automatic_coder_v7.1.py", "SimpleFrameAgent",
+         "fixed frame templates, no LLM refinement")
+register("v7.2-frame", "automatic_coder_v7.2.py", "SimpleFrameAgent",
+         "frame templates with slot filling or patch refinement",
+         options=("preview", "headless", "mode"))
+register("v7.5-recursive", "automatic_coder_v7.5.py", "RecursiveHTMLAgent",
+         "schema plan, streamed or best-of-N parts, live preview and DOM assembly",
+         options=("preview", "headless"), agent_options=("samples",))
+register("v7.5-site", "site_builder.py", "SiteBuilder",
+         "multi-page site: shared header, footer and stylesheet, pages in parallel",
+         options=("headless",), agent_options=("samples",))
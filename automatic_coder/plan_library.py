@@ -0,0 +1,219 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+
+# Task taxonomy used by _analyze_task_type. Order matters: when a goal hits
+# keywords from several types, the type listed first wins (same as the old
+# if/elif chain).
+TASK_TYPES = [
+    {
+        'type': 'landing',
+        'keywords': ['landing', 'homepage', 'home page'],
+        'context': 'This is a landing/homepage - focus on strong hero section, clear value proposition, and conversion elements.',
+        'priority': 'hero_and_cta'
+    },
+    {
+        'type': 'dashboard',
+        'keywords': ['dashboard', 'admin', 'panel'],
+        'context': 'This is a dashboard/admin interface - focus on data visualization, navigation, and utility components.',
+        'priority': 'navigation_and_data'
+    },
+    {
+        'type': 'blog',
+        'keywords': ['blog', 'article', 'post'],
+        'context': 'This is a content/blog page - focus on readability, typography, and content organization.',
+        'priority': 'content_and_readability'
+    },
+    {
+        'type': 'ecommerce',
+        'keywords': ['ecommerce', 'shop', 'store', 'product'],
+        'context': 'This is an e-commerce page - focus on product display, shopping cart, and conversion optimization.',
+        'priority': 'products_and_checkout'
+    },
+    {
+        'type': 'portfolio',
+        'keywords': ['portfolio', 'gallery', 'showcase'],
+        'context': 'This is a portfolio/gallery page - focus on visual presentation and media display.',
+        'priority': 'visuals_and_media'
+    },
+]
+
+GENERAL_TASK_TYPE = {
+    'type': 'general',
+    'keywords': [],
+    'context': 'This is a general web page - ensure balanced structure with clear navigation and content organization.',
+    'priority': 'balanced_structure'
+}
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over lowercase keywords.
+    One pass over the text finds every keyword, so lookup cost does not grow
+    with the size of the taxonomy.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._built = False
+
+    def add(self, keyword, value):
+        state = 0
+        for ch in keyword.lower():
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((keyword, value))
+        self._built = False
+
+    def build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+        return self
+
+    def find_all(self, text):
+        """Yields (keyword, value) for every keyword occurrence in text."""
+        if not self._built:
+            self.build()
+        state = 0
+        for ch in text.lower():
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for match in self._out[state]:
+                yield match
+
+
+def compile_task_types(task_types=TASK_TYPES):
+    """Compiles the taxonomy into one automaton; values are taxonomy indexes."""
+    automaton = KeywordAutomaton()
+    for index, task_type in enumerate(task_types):
+        for keyword in task_type['keywords']:
+            automaton.add(keyword, index)
+    return automaton.build()
+
+
+_TASK_AUTOMATON = compile_task_types()
+
+
+def classify_task(task_description, task_types=TASK_TYPES, automaton=None):
+    """Returns the taxonomy entry for a goal, or GENERAL_TASK_TYPE."""
+    automaton = automaton or _TASK_AUTOMATON
+    best = None
+    for _, index in automaton.find_all(task_description):
+        if best is None or index < best:
+            best = index
+            if best == 0:
+                break
+    if best is None:
+        return dict(GENERAL_TASK_TYPE)
+    return dict(task_types[best])
+
+
+def embed_goal(text, dims=256):
+    """
+    Cheap local goal embedding: hashed word and character-trigram counts,
+    L2-normalised. Good enough to tell near-duplicate goals apart without
+    a model call.
+    """
+    vector = [0.0] * dims
+    text = re.sub(r'\s+', ' ', text.lower()).strip()
+    features = re.findall(r'[a-z0-9]+', text)
+    padded = f" {text} "
+    features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    for feature in features:
+        # Stable across runs, unlike the builtin str hash
+        h = 2166136261
+        for ch in feature.encode('utf-8'):
+            h = ((h ^ ch) * 16777619) & 0xFFFFFFFF
+        vector[h % dims] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def cosine_similarity(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+class PlanLibrary:
+    """
+    Persistent library of validated plans, indexed by task type and by goal
+    embedding. Stored as a single JSON file.
+    """
+
+    def __init__(self, path="plan_library.json", embed_fn=embed_goal):
+        self.path = path
+        self.embed_fn = embed_fn
+        self.entries = {}
+        # Batch runs share one library across worker threads
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = data.get('entries', {})
+        except (OSError, ValueError) as e:
+            print(f"  [Plan Library: could not read {self.path}: {str(e)}]")
+            self.entries = {}
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({'version': 1, 'entries': self.entries}, f)
+            os.replace(tmp_path, self.path)
+
+    def lookup(self, goal, task_type):
+        """Returns (entry, similarity) for the closest stored plan of the same type."""
+        with self._lock:
+            candidates = list(self.entries.get(task_type, []))
+        if not candidates:
+            return None, 0.0
+        query = self.embed_fn(goal)
+        best_entry, best_score = None, 0.0
+        for entry in candidates:
+            score = cosine_similarity(query, entry['embedding'])
+            if score > best_score:
+                best_entry, best_score = entry, score
+        return best_entry, best_score
+
+    def add(self, goal, task_type, plan):
+        with self._lock:
+            bucket = self.entries.setdefault(task_type, [])
+            for entry in bucket:
+                if entry['goal'] == goal:
+                    entry['plan'] = plan
+                    entry['created'] = time.time()
+                    break
+            else:
+                bucket.append({
+                    'goal': goal,
+                    'plan': plan,
+                    'embedding': self.embed_fn(goal),
+                    'created': time.time()
+                })
+            self.save()
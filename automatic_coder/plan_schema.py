@@ -0,0 +1,174 @@
+import json
+import re
+
+# JSON schema passed to ollama.chat(format=...) so the planner returns
+# structured output instead of free text.
+PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "overview": {"type": "string"},
+        "design_tokens": {
+            "type": "object",
+            "additionalProperties": {"type": "string"}
+        },
+        "parts": {
+            "type": "array",
+            "minItems": 5,
+            "maxItems": 5,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "number": {"type": "integer", "minimum": 1, "maximum": 5},
+                    "title": {"type": "string"},
+                    "components": {"type": "array", "items": {"type": "string"}}
+                },
+                "required": ["number", "title", "components"]
+            }
+        }
+    },
+    "required": ["overview", "design_tokens", "parts"]
+}
+
+# Shared design tokens (CSS custom properties) used when the planner omits them
+DEFAULT_DESIGN_TOKENS = {
+    "--bg": "#0f0f0f",
+    "--bg-card": "#181818",
+    "--bg-hover": "#272727",
+    "--border": "#272727",
+    "--accent": "#065fd4",
+    "--text": "#f1f1f1",
+    "--text-secondary": "#aaaaaa",
+    "--radius": "12px",
+    "--space": "8px",
+    "--transition": "0.2s ease"
+}
+
+# Canned content for each part, used to fill gaps and for the fallback plan
+DEFAULT_PARTS = {
+    1: ("HEADER & NAVIGATION", ["Main header with branding/logo", "Navigation menu structure", "Search functionality (if applicable)", "User account controls"]),
+    2: ("HERO SECTION / MAIN CONTENT AREA", ["Primary content area layout", "Key visual elements", "Call-to-action components", "Content hierarchy"]),
+    3: ("FEATURE SECTIONS / CONTENT BLOCKS", ["Secondary content areas", "Feature highlights", "Information organization", "Interactive elements"]),
+    4: ("SIDEBAR / SUPPORTING CONTENT", ["Secondary navigation", "Related content", "Widgets or tools", "Additional functionality"]),
+    5: ("FOOTER & FINAL ELEMENTS", ["Footer structure", "Contact information", "Legal links", "Social media integration"])
+}
+
+_PART_HEADING = re.compile(r'^\W*PART\s*([1-5])\b\W*(.*)$', re.IGNORECASE)
+
+
+class PlanPart:
+    def __init__(self, number, title, components):
+        self.number = number
+        self.title = title
+        self.components = components
+
+    def to_text(self):
+        lines = [f"PART {self.number}: {self.title}"]
+        lines += [f"- {component}" for component in self.components]
+        return "\n".join(lines)
+
+
+class Plan:
+    """
+    In-memory 5-part plan. Parsed once from the planner output; part
+    generators slice their own section from it.
+    """
+
+    def __init__(self, overview, parts, design_tokens=None, missing_parts=None):
+        self.overview = overview
+        self.parts = parts
+        self.design_tokens = design_tokens or {}
+        # Part numbers that were filled from DEFAULT_PARTS
+        self.missing_parts = missing_parts or []
+
+    @classmethod
+    def from_dict(cls, data):
+        parts = {}
+        for item in data.get('parts', []):
+            try:
+                number = int(item.get('number'))
+            except (TypeError, ValueError):
+                continue
+            if 1 <= number <= 5 and number not in parts:
+                components = [str(c).strip() for c in item.get('components', []) if str(c).strip()]
+                parts[number] = PlanPart(number, str(item.get('title', '')).strip(), components)
+        tokens = {}
+        for name, value in (data.get('design_tokens') or {}).items():
+            name = str(name).strip()
+            tokens[name if name.startswith('--') else '--' + name.lstrip('-')] = str(value).strip()
+        return cls(str(data.get('overview', '')).strip(), parts, tokens)
+
+    @classmethod
+    def from_text(cls, text):
+        """Single pass over a legacy free-text plan, splitting on PART headings."""
+        overview_lines = []
+        parts = {}
+        current = None
+        for line in text.splitlines():
+            stripped = line.strip()
+            match = _PART_HEADING.match(stripped)
+            if match:
+                number = int(match.group(1))
+                current = parts.get(number)
+                if current is None:
+                    current = parts[number] = PlanPart(number, match.group(2).strip(' *#:-'), [])
+                continue
+            if not stripped:
+                continue
+            if current is None:
+                overview_lines.append(stripped)
+            else:
+                current.components.append(stripped.lstrip('-*• ').strip())
+        return cls(" ".join(overview_lines), parts)
+
+    @classmethod
+    def parse(cls, raw):
+        """Parses planner output: JSON first, legacy text as a fallback."""
+        if isinstance(raw, dict):
+            return cls.from_dict(raw)
+        cleaned = re.sub(r'```[a-z]*\s*\n?', '', raw).strip()
+        try:
+            return cls.from_dict(json.loads(cleaned))
+        except (ValueError, AttributeError):
+            return cls.from_text(cleaned)
+
+    def complete(self):
+        """Fills missing parts and design tokens from the defaults."""
+        for number in range(1, 6):
+            part = self.parts.get(number)
+            if part is None or not part.components:
+                title, components = DEFAULT_PARTS[number]
+                self.parts[number] = PlanPart(number, (part.title if part and part.title else title), list(components))
+                self.missing_parts.append(number)
+            elif not part.title:
+                part.title = DEFAULT_PARTS[number][0]
+        for name, value in DEFAULT_DESIGN_TOKENS.items():
+            self.design_tokens.setdefault(name, value)
+        return self
+
+    def part_section(self, part_number):
+        part = self.parts.get(part_number)
+        if part is None:
+            return f"PART {part_number}: component based on the overall plan structure."
+        return part.to_text()
+
+    def tokens_css(self):
+        declarations = "\n".join(f"  {name}: {value};" for name, value in self.design_tokens.items())
+        return f":root {{\n{declarations}\n}}"
+
+    def to_dict(self):
+        return {
+            'overview': self.overview,
+            'design_tokens': dict(self.design_tokens),
+            'parts': [
+                {'number': part.number, 'title': part.title, 'components': list(part.components)}
+                for _, part in sorted(self.parts.items())
+            ]
+        }
+
+    def to_text(self):
+        sections = [self.overview] if self.overview else []
+        sections += [part.to_text() for _, part in sorted(self.parts.items())]
+        return "\n\n".join(sections)
+
+    def __str__(self):
+        return self.to_text()
@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+import webbrowser
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Skeleton page: head CSS is served right away, parts are pushed into their
+# slots over server-sent events as soon as they are generated.
+SKELETON = """<!DOCTYPE html>
+<html lang='en'>
+<head>
+  <meta charset='utf-8' />
+  <meta name='viewport' content='width=device-width, initial-scale=1' />
+  <title>{title}</title>
+{head_css}
+  <style id='live-style'></style>
+</head>
+<body>
+{slots}
+<script>
+  (function(){{
+    var source = new EventSource('/events');
+    source.addEventListener('part', function(e){{
+      var data = JSON.parse(e.data);
+      var slot = document.getElementById('part-' + data.part);
+      if (slot) {{ slot.innerHTML = data.html; }}
+    }});
+    source.addEventListener('style', function(e){{
+      document.getElementById('live-style').textContent = JSON.parse(e.data).css;
+    }});
+    source.addEventListener('reload', function(e){{
+      source.close();
+      location.replace('/?v=' + JSON.parse(e.data).version);
+    }});
+    source.addEventListener('done', function(){{ source.close(); }});
+  }})();
+</script>
+</body>
+</html>"""
+
+
+class PreviewServer:
+    """
+    Local live-preview server. Serves the page skeleton immediately and
+    streams each part into place over SSE. After a repair the final page is
+    served under a new version so the browser cache is bypassed.
+
+    headless=True (default when $CI is set) never opens a browser.
+    """
+
+    def __init__(self, head_css="", title="Preview", parts=5, host="127.0.0.1", port=0, headless=None):
+        self.head_css = head_css
+        self.title = title
+        self.part_count = parts
+        self.host = host
+        self.port = port
+        self.headless = bool(os.environ.get("CI")) if headless is None else headless
+        self.version = 0
+        self.served_version = -1
+        self._events = []
+        self._final_html = None
+        # Files the final page links (e.g. its deferred stylesheet), by URL path
+        self._assets = {}
+        self._closed = False
+        self._cond = threading.Condition()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/"
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"  [Preview: {self.url}]")
+        if not self.headless:
+            webbrowser.open(self.url)
+        return self
+
+    def push_style(self, css):
+        self._publish("style", {'css': css})
+
+    def push_part(self, part_number, html):
+        self._publish("part", {'part': part_number, 'html': html})
+
+    def replace_page(self, html, assets=None):
+        """
+        Serves a complete page (the assembled one, or a repaired one) under a
+        new version. assets maps the relative names of stylesheets the page
+        links to their CSS.
+        """
+        with self._cond:
+            self._final_html = html
+            self._assets.update({f"/{name}": content for name, content in (assets or {}).items()})
+            self.version += 1
+        self._publish("reload", {'version': self.version})
+
+    def stop(self, grace=3.0):
+        """Signals completion; waits briefly so an open browser can fetch the latest page."""
+        self._publish("done", {})
+        if not self.headless and self._final_html is not None:
+            deadline = time.time() + grace
+            with self._cond:
+                while self.served_version < self.version and time.time() < deadline:
+                    self._cond.wait(deadline - time.time())
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def _publish(self, event, data):
+        with self._cond:
+            self._events.append((event, json.dumps(data)))
+            self._cond.notify_all()
+
+    def _render(self):
+        with self._cond:
+            if self._final_html is not None:
+                self.served_version = self.version
+                self._cond.notify_all()
+                return self._final_html
+        slots = "\n".join(f"<div id='part-{i}'></div>" for i in range(1, self.part_count + 1))
+        return SKELETON.format(title=escape(self.title), head_css=self.head_css, slots=slots)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.startswith("/events"):
+                    self._stream_events()
+                elif self.path == "/" or self.path.startswith("/?"):
+                    body = server._render().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Cache-Control", "no-store")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif self.path.split("?")[0] in server._assets:
+                    body = server._assets[self.path.split("?")[0]].encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/css; charset=utf-8")
+                    self.send_header("Cache-Control", "no-store")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                else:
+                    self.send_error(404)
+
+            def _stream_events(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                index = int(self.headers.get("Last-Event-ID", -1)) + 1
+                try:
+                    while True:
+                        with server._cond:
+                            while index >= len(server._events) and not server._closed:
+                                if not server._cond.wait(15):
+                                    break
+                            pending = server._events[index:]
+                            closed = server._closed
+                        if not pending:
+                            if closed:
+                                return
+                            self.wfile.write(b": keepalive\n\n")
+                        for offset, (event, data) in enumerate(pending):
+                            self.wfile.write(f"id: {index + offset}\nevent: {event}\ndata: {data}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                        index += len(pending)
+                        if any(event == "done" for event, _ in pending):
+                            return
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+
+        return Handler
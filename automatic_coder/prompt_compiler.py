@@ -0,0 +1,160 @@
+"""
+Prompt template compiler.
+
+Templates live in prompts/<name>.v<N>.txt. Each is compiled once: dedented,
+whitespace-normalised, {{> partial}} includes pre-rendered, and the static
+text token-counted. Runtime values use string.Template ($name) syntax so
+CSS braces in templates need no escaping.
+
+    python prompt_compiler.py            # build report with prefill cost
+"""
+import argparse
+import hashlib
+import math
+import os
+import re
+import textwrap
+from string import Template
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+TEMPLATE_FILE = re.compile(r'^(?P<name>[a-z0-9_]+)\.v(?P<version>\d+)\.txt$')
+INCLUDE = re.compile(r'\{\{>\s*([a-z0-9_]+)\s*\}\}')
+
+# CPU-hosted models prefill at a few dozen tokens per second
+DEFAULT_PREFILL_TPS = 40.0
+
+_PRETOKEN = re.compile(r"'(?:s|t|re|ve|m|ll|d)| ?[A-Za-z]+| ?[0-9]{1,3}| ?[^\sA-Za-z0-9]+|\s+")
+
+
+def _local_token_count(text):
+    """
+    Approximates a BPE tokenizer: GPT-style pre-tokenization, long words
+    split roughly every 4 characters, whitespace runs every 8.
+    """
+    count = 0
+    for piece in _PRETOKEN.findall(text):
+        if piece.isspace():
+            count += math.ceil(len(piece) / 8)
+        else:
+            count += max(1, math.ceil(len(piece.strip()) / 4)) if len(piece) > 6 else 1
+    return count
+
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(text):
+        return len(_ENCODING.encode(text))
+except ImportError:
+    count_tokens = _local_token_count
+
+
+def normalize_whitespace(text):
+    """Dedents, strips trailing spaces and collapses runs of blank lines."""
+    lines = text.expandtabs(4).split("\n")
+    # The first line of an inline f-string usually starts right after the quotes
+    head, rest = lines[0].strip(), textwrap.dedent("\n".join(lines[1:]))
+    text = head + "\n" + rest if head else rest
+    text = "\n".join(line.rstrip() for line in text.split("\n"))
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+class CompiledPrompt:
+    def __init__(self, name, version, text, raw_text):
+        self.name = name
+        self.version = version
+        self.text = text
+        self.template = Template(text)
+        self.sha = hashlib.sha1(text.encode("utf-8")).hexdigest()[:10]
+        self.variables = sorted({m.group('named') or m.group('braced') for m in self.template.pattern.finditer(text)
+                                 if m.group('named') or m.group('braced')})
+        # Build-time accounting: static text only, variables excluded
+        self.raw_tokens = count_tokens(raw_text)
+        self.static_tokens = count_tokens(self.template.safe_substitute({v: "" for v in self.variables}))
+
+    def render(self, **values):
+        return self.template.substitute(**values)
+
+    def prefill_seconds(self, tokens=None, tokens_per_second=DEFAULT_PREFILL_TPS):
+        return (self.static_tokens if tokens is None else tokens) / tokens_per_second
+
+
+class PromptLibrary:
+    """Loads the newest version of every template (or pinned ones) and compiles them."""
+
+    def __init__(self, prompts_dir=PROMPTS_DIR, pins=None):
+        self.prompts_dir = prompts_dir
+        self.pins = pins or {}
+        self.sources = self._discover()
+        self.prompts = {}
+        for name in self.sources:
+            self.prompts[name] = self._compile(name)
+
+    def _discover(self):
+        sources = {}
+        for file_name in os.listdir(self.prompts_dir):
+            match = TEMPLATE_FILE.match(file_name)
+            if not match:
+                continue
+            name, version = match.group('name'), int(match.group('version'))
+            if name in self.pins and self.pins[name] != version:
+                continue
+            if version >= sources.get(name, (0, None))[0]:
+                sources[name] = (version, os.path.join(self.prompts_dir, file_name))
+        return sources
+
+    def _read(self, name):
+        with open(self.sources[name][1], "r", encoding="utf-8") as f:
+            return f.read()
+
+    def _expand(self, name, normalize=True, seen=()):
+        if name in seen:
+            raise ValueError(f"Prompt include cycle: {' -> '.join(seen + (name,))}")
+        if name not in self.sources:
+            raise KeyError(f"Unknown prompt template: {name}")
+        text = self._read(name)
+        if normalize:
+            text = normalize_whitespace(text)
+        return INCLUDE.sub(lambda m: self._expand(m.group(1), normalize, seen + (name,)), text)
+
+    def _compile(self, name):
+        return CompiledPrompt(name, self.sources[name][0], self._expand(name), self._expand(name, normalize=False))
+
+    def __getitem__(self, name):
+        return self.prompts[name]
+
+    def render(self, name, **values):
+        return self.prompts[name].render(**values)
+
+    def report(self, tokens_per_second=DEFAULT_PREFILL_TPS):
+        rows = []
+        for name, prompt in sorted(self.prompts.items()):
+            rows.append({
+                'name': name,
+                'version': prompt.version,
+                'sha': prompt.sha,
+                'variables': prompt.variables,
+                'raw_tokens': prompt.raw_tokens,
+                'static_tokens': prompt.static_tokens,
+                'prefill_seconds': round(prompt.prefill_seconds(tokens_per_second=tokens_per_second), 2)
+            })
+        return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile prompt templates and report token/prefill cost.")
+    parser.add_argument("--prompts-dir", default=PROMPTS_DIR)
+    parser.add_argument("--prefill-tps", type=float, default=DEFAULT_PREFILL_TPS, help="prefill tokens per second of the target model")
+    args = parser.parse_args(argv)
+
+    library = PromptLibrary(args.prompts_dir)
+    print(f"{'prompt':<20} {'ver':>3} {'sha':<10} {'raw':>6} {'static':>6} {'prefill s':>9}  variables")
+    for row in library.report(args.prefill_tps):
+        print(f"{row['name']:<20} {row['version']:>3} {row['sha']:<10} {row['raw_tokens']:>6} {row['static_tokens']:>6} "
+              f"{row['prefill_seconds']:>9}  {', '.join(row['variables'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Repetition macros: one template plus data instead of N written-out copies.
+
+A part can write a repeated block once:
+
+    <template data-repeat="8">
+      <article class="card"><h3 class="card__title">Video {{index}}</h3></article>
+    </template>
+
+    <template data-repeat-data='[{"title": "Intro", "meta": "3 min"}, {"title": "Setup", "meta": "9 min"}]'>
+      <article class="card"><h3 class="card__title">{{title}}</h3><p>{{meta}}</p></article>
+    </template>
+
+expand_tree() renders the copies locally with the slot template engine
+({{name}}, {{.}} for a list of strings, {{index}} counting from 1,
+{{#each name}} for nested lists) and puts them where the <template> was,
+so the model's output stays the same size whatever the card count.
+A macro nested in another one is expanded once per outer copy and can use
+the outer item's fields. <template> elements without these attributes are
+left alone.
+"""
+import json
+
+from html_dom import Node, parse, serialize
+from slot_templates import _TOKEN, render_string
+
+REPEAT_ATTR = 'data-repeat'
+DATA_ATTR = 'data-repeat-data'
+# Stand-in for a nested macro while the body around it renders
+SLOT_ATTR = 'data-repeat-slot'
+# Copies per macro; a runaway count cannot blow up the page
+MAX_REPEAT = 48
+
+
+def _is_macro(node):
+    return node.tag == 'template' and (REPEAT_ATTR in node.attrs or DATA_ATTR in node.attrs)
+
+
+def _items(node):
+    """Per-copy contexts of a macro node. Raises ValueError on bad attributes."""
+    if DATA_ATTR in node.attrs:
+        data = json.loads(node.attrs[DATA_ATTR] or "")
+        if not isinstance(data, list):
+            raise ValueError(f"{DATA_ATTR} is not a JSON list")
+    else:
+        data = [{}] * int(node.attrs.get(REPEAT_ATTR) or 0)
+    return data[:MAX_REPEAT]
+
+
+def _outermost_macros(node):
+    """Macros under node that are not nested in another macro under node."""
+    found = []
+    for child in node.children:
+        if _is_macro(child):
+            found.append(child)
+        elif child.is_element:
+            found.extend(_outermost_macros(child))
+    return found
+
+
+def _expand(node, contexts, stats):
+    """
+    Replaces a macro node by its copies. Nested macros are set aside while
+    the body renders and expanded per copy, so they see the outer item too.
+    """
+    nested = []
+    for index, inner in enumerate(_outermost_macros(node)):
+        nested.append(serialize(inner))
+        inner.parent.insert(inner.parent.children.index(inner), Node('template', {SLOT_ATTR: str(index)}))
+        inner.remove()
+    body = "".join(serialize(child) for child in node.children)
+
+    copies = []
+    try:
+        items = _items(node)
+        for index, item in enumerate(items, start=1):
+            item_contexts = contexts + [{'index': index}, item]
+            copies.append((parse(render_string(body, *item_contexts)), item_contexts))
+    except ValueError as e:
+        # One copy with empty fields still shows the block's layout
+        stats['errors'].append(str(e))
+        copies = [(parse(_TOKEN.sub('', body)), contexts)]
+
+    parent = node.parent
+    position = parent.children.index(node)
+    node.remove()
+    for copy, item_contexts in copies:
+        for slot in [n for n in copy.elements('template') if SLOT_ATTR in n.attrs]:
+            inner = next(child for child in parse(nested[int(slot.attrs[SLOT_ATTR])]).children if child.is_element)
+            slot.parent.insert(slot.parent.children.index(slot), inner)
+            slot.remove()
+            _expand(inner, item_contexts, stats)
+        for child in list(copy.children):
+            parent.insert(position, child)
+            position += 1
+    stats['macros'] += 1
+    stats['copies'] += len(copies)
+
+
+def expand_tree(root):
+    """Expands every macro under root in place. Returns {'macros', 'copies', 'errors'}."""
+    stats = {'macros': 0, 'copies': 0, 'errors': []}
+    for node in _outermost_macros(root):
+        _expand(node, [], stats)
+    return stats
+
+
+def expand_macros(html):
+    """Returns (html with every macro expanded, stats). Markup without macros is returned as-is."""
+    if not html or REPEAT_ATTR not in html:
+        return html, {'macros': 0, 'copies': 0, 'errors': []}
+    root = parse(html)
+    stats = expand_tree(root)
+    return (serialize(root) if stats['macros'] else html), stats
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """The overall request deadline ran out before the call finished."""
+
+
+class CircuitOpenError(Exception):
+    """The backend is considered down; the call was not attempted."""
+
+
+class Deadline:
+    """Absolute deadline for a whole request, passed down to every stage."""
+
+    def __init__(self, seconds=None):
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def clamp(self, timeout):
+        """Returns the per-attempt timeout, never past the deadline."""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return remaining if timeout is None else min(timeout, remaining)
+
+
+class RetryMetrics:
+    """Counters for retries and breaker state, shared by all calls of an agent."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {
+            'calls': 0,
+            'attempts': 0,
+            'retries': 0,
+            'successes': 0,
+            'failures': 0,
+            'timeouts': 0,
+            'short_circuits': 0,
+            'deadline_exceeded': 0,
+            'breaker_opens': 0
+        }
+        self.breaker_state = CircuitBreaker.CLOSED
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.counters)
+        data['breaker_state'] = self.breaker_state
+        return data
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the backend is down. After failure_threshold
+    consecutive failures the breaker opens; after reset_timeout one probe is
+    let through (half-open) and its result closes or re-opens the breaker.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, metrics=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.metrics = metrics
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        if state == self.OPEN and self.state != self.OPEN and self.metrics:
+            self.metrics.incr('breaker_opens')
+        self.state = state
+        if self.metrics:
+            self.metrics.breaker_state = state
+
+    def allow(self):
+        """Raises CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"circuit open, retry in {self.reset_timeout - (time.monotonic() - self.opened_at):.1f}s")
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    raise CircuitOpenError("circuit half-open, probe in flight")
+                self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_in_flight = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+            self._probe_in_flight = False
+
+
+class RetryPolicy:
+    """
+    Retry with decorrelated jitter: each delay is drawn from
+    [base_delay, previous_delay * 3], capped at max_delay.
+    """
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=30.0, attempt_timeout=180.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+
+    def next_delay(self, previous_delay):
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous_delay * 3)))
+
+
+async def call_with_retry(fn, operation_name, policy=None, breaker=None, deadline=None, metrics=None):
+    """
+    Awaits fn() under the retry policy, breaker and deadline.
+    fn must be a zero-argument callable returning an awaitable.
+    """
+    policy = policy or RetryPolicy()
+    deadline = deadline or Deadline()
+    metrics = metrics or RetryMetrics()
+    metrics.incr('calls')
+    delay = policy.base_delay
+    last_error = None
+
+    for attempt in range(policy.max_attempts):
+        if deadline.expired():
+            metrics.incr('deadline_exceeded')
+            raise DeadlineExceeded(f"{operation_name}: deadline exceeded after {attempt} attempts ({last_error})")
+        if breaker:
+            try:
+                breaker.allow()
+            except CircuitOpenError:
+                metrics.incr('short_circuits')
+                raise
+
+        metrics.incr('attempts')
+        if attempt:
+            metrics.incr('retries')
+        logger.info(f"Attempt {attempt + 1}/{policy.max_attempts} for {operation_name}")
+        try:
+            result = await asyncio.wait_for(fn(), timeout=deadline.clamp(policy.attempt_timeout))
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.incr('timeouts')
+            last_error = e
+            if breaker:
+                breaker.record_failure()
+            logger.warning(f"Attempt {attempt + 1} failed for {operation_name}: {str(e) or type(e).__name__}")
+            if attempt == policy.max_attempts - 1:
+                break
+            delay = policy.next_delay(delay)
+            remaining = deadline.remaining()
+            if remaining is not None and delay >= remaining:
+                metrics.incr('deadline_exceeded')
+                raise DeadlineExceeded(f"{operation_name}: no time left for another attempt ({str(e)})")
+            logger.info(f"Waiting {delay:.2f} seconds before retry...")
+            await asyncio.sleep(delay)
+            continue
+
+        if breaker:
+            breaker.record_success()
+        metrics.incr('successes')
+        logger.info(f"Successfully completed {operation_name}")
+        return result
+
+    metrics.incr('failures')
+    logger.error(f"All {policy.max_attempts} attempts failed for {operation_name}")
+    raise Exception(f"Failed to complete {operation_name} after {policy.max_attempts} attempts: {str(last_error)}")
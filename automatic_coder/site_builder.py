@@ -0,0 +1,222 @@
+"""
+Multi-page site mode.
+
+    python cli.py -p v7.5-site "a small bakery site with menu, about and contact pages"
+
+1. Site map: one schema-constrained call lists the pages (slug, title, goal).
+2. Design system and shared components: one plan for the whole site gives
+   the design tokens, the header (Part 1, linking every page) and the footer
+   (Part 5). Both are generated once and kept in the part cache by spec
+   hash, so the next build of the same site reuses them.
+3. Page parts: each page plans and generates only Parts 2-4; pages run in
+   parallel, one agent per worker.
+4. site.css holds the tokens and the shared components' CSS. Every page
+   links it, inlines its own rules for the header and hero and defers the
+   rest to <slug>.deferred.css.
+"""
+import json
+import os
+import re
+import webbrowser
+from concurrent.futures import ThreadPoolExecutor
+
+from css_tools import optimize_css
+from model_residency import RESIDENCY
+from page_assembler import PageAssembler, split_styles
+from part_cache import PartCache
+from pipelines import load_script
+from plan_library import PlanLibrary
+from plan_schema import Plan
+from token_budget import TokenBudget
+from tracing import Tracer
+
+SITE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "pages": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "slug": {"type": "string"},
+                    "title": {"type": "string"},
+                    "goal": {"type": "string"}
+                },
+                "required": ["slug", "title", "goal"]
+            }
+        }
+    },
+    "required": ["pages"]
+}
+
+MAX_PAGES = 8
+SHARED_PARTS = (1, 5)
+STYLESHEET = "site.css"
+# Header and hero: their CSS is inlined, the rest of the page's own CSS goes to <slug>.deferred.css
+CRITICAL_PARTS = 2
+
+
+def _slug(text, fallback):
+    slug = re.sub(r'[^a-z0-9]+', '-', str(text or "").lower()).strip('-')[:40]
+    return slug or fallback
+
+
+def parse_site_map(content, goal):
+    """
+    Pages as [{'slug', 'title', 'goal'}] with the home page first as
+    "index". Unparseable output gives a single home page.
+    """
+    try:
+        data = json.loads(content) if isinstance(content, str) else content
+        raw_pages = data.get('pages') or []
+    except (ValueError, AttributeError):
+        raw_pages = []
+
+    pages, seen = [], set()
+    for index, page in enumerate(raw_pages):
+        if not isinstance(page, dict):
+            continue
+        slug = "index" if not pages else _slug(page.get('slug') or page.get('title'), f"page-{index}")
+        if slug in seen:
+            continue
+        seen.add(slug)
+        title = str(page.get('title') or slug.replace('-', ' ').title())
+        pages.append({'slug': slug, 'title': title, 'goal': str(page.get('goal') or title)})
+        if len(pages) == MAX_PAGES:
+            break
+    return pages or [{'slug': "index", 'title': "Home", 'goal': goal}]
+
+
+class SiteBuilder:
+    def __init__(self, model_name, out_dir="site", workers=3, samples=1, tracer=None,
+                 plan_library=None, token_budget=None, part_cache=None):
+        self.model_name = model_name
+        self.out_dir = out_dir
+        # Pages generated concurrently
+        self.workers = max(1, workers)
+        self.samples = samples
+        self.tracer = tracer if tracer is not None else Tracer(process_name="site_builder")
+        # Every page agent shares plans, budgets and cached parts
+        self.shared = {
+            'plan_library': plan_library if plan_library is not None else PlanLibrary(),
+            'token_budget': token_budget if token_budget is not None else TokenBudget(),
+            'part_cache': part_cache if part_cache is not None else PartCache()
+        }
+        self.stats = {}
+
+    def _agent(self):
+        agent_class = load_script("automatic_coder_v7.5.py").RecursiveHTMLAgent
+        return agent_class(self.model_name, tracer=self.tracer, samples=self.samples, **self.shared)
+
+    def site_map(self, agent, goal):
+        prompt = agent._render_prompt("site_map", site_goal=goal, max_pages=MAX_PAGES)
+        try:
+            response = agent._chat(
+                "llm.site_map",
+                stage="site_map",
+                messages=[{"role": "user", "content": prompt}],
+                format=SITE_SCHEMA,
+                options={"temperature": 0.3}
+            )
+            return parse_site_map(response['message']['content'], goal)
+        except Exception as e:
+            print(f"  [Site Map Error: {str(e)}]")
+            return parse_site_map(None, goal)
+
+    @staticmethod
+    def _add_navigation(plan, pages):
+        """Header and footer link every page, so both can be shared as-is."""
+        links = ", ".join(f"{page['title']} ({page['slug']}.html)" for page in pages)
+        plan.parts[1].components = list(plan.parts[1].components) + [f"Navigation links to every page of the site: {links}"]
+        plan.parts[5].components = list(plan.parts[5].components) + [f"Footer links to every page: {links}"]
+
+    def build(self, goal):
+        os.makedirs(self.out_dir, exist_ok=True)
+        site_agent = self._agent()
+        with self.tracer.span("site_map"):
+            pages = self.site_map(site_agent, goal)
+        print(f"  [Site map: {', '.join(page['slug'] for page in pages)}]")
+
+        # 1. Design system and shared components, once for the whole site
+        with self.tracer.span("plan"):
+            site_plan = site_agent.plan_tool(goal)
+        self._add_navigation(site_plan, pages)
+        shared_parts = {}
+        for part_number in SHARED_PARTS:
+            shared_parts[part_number] = split_styles(site_agent.produce_part(part_number, site_plan))
+
+        stylesheet = optimize_css(site_plan.tokens_css() + "\n" + "\n".join(css for _, css in shared_parts.values()))
+        with open(os.path.join(self.out_dir, STYLESHEET), "w", encoding="utf-8") as f:
+            f.write(stylesheet)
+
+        # 2. Page-specific parts, pages in parallel
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(lambda page: self.build_page(page, goal, site_plan, shared_parts, stylesheet), pages))
+
+        generated = sum(len(result['generated']) for result in results)
+        reused = sum(len(result['reused']) for result in results)
+        self.stats = {
+            'pages': len(results),
+            'shared_parts_reused': len(site_agent.reused_parts),
+            'page_parts_generated': generated,
+            'page_parts_reused': reused,
+            'stylesheet_bytes': len(stylesheet)
+        }
+        print(f"  [Site: {len(results)} pages in {self.out_dir}/, header and footer "
+              f"{'reused from cache' if len(site_agent.reused_parts) == len(SHARED_PARTS) else 'generated once'}, "
+              f"{STYLESHEET} {len(stylesheet) / 1024:.1f} KB linked by every page; "
+              f"page parts: {generated} generated, {reused} reused]")
+        return results
+
+    def build_page(self, page, site_goal, site_plan, shared_parts, stylesheet):
+        agent = self._agent()
+        with self.tracer.span(f"page.{page['slug']}", page=page['slug']):
+            page_plan = agent.plan_tool(f"{page['goal']} (the '{page['title']}' page of: {site_goal})")
+            # The page keeps the site's tokens and shared sections so its parts match them
+            plan = Plan(page['goal'], {
+                number: site_plan.parts[number] if number in SHARED_PARTS else page_plan.parts[number]
+                for number in range(1, 6)
+            }, site_plan.design_tokens)
+
+            for number in range(1, 6):
+                if number not in SHARED_PARTS:
+                    agent.produce_part(number, plan)
+
+            assembler = PageAssembler(minify=True)
+            deferred_name = f"{page['slug']}.deferred.css"
+
+            def assemble():
+                parts = [shared_parts[number][0] if number in SHARED_PARTS else agent.parts[number]
+                         for number in range(1, 6)]
+                return assembler.assemble(parts, title=page['title'], stylesheets=[STYLESHEET], linked_css=stylesheet,
+                                          critical_parts=CRITICAL_PARTS, deferred_href=deferred_name)
+
+            # Only the page's own parts can be blamed: the shared ones are not in agent.parts
+            html = agent.enforce_budgets(plan, assemble)
+            # A cached part repaired for the budgets counts as generated
+            generated = [number for number in sorted(agent.parts) if number not in agent.reused_parts]
+            path = os.path.join(self.out_dir, f"{page['slug']}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(html)
+            if assembler.deferred_css:
+                with open(os.path.join(self.out_dir, deferred_name), "w", encoding="utf-8") as f:
+                    f.write(assembler.deferred_css)
+        print(f"  [Page {page['slug']}.html: {len(html)} bytes, generated parts {', '.join(map(str, generated)) or 'none'}]")
+        return {'slug': page['slug'], 'path': path, 'generated': generated, 'reused': list(agent.reused_parts)}
+
+    def execute(self, goal, headless=None, trace_path="site_trace.json"):
+        with self.tracer.span("execute", goal=goal, model=self.model_name):
+            RESIDENCY.warm(self.model_name, self.tracer)
+            self.build(goal)
+
+        headless = bool(os.environ.get("CI")) if headless is None else headless
+        if not headless:
+            webbrowser.open(f"file://{os.path.realpath(os.path.join(self.out_dir, 'index.html'))}")
+        if trace_path and self.tracer.save(trace_path):
+            print(f"  [Trace: {trace_path} (open in ui.perfetto.dev)]")
+
+
+if __name__ == "__main__":
+    builder = SiteBuilder("deepseek-coder-v2")
+    builder.execute("a small bakery site with menu, about and contact pages")
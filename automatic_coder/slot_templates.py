@@ -0,0 +1,257 @@
+import json
+import re
+from html import escape
+
+# {{name}}, {{.}}, {{#each name}} ... {{/each}}
+_TOKEN = re.compile(r'\{\{\s*(#each\s+[A-Za-z_]\w*|/each|\.|[A-Za-z_]\w*)\s*\}\}')
+
+
+def _parse(template):
+    """Parses a slot template into a tree of text / var / each nodes."""
+    root = []
+    stack = [('root', root)]
+    pos = 0
+    for match in _TOKEN.finditer(template):
+        if match.start() > pos:
+            stack[-1][1].append(('text', template[pos:match.start()]))
+        token = match.group(1)
+        if token.startswith('#each'):
+            body = []
+            stack[-1][1].append(('each', token.split()[1], body))
+            stack.append(('each', body))
+        elif token == '/each':
+            if len(stack) == 1:
+                raise ValueError("Unbalanced {{/each}} in slot template")
+            stack.pop()
+        else:
+            stack[-1][1].append(('var', token))
+        pos = match.end()
+    if len(stack) != 1:
+        raise ValueError("Unclosed {{#each}} in slot template")
+    if pos < len(template):
+        root.append(('text', template[pos:]))
+    return root
+
+
+def _lookup(name, contexts):
+    for context in reversed(contexts):
+        if name == '.':
+            # An object has no text of its own
+            return "" if isinstance(context, dict) else context
+        if isinstance(context, dict) and name in context:
+            return context[name]
+    return ""
+
+
+def _render(nodes, contexts, out):
+    for node in nodes:
+        if node[0] == 'text':
+            out.append(node[1])
+        elif node[0] == 'var':
+            value = _lookup(node[1], contexts)
+            out.append(escape(str(value), quote=True))
+        else:
+            for item in _lookup(node[1], contexts) or []:
+                _render(node[2], contexts + [item], out)
+
+
+def render_string(template, *contexts):
+    """Renders template text against contexts; names resolve in the last context first."""
+    out = []
+    _render(_parse(template), list(contexts), out)
+    return "".join(out)
+
+
+def _coerce(value, spec, default):
+    """Fits an LLM value to its slot spec; falls back to the default."""
+    kind = spec.get('type')
+    if kind == 'string':
+        if not isinstance(value, (str, int, float)) or not str(value).strip():
+            return default
+        text = " ".join(str(value).split())
+        return text[:spec.get('maxLength', len(text))]
+    if kind == 'object':
+        if not isinstance(value, dict):
+            return default
+        props = spec.get('properties', {})
+        defaults = default if isinstance(default, dict) else {}
+        return {name: _coerce(value.get(name), sub, defaults.get(name, "")) for name, sub in props.items()}
+    if kind == 'array':
+        if not isinstance(value, list):
+            return default
+        items = [v for v in value if v not in (None, "", {})][:spec.get('maxItems', len(value))]
+        if len(items) < spec.get('minItems', 0):
+            return default
+        item_default = default[0] if default else ""
+        return [_coerce(v, spec.get('items', {}), item_default) for v in items]
+    return value if value is not None else default
+
+
+class SlotTemplate:
+    """
+    Part skeleton with named slots. The LLM only fills a small JSON object
+    (constrained by schema()); render() builds the markup locally.
+    """
+
+    def __init__(self, name, html, slots, defaults):
+        self.name = name
+        self.html = html.strip()
+        self.slots = slots
+        self.defaults = defaults
+        self._tree = _parse(self.html)
+
+    def schema(self):
+        return {
+            "type": "object",
+            "properties": self.slots,
+            "required": list(self.slots)
+        }
+
+    def describe(self):
+        """Short slot list for the prompt."""
+        lines = []
+        for name, spec in self.slots.items():
+            lines.append(f"- {name}: {spec.get('description', spec.get('type'))}")
+        return "\n".join(lines)
+
+    def coerce(self, values):
+        values = values if isinstance(values, dict) else {}
+        return {name: _coerce(values.get(name), spec, self.defaults[name]) for name, spec in self.slots.items()}
+
+    def render(self, values=None):
+        out = []
+        _render(self._tree, [self.coerce(values)], out)
+        return "".join(out)
+
+    def parse_response(self, text):
+        """Parses the LLM's JSON slot values; invalid JSON renders the defaults."""
+        text = re.sub(r'```[a-z]*\s*\n?', '', text or "").strip()
+        try:
+            return json.loads(text)
+        except ValueError:
+            match = re.search(r'\{.*\}', text, re.DOTALL)
+            if match:
+                try:
+                    return json.loads(match.group(0))
+                except ValueError:
+                    pass
+        return {}
+
+
+def _string(description, max_length):
+    return {"type": "string", "maxLength": max_length, "description": description}
+
+
+def _strings(description, max_length, min_items, max_items):
+    return {"type": "array", "items": {"type": "string", "maxLength": max_length},
+            "minItems": min_items, "maxItems": max_items, "description": description}
+
+
+# Slot versions of the SimpleFrameAgent skeletons. Class names match
+# build_min_css so the frame styling still applies.
+FRAME_TEMPLATES = {
+    1: SlotTemplate("header", """
+<header class="app-header" role="banner" aria-label="Top navigation">
+  <div class="header__left" aria-label="Brand">
+    <a class="ui-box ui-box--logo" href="#">{{brand}}</a>
+  </div>
+  <div class="header__center" role="search" aria-label="Search">
+    <input class="ui-box ui-box--search" type="search" placeholder="{{search_placeholder}}" aria-label="{{search_placeholder}}">
+  </div>
+  <nav class="header__right" aria-label="Actions">
+    {{#each actions}}<button class="ui-box ui-box--icon" type="button" aria-label="{{.}}" title="{{.}}"></button>
+    {{/each}}<div class="ui-box ui-box--avatar" role="img" aria-label="{{account_label}}"></div>
+  </nav>
+</header>
+""", {
+        'brand': _string("site name shown as the logo", 24),
+        'search_placeholder': _string("placeholder text of the search box", 40),
+        'actions': _strings("labels of the header action buttons", 20, 0, 4),
+        'account_label': _string("accessible label of the account avatar", 30)
+    }, {
+        'brand': "Brand",
+        'search_placeholder': "Search",
+        'actions': ["Create", "Notifications"],
+        'account_label': "Account"
+    }),
+    2: SlotTemplate("chips", """
+<section class="chips" aria-label="{{chips_label}}">
+  <div class="chips__row">
+    {{#each chips}}<button class="chip" type="button">{{.}}</button>
+    {{/each}}
+  </div>
+</section>
+""", {
+        'chips_label': _string("accessible label of the category row", 30),
+        'chips': _strings("category filter names", 20, 3, 10)
+    }, {
+        'chips_label': "Category filters",
+        'chips': ["All", "Music", "News", "Gaming", "Live", "Sports"]
+    }),
+    3: SlotTemplate("grid", """
+<main class="content" role="main" aria-label="Main content">
+  <section class="grid" aria-label="{{grid_label}}">
+    {{#each cards}}<article class="card" aria-label="{{title}}">
+      <div class="card__thumb" aria-hidden="true"></div>
+      <div class="card__meta">
+        <div class="card__avatar" aria-hidden="true"></div>
+        <div class="card__text">
+          <div class="card__title">{{title}}</div>
+          <div class="card__sub">{{subtitle}}</div>
+        </div>
+      </div>
+    </article>
+    {{/each}}
+  </section>
+</main>
+""", {
+        'grid_label': _string("accessible label of the card grid", 30),
+        'cards': {
+            "type": "array", "minItems": 3, "maxItems": 12,
+            "description": "cards with a title and a short subtitle line",
+            "items": {
+                "type": "object",
+                "properties": {'title': _string("card title", 70), 'subtitle': _string("meta line", 60)},
+                "required": ["title", "subtitle"]
+            }
+        }
+    }, {
+        'grid_label': "Video grid",
+        'cards': [{'title': "Title", 'subtitle': "Channel - views"}] * 6
+    }),
+    4: SlotTemplate("pager", """
+<section class="pager" aria-label="Pagination">
+  <button class="ui-box ui-box--loadmore" type="button">{{load_more_label}}</button>
+</section>
+""", {
+        'load_more_label': _string("text of the load more button", 24)
+    }, {
+        'load_more_label': "Load more"
+    }),
+    5: SlotTemplate("footer", """
+<footer class="footer" role="contentinfo" aria-label="Footer">
+  <div class="footer__cols">
+    {{#each columns}}<nav class="ui-box ui-box--footercol" aria-label="{{heading}}">
+      <h2>{{heading}}</h2>
+      <ul>{{#each links}}<li><a href="#">{{.}}</a></li>{{/each}}</ul>
+    </nav>
+    {{/each}}
+  </div>
+</footer>
+""", {
+        'columns': {
+            "type": "array", "minItems": 1, "maxItems": 4,
+            "description": "footer columns, each with a heading and link labels",
+            "items": {
+                "type": "object",
+                "properties": {'heading': _string("column heading", 30), 'links': _strings("link labels", 30, 1, 6)},
+                "required": ["heading", "links"]
+            }
+        }
+    }, {
+        'columns': [
+            {'heading': "About", 'links': ["About", "Press", "Contact"]},
+            {'heading': "Legal", 'links': ["Terms", "Privacy", "Policy & Safety"]}
+        ]
+    })
+}
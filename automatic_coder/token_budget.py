@@ -0,0 +1,149 @@
+"""
+Output-token budgets learned from past runs.
+
+Every LLM call belongs to a stage ("plan", "part", "repair", ...) and an
+optional kind (the part number). The output lengths of past calls are
+kept per stage/kind; the next call gets num_predict at a high percentile
+of that history plus headroom, so a runaway generation is cut instead of
+running to the context limit. num_ctx is sized to the prompt plus that
+budget rather than the model default, which keeps the KV cache small.
+
+num_ctx is rounded up to a power of two and never shrinks for a given
+model and stage within a process: ollama reloads the model (and drops its
+prompt cache) whenever num_ctx changes, so each stage settles on one
+context after a reload or two. Stages keep separate floors, so one large
+fix call does not push every later part call to its context.
+AUTOCODER_TOKEN_BUDGET=0 leaves the options untouched.
+"""
+import json
+import math
+import os
+import threading
+
+from prompt_compiler import count_tokens
+
+BUDGET_PERCENTILE = 0.95
+BUDGET_HEADROOM = 1.25
+# Below this many observations the stage default is used
+MIN_SAMPLES = 5
+HISTORY_SIZE = 200
+
+DEFAULT_NUM_PREDICT = 4096
+DEFAULT_BUDGETS = {
+    'plan': 2048,
+    'plan_adapt': 2048,
+    'part': 4096,
+    'repair': 4096,
+    'debug': 1024,
+    'fix': 8192,
+    'slots': 1024,
+    'refine': 1536,
+    'site_map': 1024
+}
+MIN_NUM_PREDICT = 256
+
+MIN_NUM_CTX = 2048
+MAX_NUM_CTX = 32768
+# Chat template tokens and tokenizer mismatch on top of the counted prompt
+CTX_MARGIN_TOKENS = 256
+
+
+def _key(stage, kind=None):
+    return stage if kind is None else f"{stage}/{kind}"
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def context_size(prompt_tokens, num_predict):
+    """Smallest power-of-two context holding the prompt and the output budget."""
+    needed = prompt_tokens + num_predict + CTX_MARGIN_TOKENS
+    size = MIN_NUM_CTX
+    while size < needed and size < MAX_NUM_CTX:
+        size *= 2
+    return size
+
+
+class TokenBudget:
+    """Persistent output-length history per stage, stored as a single JSON file."""
+
+    def __init__(self, path="token_budgets.json", percentile=BUDGET_PERCENTILE, headroom=BUDGET_HEADROOM, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get("AUTOCODER_TOKEN_BUDGET", "1") != "0"
+        self.enabled = enabled
+        self.path = path
+        self.percentile = percentile
+        self.headroom = headroom
+        self.history = {}
+        # {(model, stage): largest num_ctx handed out}
+        self.num_ctx_floor = {}
+        # Parallel part samples record from worker threads
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.history = data.get('history', {})
+        except (OSError, ValueError) as e:
+            print(f"  [Token Budget: could not read {self.path}: {str(e)}]")
+            self.history = {}
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({'version': 1, 'history': self.history}, f)
+            os.replace(tmp_path, self.path)
+
+    def budget(self, stage, kind=None):
+        """Returns (num_predict, samples) for a stage; samples is 0 when the default applies."""
+        with self._lock:
+            history = list(self.history.get(_key(stage, kind), []))
+        if len(history) < MIN_SAMPLES:
+            return DEFAULT_BUDGETS.get(stage, DEFAULT_NUM_PREDICT), 0
+        return max(MIN_NUM_PREDICT, int(_percentile(history, self.percentile) * self.headroom)), len(history)
+
+    def options(self, stage, prompt, options=None, kind=None, model=None):
+        """
+        Adds num_predict and num_ctx to a call's options. An explicit
+        num_predict is kept; an explicit num_ctx is a minimum.
+        """
+        options = dict(options or {})
+        if not self.enabled:
+            return options
+        num_predict, _ = self.budget(stage, kind)
+        prompt_tokens = count_tokens(prompt)
+        num_ctx = context_size(prompt_tokens, num_predict)
+        # A prompt too large for the biggest context gives up output, not input
+        num_predict = max(MIN_NUM_PREDICT, min(num_predict, num_ctx - prompt_tokens - CTX_MARGIN_TOKENS))
+        with self._lock:
+            floor = max(self.num_ctx_floor.get((model, stage), 0), num_ctx, options.get('num_ctx') or 0)
+            self.num_ctx_floor[(model, stage)] = floor
+            options['num_ctx'] = floor
+        options.setdefault('num_predict', num_predict)
+        return options
+
+    def record(self, stage, tokens, kind=None, truncated=False):
+        """
+        Adds one observed output length. A truncated generation is only a
+        lower bound, so it is recorded with headroom on top to let the
+        budget grow past the limit that cut it.
+        """
+        if not self.enabled or not tokens:
+            return
+        if truncated:
+            tokens = int(tokens * self.headroom)
+        with self._lock:
+            history = self.history.setdefault(_key(stage, kind), [])
+            history.append(int(tokens))
+            del history[:-HISTORY_SIZE]
+            self.save()
@@ -0,0 +1,148 @@
+"""
+Span tracer for pipeline stages.
+
+Spans are recorded as plain tuples (two perf_counter_ns calls and a list
+append each), so tracing stays on by default; AUTOCODER_TRACE=0 turns it
+into a no-op. Traces export as Chrome trace-event JSON, which loads in
+Perfetto (ui.perfetto.dev) or chrome://tracing.
+"""
+import json
+import os
+import threading
+import time
+
+from prompt_compiler import count_tokens
+
+_NS_PER_MS = 1_000_000
+
+
+class Span:
+    __slots__ = ('tracer', 'name', 'cat', 'args', 'start')
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer._record(self.name, self.cat, self.start, end - self.start, self.args)
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+        return self
+
+    def mark(self, key):
+        """Stores the milliseconds since the span started, e.g. time to first token."""
+        self.args[key] = round((time.perf_counter_ns() - self.start) / _NS_PER_MS, 2)
+        return self
+
+    def llm(self, response, prompt=None, output=None):
+        """
+        Attaches token counts and timing from an ollama response (the final
+        chunk when streaming). Server-reported counts win; the prompt/output
+        text is only tokenized locally when the server sent none. Queue wait
+        is the wall time the server did not account for: time spent queued
+        behind other requests or in transit.
+        """
+        get = getattr(response, 'get', None) or (lambda key, default=None: default)
+        self.args['tokens_in'] = get('prompt_eval_count') or (count_tokens(prompt) if prompt else None)
+        self.args['tokens_out'] = get('eval_count') or (count_tokens(output) if output else None)
+        total = get('total_duration')
+        if total:
+            wall = time.perf_counter_ns() - self.start
+            self.args['service_ms'] = round(total / _NS_PER_MS, 2)
+            self.args['queue_wait_ms'] = round(max(0, wall - total) / _NS_PER_MS, 2)
+            self.args['load_ms'] = round((get('load_duration') or 0) / _NS_PER_MS, 2)
+            self.args['prefill_ms'] = round((get('prompt_eval_duration') or 0) / _NS_PER_MS, 2)
+            self.args['decode_ms'] = round((get('eval_duration') or 0) / _NS_PER_MS, 2)
+        return self
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        return self
+
+    def mark(self, key):
+        return self
+
+    def llm(self, response, prompt=None, output=None):
+        return self
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    def __init__(self, enabled=None, process_name="automatic_coder"):
+        if enabled is None:
+            enabled = os.environ.get("AUTOCODER_TRACE", "1") != "0"
+        self.enabled = enabled
+        self.process_name = process_name
+        self.origin = time.perf_counter_ns()
+        # (name, cat, start_ns, dur_ns, thread_id, args)
+        self.events = []
+        self.threads = {}
+
+    def span(self, name, cat="stage", **args):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, cat, args)
+
+    def _record(self, name, cat, start, duration, args):
+        thread = threading.current_thread()
+        self.threads.setdefault(thread.ident, thread.name)
+        self.events.append((name, cat, start, duration, thread.ident, args))
+
+    def summary(self):
+        """Total wall time per span name, slowest first."""
+        totals = {}
+        for name, cat, _, duration, _, _ in self.events:
+            count, total = totals.get(name, (0, 0))
+            totals[name] = (count + 1, total + duration)
+        rows = [(name, count, total / _NS_PER_MS) for name, (count, total) in totals.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def to_chrome_trace(self):
+        pid = os.getpid()
+        trace = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": self.process_name}}]
+        for tid, thread_name in self.threads.items():
+            trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+        for name, cat, start, duration, tid, args in self.events:
+            trace.append({
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": (start - self.origin) / 1000,
+                "dur": duration / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": args
+            })
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def save(self, path):
+        if not self.enabled:
+            return None
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
+        os.replace(tmp_path, path)
+        return path